@@ -0,0 +1,361 @@
+# Fanjava_backend/benchmark.py
+"""
+Tests de charge de l'API : parcours utilisateurs rejoués contre un serveur
+
+Parcours : catalogue, recherche, fiche produit, achat (panier puis
+commande), boîte de notifications. Chaque utilisateur virtuel enchaîne
+des parcours tirés au sort (graine fixe : mêmes séquences d'un run à l'autre).
+
+Deux transports :
+- local : django.test.Client dans le processus (middlewares compris) ;
+- HTTP : un serveur démarré (runserver, gunicorn...) sur la même base et
+  avec la même SECRET_KEY, les jetons JWT étant émis localement.
+
+Les latences sont mesurées côté client par route (p50/p95/p99), le nombre
+de requêtes SQL côté serveur via /api/_metrics/ (remis à zéro au départ,
+nécessite un compte admin). Le rapport JSON porte le commit courant pour
+comparer les runs d'un commit à l'autre.
+"""
+
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.test import Client as ClientTest
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from products.models import Categorie, Produit
+from products.recherche import tokeniser
+from users.models import Client, CustomUser
+from .instrumentation import percentile
+
+
+# =========================
+# TRANSPORTS
+# =========================
+
+class TransportLocal:
+    """Requêtes traitées dans le processus (django.test.Client)"""
+
+    description = 'local'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    @property
+    def client(self):
+        """Un client par thread (cookies propres à chaque utilisateur virtuel)"""
+        if not hasattr(self.local, 'client'):
+            self.local.client = ClientTest(SERVER_NAME='localhost')
+        return self.local.client
+
+    def envoyer(self, methode, chemin, jeton=None, params=None, donnees=None):
+        en_tetes = {'HTTP_AUTHORIZATION': f'Bearer {jeton}'} if jeton else {}
+        if params:
+            chemin = f'{chemin}?{urllib.parse.urlencode(params)}'
+        response = self.client.generic(
+            methode,
+            chemin,
+            json.dumps(donnees) if donnees is not None else '',
+            content_type='application/json',
+            **en_tetes
+        )
+        if response.streaming or not response.content:
+            return response.status_code, None
+        try:
+            return response.status_code, json.loads(response.content)
+        except ValueError:
+            return response.status_code, None
+
+
+class TransportHTTP:
+    """Requêtes HTTP vers un serveur démarré"""
+
+    def __init__(self, url_base, timeout=30):
+        self.url_base = url_base.rstrip('/')
+        self.timeout = timeout
+        self.description = self.url_base
+
+    def envoyer(self, methode, chemin, jeton=None, params=None, donnees=None):
+        url = self.url_base + chemin
+        if params:
+            url = f'{url}?{urllib.parse.urlencode(params)}'
+        requete = urllib.request.Request(
+            url,
+            data=json.dumps(donnees).encode() if donnees is not None else None,
+            method=methode,
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+        )
+        if jeton:
+            requete.add_header('Authorization', f'Bearer {jeton}')
+        try:
+            with urllib.request.urlopen(requete, timeout=self.timeout) as response:
+                status, contenu = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, contenu = e.code, e.read()
+        try:
+            return status, json.loads(contenu) if contenu else None
+        except ValueError:
+            return status, None
+
+
+def jeton_pour(user):
+    return str(RefreshToken.for_user(user).access_token)
+
+
+# =========================
+# PARCOURS
+# =========================
+
+class Session:
+    """Un utilisateur virtuel : son jeton, son générateur aléatoire, ses mesures"""
+
+    def __init__(self, transport, donnees, jeton, rng):
+        self.transport = transport
+        self.donnees = donnees
+        self.jeton = jeton
+        self.rng = rng
+        self.mesures = []
+
+    def appel(self, route, methode, chemin, params=None, donnees=None, authentifie=False):
+        debut = time.perf_counter()
+        status, corps = self.transport.envoyer(
+            methode, chemin, self.jeton if authentifie else None, params, donnees
+        )
+        self.mesures.append((route, status, (time.perf_counter() - debut) * 1000))
+        return status, corps
+
+    def produit(self):
+        return self.rng.choice(self.donnees['produits'])
+
+
+def parcours_catalogue(session):
+    session.appel('categories.arbre', 'GET', '/api/products/categories/arbre/')
+    session.appel(
+        'produits.list', 'GET', '/api/products/produits/',
+        params={'page': session.rng.randint(1, 5)}
+    )
+    if session.donnees['categories']:
+        session.appel(
+            'produits.list?categorie', 'GET', '/api/products/produits/',
+            params={'categorie': session.rng.choice(session.donnees['categories'])}
+        )
+    session.appel('produits.promotions', 'GET', '/api/products/produits/promotions/')
+
+
+def parcours_recherche(session):
+    if session.donnees['mots']:
+        session.appel(
+            'produits.search', 'GET', '/api/products/produits/search/',
+            params={'q': session.rng.choice(session.donnees['mots'])}
+        )
+
+
+def parcours_produit(session):
+    produit_id, slug = session.produit()
+    session.appel('produits.retrieve', 'GET', f'/api/products/produits/{slug}/')
+    session.appel('avis.list', 'GET', '/api/products/avis/', params={'produit': produit_id})
+
+
+def parcours_achat(session):
+    produit_id, slug = session.produit()
+    session.appel(
+        'panier.add_item', 'POST', '/api/orders/panier/add_item/',
+        donnees={'produit_id': produit_id, 'quantite': 1}, authentifie=True
+    )
+    session.appel('panier.list', 'GET', '/api/orders/panier/', authentifie=True)
+    session.appel(
+        'commandes.create_from_cart', 'POST', '/api/orders/commandes/create_from_cart/',
+        donnees={
+            'adresse_livraison': 'Lot II A 1',
+            'ville_livraison': 'Antananarivo',
+            'code_postal_livraison': '101',
+            'pays_livraison': 'Madagascar',
+            'telephone_livraison': '+261340000000',
+        },
+        authentifie=True
+    )
+
+
+def parcours_notifications(session):
+    session.appel('notifications.list', 'GET', '/api/notifications/', authentifie=True)
+    session.appel(
+        'notifications.unread_count', 'GET', '/api/notifications/unread_count/', authentifie=True
+    )
+
+
+# Parcours et poids relatifs dans le mélange
+PARCOURS = {
+    'catalogue': (parcours_catalogue, 30),
+    'recherche': (parcours_recherche, 20),
+    'produit': (parcours_produit, 30),
+    'achat': (parcours_achat, 10),
+    'notifications': (parcours_notifications, 10),
+}
+
+
+# =========================
+# RUN
+# =========================
+
+def commit_courant():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Benchmark:
+    """Prépare les données des parcours, lance les utilisateurs virtuels, produit le rapport"""
+
+    taille_echantillon = 1000
+
+    def __init__(self, transport, parcours=None, utilisateurs=10, iterations=20, graine=42):
+        self.transport = transport
+        self.parcours = {nom: PARCOURS[nom] for nom in (parcours or PARCOURS)}
+        self.utilisateurs = utilisateurs
+        self.iterations = iterations
+        self.graine = graine
+
+    def preparer(self):
+        """Échantillon de produits, catégories, mots de recherche et clients"""
+        rng = random.Random(self.graine)
+        disponibles = Produit.objects.filter(status='active', stock__gt=0)
+        dernier = disponibles.order_by('-id').values_list('id', flat=True).first() or 0
+        # Fenêtre tirée au hasard plutôt qu'un ORDER BY RAND() sur toute la table
+        produits = list(disponibles.filter(
+            id__gte=rng.randint(0, max(dernier - self.taille_echantillon * 10, 0))
+        ).order_by('id').values_list('id', 'slug', 'nom')[:self.taille_echantillon])
+
+        mots = sorted({mot for _, _, nom in produits for mot in tokeniser(nom)})
+        clients = list(
+            Client.objects.select_related('user').filter(user__is_active=True)
+            .order_by('id')[:self.utilisateurs]
+        )
+        admin = CustomUser.objects.filter(
+            Q(is_staff=True) | Q(user_type='admin'), is_active=True
+        ).order_by('id').first()
+
+        self.donnees = {
+            'produits': [(produit_id, slug) for produit_id, slug, _ in produits],
+            'categories': list(Categorie.objects.filter(active=True).values_list('id', flat=True)[:200]),
+            'mots': mots,
+        }
+        self.jetons = [jeton_pour(client.user) for client in clients]
+        self.jeton_admin = jeton_pour(admin) if admin else None
+
+        if not self.donnees['produits'] or not self.jetons:
+            raise ValueError('Aucun produit ou client : générer un jeu de données (--generer)')
+
+    def executer_utilisateur(self, index):
+        rng = random.Random(f'{self.graine}-{index}')
+        session = Session(self.transport, self.donnees, self.jetons[index % len(self.jetons)], rng)
+        noms = list(self.parcours)
+        poids = [self.parcours[nom][1] for nom in noms]
+        try:
+            for _ in range(self.iterations):
+                self.parcours[rng.choices(noms, poids)[0]][0](session)
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+        return session.mesures
+
+    def metriques_serveur(self, methode):
+        if self.jeton_admin is None:
+            return None
+        status, corps = self.transport.envoyer(methode, '/api/_metrics/', self.jeton_admin)
+        return corps if status == 200 else None
+
+    def lancer(self):
+        self.preparer()
+        self.metriques_serveur('DELETE')
+
+        debut = time.perf_counter()
+        if self.utilisateurs == 1:
+            resultats = [self.executer_utilisateur(0)]
+        else:
+            with ThreadPoolExecutor(max_workers=self.utilisateurs) as executeur:
+                resultats = list(executeur.map(self.executer_utilisateur, range(self.utilisateurs)))
+        duree = time.perf_counter() - debut
+
+        mesures = [mesure for resultat in resultats for mesure in resultat]
+        serveur = self.metriques_serveur('GET')
+        return self.rapport(mesures, duree, serveur)
+
+    def rapport(self, mesures, duree, serveur):
+        par_route = defaultdict(list)
+        for route, status, latence in mesures:
+            par_route[route].append((status, latence))
+
+        routes = {}
+        for route, valeurs in sorted(par_route.items()):
+            latences = sorted(latence for _, latence in valeurs)
+            routes[route] = {
+                'appels': len(valeurs),
+                'erreurs_4xx': sum(1 for status, _ in valeurs if 400 <= status < 500),
+                'erreurs_5xx': sum(1 for status, _ in valeurs if status >= 500),
+                'p50_ms': round(percentile(latences, 50), 2),
+                'p95_ms': round(percentile(latences, 95), 2),
+                'p99_ms': round(percentile(latences, 99), 2),
+                'max_ms': round(latences[-1], 2),
+            }
+
+        actions = {}
+        for endpoint, stats in ((serveur or {}).get('endpoints') or {}).items():
+            if endpoint.startswith('MetriquesView.'):
+                continue
+            actions[endpoint] = {
+                'appels': stats['appels'],
+                'requetes_moyenne': stats['requetes_moyenne'],
+                'requetes_max': stats['requetes_max'],
+                'duree_db_moyenne_ms': stats['duree_db_moyenne_ms'],
+                'budgets_depasses': stats['budgets_depasses'],
+            }
+
+        return {
+            'commit': commit_courant(),
+            'date': timezone.now().isoformat(),
+            'cible': self.transport.description,
+            'parametres': {
+                'utilisateurs': self.utilisateurs,
+                'iterations': self.iterations,
+                'parcours': list(self.parcours),
+                'graine': self.graine,
+            },
+            'duree_s': round(duree, 2),
+            'requetes_par_seconde': round(len(mesures) / duree, 1) if duree else None,
+            'routes': routes,
+            'actions': actions,
+        }
+
+
+def comparer(ancien, nouveau, seuil=20):
+    """
+    Régressions entre deux rapports : p95 en hausse de plus de `seuil` %
+    ou davantage de requêtes SQL par appel
+    Retourne [(clé, ancienne valeur, nouvelle valeur)]
+    """
+    regressions = []
+    for route, stats in nouveau['routes'].items():
+        avant = ancien['routes'].get(route)
+        if avant and stats['p95_ms'] > avant['p95_ms'] * (1 + seuil / 100):
+            regressions.append((f'{route} p95_ms', avant['p95_ms'], stats['p95_ms']))
+    for action, stats in nouveau['actions'].items():
+        avant = ancien['actions'].get(action)
+        if avant and stats['requetes_max'] > avant['requetes_max']:
+            regressions.append((f'{action} requetes_max', avant['requetes_max'], stats['requetes_max']))
+    return regressions
@@ -0,0 +1,586 @@
+# Fanjava_backend/dataset.py
+"""
+Jeu de données synthétique (benchmarks, tests de charge, reproduction
+des lenteurs de production) : python manage.py generate_dataset
+
+Tout est inséré par bulk_create, par lots, sans signaux ni save() par
+objet. Chaque étape a son propre générateur aléatoire dérivé de la
+graine : la même graine donne les mêmes données, et changer un volume ne
+modifie pas les étapes précédentes.
+
+Les identifiants sont relus par leurs clés naturelles (username, slug,
+sku, numero_commande) : MySQL ne renvoie pas les id d'un INSERT multiple.
+Les produits ne sont gardés en mémoire que sous forme de tableaux
+compacts, pour tenir le million de produits.
+
+Les dates de création (utilisateurs, produits, avis, commandes) sont
+réparties sur les PERIODE_JOURS précédant la génération, croissantes
+avec l'ordre de génération comme les id. created_at étant en
+auto_now_add, bulk_create impose l'heure courante : les dates sont
+réécrites après l'insertion, par UPDATE ... CASE groupés.
+
+Les agrégats dénormalisés (notes, index de recherche, compteurs de
+notifications) sont recalculés à la fin, en requêtes groupées.
+"""
+
+import random
+import time
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from django.utils.text import slugify
+
+from notifications.compteurs import reconcilier_compteurs
+from notifications.models import Notification, NotificationStatus
+from orders.models import Commande, LigneCommande
+from products import cache
+from products.models import Avis, Categorie, ImageProduit, Produit
+from products.ratings import recalculer_toutes_les_notes
+from products.recherche import reindexer_tout
+from users.models import Client, CustomUser, Entreprise
+
+
+# Volumes de départ (--profil), surchargés volume par volume
+PROFILS = {
+    'petit': {
+        'clients': 200, 'entreprises': 20, 'categories': 20, 'produits': 2000,
+        'images_par_produit': 2, 'avis': 5000, 'commandes': 2000,
+        'notifications': 50, 'statuts_notifications': 500,
+    },
+    'moyen': {
+        'clients': 1000, 'entreprises': 50, 'categories': 40, 'produits': 10000,
+        'images_par_produit': 2, 'avis': 50000, 'commandes': 20000,
+        'notifications': 200, 'statuts_notifications': 5000,
+    },
+    'grand': {
+        'clients': 20000, 'entreprises': 500, 'categories': 120, 'produits': 100000,
+        'images_par_produit': 3, 'avis': 500000, 'commandes': 200000,
+        'notifications': 2000, 'statuts_notifications': 100000,
+    },
+    'production': {
+        'clients': 100000, 'entreprises': 2000, 'categories': 300, 'produits': 1000000,
+        'images_par_produit': 3, 'avis': 2000000, 'commandes': 1000000,
+        'notifications': 10000, 'statuts_notifications': 1000000,
+    },
+}
+VOLUMES_PAR_DEFAUT = PROFILS['moyen']
+
+LANGUES = [code for code, nom in settings.LANGUAGES]
+
+# Vocabulaire traduit ; une langue absente retombe sur le français
+NOMS_PRODUITS = [
+    {'fr': 'Chemise', 'en': 'Shirt', 'mg': 'Akanjo', 'es': 'Camisa', 'de': 'Hemd'},
+    {'fr': 'Robe', 'en': 'Dress', 'mg': 'Akanjo lava', 'es': 'Vestido', 'de': 'Kleid'},
+    {'fr': 'Sac', 'en': 'Bag', 'mg': 'Kitapo', 'es': 'Bolso', 'de': 'Tasche'},
+    {'fr': 'Sandales', 'en': 'Sandals', 'mg': 'Kapa', 'es': 'Sandalias', 'de': 'Sandalen'},
+    {'fr': 'Chapeau', 'en': 'Hat', 'mg': 'Satroka', 'es': 'Sombrero', 'de': 'Hut'},
+    {'fr': 'Panier', 'en': 'Basket', 'mg': 'Harona', 'es': 'Cesta', 'de': 'Korb'},
+    {'fr': 'Nappe', 'en': 'Tablecloth', 'mg': 'Lamba latabatra', 'es': 'Mantel', 'de': 'Tischdecke'},
+    {'fr': 'Lampe', 'en': 'Lamp', 'mg': 'Jiro', 'es': 'Lámpara', 'de': 'Lampe'},
+    {'fr': 'Téléphone', 'en': 'Phone', 'mg': 'Finday', 'es': 'Teléfono', 'de': 'Telefon'},
+    {'fr': 'Montre', 'en': 'Watch', 'mg': 'Famantaranandro', 'es': 'Reloj', 'de': 'Uhr'},
+    {'fr': 'Vanille', 'en': 'Vanilla', 'mg': 'Lavanila', 'es': 'Vainilla', 'de': 'Vanille'},
+    {'fr': 'Café', 'en': 'Coffee', 'mg': 'Kafe', 'es': 'Café', 'de': 'Kaffee'},
+    {'fr': 'Miel', 'en': 'Honey', 'mg': 'Tantely', 'es': 'Miel', 'de': 'Honig'},
+    {'fr': 'Poivre', 'en': 'Pepper', 'mg': 'Dipoavatra', 'es': 'Pimienta', 'de': 'Pfeffer'},
+    {'fr': 'Savon', 'en': 'Soap', 'mg': 'Savony', 'es': 'Jabón', 'de': 'Seife'},
+    {'fr': 'Tapis', 'en': 'Rug', 'mg': 'Tsihy', 'es': 'Alfombra', 'de': 'Teppich'},
+]
+QUALIFICATIFS = [
+    {'fr': 'en raphia', 'en': 'raffia', 'mg': 'rofia', 'es': 'de rafia', 'de': 'aus Bast'},
+    {'fr': 'en coton', 'en': 'cotton', 'mg': 'landihazo', 'es': 'de algodón', 'de': 'aus Baumwolle'},
+    {'fr': 'en cuir', 'en': 'leather', 'mg': 'hoditra', 'es': 'de cuero', 'de': 'aus Leder'},
+    {'fr': 'en bois', 'en': 'wooden', 'mg': 'hazo', 'es': 'de madera', 'de': 'aus Holz'},
+    {'fr': 'artisanal', 'en': 'handmade', 'mg': 'asa tanana', 'es': 'artesanal', 'de': 'handgemacht'},
+    {'fr': 'bio', 'en': 'organic', 'mg': 'voajanahary', 'es': 'ecológico', 'de': 'bio'},
+    {'fr': 'de Sambava', 'en': 'from Sambava', 'mg': 'avy any Sambava', 'es': 'de Sambava', 'de': 'aus Sambava'},
+    {'fr': 'rouge', 'en': 'red', 'mg': 'mena', 'es': 'rojo', 'de': 'rot'},
+    {'fr': 'bleu', 'en': 'blue', 'mg': 'manga', 'es': 'azul', 'de': 'blau'},
+    {'fr': 'premium', 'en': 'premium', 'mg': 'tsara indrindra', 'es': 'premium', 'de': 'premium'},
+]
+NOMS_CATEGORIES = [
+    {'fr': 'Mode', 'en': 'Fashion', 'mg': 'Lamaody', 'es': 'Moda', 'de': 'Mode'},
+    {'fr': 'Artisanat', 'en': 'Crafts', 'mg': 'Asa tanana', 'es': 'Artesanía', 'de': 'Kunsthandwerk'},
+    {'fr': 'Épicerie fine', 'en': 'Delicatessen', 'mg': 'Sakafo', 'es': 'Gourmet', 'de': 'Feinkost'},
+    {'fr': 'Électronique', 'en': 'Electronics', 'mg': 'Elektronika', 'es': 'Electrónica', 'de': 'Elektronik'},
+    {'fr': 'Maison', 'en': 'Home', 'mg': 'Trano', 'es': 'Hogar', 'de': 'Haus'},
+    {'fr': 'Beauté', 'en': 'Beauty', 'mg': 'Hatsarana', 'es': 'Belleza', 'de': 'Schönheit'},
+    {'fr': 'Décoration', 'en': 'Decoration', 'mg': 'Haingo', 'es': 'Decoración', 'de': 'Dekoration'},
+    {'fr': 'Bijoux', 'en': 'Jewellery', 'mg': 'Firavaka', 'es': 'Joyería', 'de': 'Schmuck'},
+]
+VILLES = ['Antananarivo', 'Toamasina', 'Antsirabe', 'Fianarantsoa', 'Mahajanga', 'Toliara']
+
+# Images déclarées (fichiers non créés), réparties sur quelques chemins
+IMAGES_DISTINCTES = 50
+
+# Dates de création réparties sur les deux dernières années
+PERIODE_JOURS = 730
+CHAMPS_DATES = ('created_at', 'updated_at', 'date_joined')
+# Lignes par UPDATE ... CASE (deux paramètres par ligne)
+TAILLE_LOT_DATES = 500
+
+
+def traductions(champ, valeurs):
+    """{'nom_fr': ..., 'nom_en': ...} depuis {'fr': ..., 'en': ...}"""
+    return {f'{champ}_{langue}': valeurs.get(langue, valeurs['fr']) for langue in LANGUES}
+
+
+def nom_produit(code, langue='fr'):
+    """Nom d'un produit depuis son code de vocabulaire"""
+    nom = NOMS_PRODUITS[code // len(QUALIFICATIFS)]
+    qualificatif = QUALIFICATIFS[code % len(QUALIFICATIFS)]
+    return f"{nom.get(langue, nom['fr'])} {qualificatif.get(langue, qualificatif['fr'])}"
+
+
+class DatasetExistant(Exception):
+    """Un jeu de données a déjà été généré avec cette graine"""
+
+
+class Produits:
+    """Produits générés, en tableaux parallèles indexés par ordre de génération"""
+
+    def __init__(self):
+        self.ids = array('q')
+        self.entreprises = array('q')
+        self.prix = array('q')
+        self.codes = array('H')
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class GenerateurDataset:
+    """
+    Générateur déterministe
+    Les objets créés sont préfixés par la graine ('ds42_...') : plusieurs
+    jeux peuvent coexister et un jeu existant est détecté
+    """
+
+    def __init__(self, graine=42, taille_lot=2000, sortie=None, indexer=True):
+        self.graine = graine
+        self.taille_lot = taille_lot
+        self.sortie = sortie
+        self.indexer = indexer
+        self.prefixe = f'ds{graine}'
+        self.durees = {}
+        self.fin = timezone.now()
+
+    def rng(self, etape):
+        """Générateur propre à une étape"""
+        return random.Random(f'{self.graine}-{etape}')
+
+    def journal(self, message):
+        if self.sortie is not None:
+            self.sortie.write(message)
+
+    def existe(self):
+        return CustomUser.objects.filter(username__startswith=f'{self.prefixe}_').exists()
+
+    def inserer(self, modele, objets):
+        """bulk_create par lots depuis un itérable ; retourne le nombre inséré"""
+        total = 0
+        objets = iter(objets)
+        while lot := list(islice(objets, self.taille_lot)):
+            modele.objects.bulk_create(lot, batch_size=self.taille_lot)
+            total += len(lot)
+        return total
+
+    def antidater(self, modele, ids, etape):
+        """
+        Dates de création des lignes `ids` (dans l'ordre de génération) :
+        réparties sur PERIODE_JOURS jusqu'à self.fin, croissantes, avec un
+        générateur propre à l'étape
+        """
+        rng = self.rng(f'dates-{etape}')
+        champs = [
+            champ.name for champ in modele._meta.concrete_fields if champ.name in CHAMPS_DATES
+        ]
+        periode = timedelta(days=PERIODE_JOURS) / max(len(ids), 1)
+        debut = self.fin - timedelta(days=PERIODE_JOURS)
+        for position in range(0, len(ids), TAILLE_LOT_DATES):
+            lot = ids[position:position + TAILLE_LOT_DATES]
+            date = Case(
+                *(
+                    When(pk=pk, then=Value(debut + periode * (position + rang + rng.random())))
+                    for rang, pk in enumerate(lot)
+                ),
+                output_field=DateTimeField()
+            )
+            modele.objects.filter(pk__in=list(lot)).update(**{champ: date for champ in champs})
+
+    def etape(self, nom, fonction, *args):
+        debut = time.perf_counter()
+        resultat = fonction(*args)
+        self.durees[nom] = round(time.perf_counter() - debut, 2)
+        self.journal(f'   {nom} : {self.durees[nom]} s')
+        return resultat
+
+    # =========================
+    # GÉNÉRATION
+    # =========================
+
+    def generer(self, **volumes):
+        """Génère le jeu complet ; retourne le nombre d'objets créés par modèle"""
+        volumes = {**VOLUMES_PAR_DEFAUT, **volumes}
+        if self.existe():
+            raise DatasetExistant(f'Jeu de données {self.prefixe} déjà présent')
+
+        clients = self.etape('clients', self.generer_clients, volumes['clients'])
+        entreprises = self.etape('entreprises', self.generer_entreprises, volumes['entreprises'])
+        categories = self.etape('categories', self.generer_categories, volumes['categories'])
+        produits = self.etape(
+            'produits', self.generer_produits,
+            volumes['produits'], [e for e, u in entreprises], categories, volumes['images_par_produit']
+        )
+        nombre_avis = self.etape(
+            'avis', self.generer_avis, volumes['avis'], produits, [c for c, u in clients]
+        )
+        nombre_commandes = self.etape(
+            'commandes', self.generer_commandes, volumes['commandes'], produits, [c for c, u in clients]
+        )
+        nombre_notifications, nombre_statuts = self.etape(
+            'notifications', self.generer_notifications,
+            volumes['notifications'], volumes['statuts_notifications'],
+            [u for c, u in clients], [u for e, u in entreprises]
+        )
+        self.etape('agregats', self.finaliser)
+
+        return {
+            'clients': len(clients),
+            'entreprises': len(entreprises),
+            'categories': volumes['categories'],
+            'produits': len(produits),
+            'images': len(produits) * volumes['images_par_produit'],
+            'avis': nombre_avis,
+            'commandes': nombre_commandes,
+            'notifications': nombre_notifications,
+            'statuts_notifications': nombre_statuts,
+        }
+
+    def _utilisateurs(self, nombre, code, user_type):
+        return (
+            CustomUser(
+                username=f'{self.prefixe}_{code}{index}',
+                email=f'{self.prefixe}_{code}{index}@dataset.fanjava.mg',
+                password=f'{UNUSABLE_PASSWORD_PREFIX}dataset',
+                user_type=user_type,
+                first_name=code.upper(),
+                last_name=str(index),
+            )
+            for index in range(nombre)
+        )
+
+    def _ids_utilisateurs(self, code):
+        return dict(CustomUser.objects.filter(
+            username__startswith=f'{self.prefixe}_{code}'
+        ).order_by('id').values_list('username', 'id'))
+
+    def generer_clients(self, nombre):
+        """Retourne [(client_id, user_id)]"""
+        rng = self.rng('clients')
+        self.inserer(CustomUser, self._utilisateurs(nombre, 'c', 'client'))
+        user_ids = self._ids_utilisateurs('c')
+        self.antidater(CustomUser, array('q', user_ids.values()), 'clients')
+        self.inserer(Client, (
+            Client(user_id=user_id, ville=rng.choice(VILLES), pays='Madagascar')
+            for user_id in user_ids.values()
+        ))
+        return list(Client.objects.filter(
+            user_id__in=user_ids.values()
+        ).order_by('id').values_list('id', 'user_id'))
+
+    def generer_entreprises(self, nombre):
+        """Retourne [(entreprise_id, user_id)]"""
+        rng = self.rng('entreprises')
+        self.inserer(CustomUser, self._utilisateurs(nombre, 'e', 'entreprise'))
+        user_ids = self._ids_utilisateurs('e')
+        self.antidater(CustomUser, array('q', user_ids.values()), 'entreprises')
+        self.inserer(Entreprise, (
+            Entreprise(
+                user_id=user_id,
+                nom_entreprise=f'Boutique {username}',
+                siret=f'{self.prefixe}-{username}',
+                adresse='Lot II A 1',
+                ville=rng.choice(VILLES),
+                code_postal='101',
+                telephone='+261340000000',
+                email_entreprise=f'{username}@dataset.fanjava.mg',
+                status='approved',
+                verified=True,
+            )
+            for username, user_id in user_ids.items()
+        ))
+        return list(Entreprise.objects.filter(
+            user_id__in=user_ids.values()
+        ).order_by('id').values_list('id', 'user_id'))
+
+    def generer_categories(self, nombre):
+        """
+        Arbre sur trois niveaux (racines, sous-catégories, sous-sous-catégories)
+        Retourne les id des feuilles, qui reçoivent les produits
+        """
+        rng = self.rng('categories')
+        racines = min(nombre, len(NOMS_CATEGORIES))
+        niveau_2 = (nombre - racines + 1) // 2
+        quantites = [racines, niveau_2, nombre - racines - niveau_2]
+
+        parents = [(None, noms) for noms in NOMS_CATEGORIES]
+        feuilles = []
+        for niveau, quantite in enumerate(quantites, start=1):
+            if not quantite:
+                break
+            prefixe_slug = f'{self.prefixe}-categorie-{niveau}-'
+            lignes = []
+            for index in range(quantite):
+                parent_id, noms = parents[index] if niveau == 1 else rng.choice(parents)
+                lignes.append((parent_id, noms, Categorie(
+                    # Noms uniques dans chaque langue, même entre plusieurs jeux
+                    **traductions('nom', {
+                        langue: f'{nom} {self.prefixe}.{niveau}.{index}' for langue, nom in noms.items()
+                    }),
+                    slug=f'{prefixe_slug}{index}',
+                    parent_id=parent_id,
+                    ordre=index,
+                )))
+            self.inserer(Categorie, (categorie for _, _, categorie in lignes))
+            ids = dict(Categorie.objects.filter(
+                slug__startswith=prefixe_slug
+            ).values_list('slug', 'id'))
+
+            enfants = [(ids[categorie.slug], noms) for _, noms, categorie in lignes]
+            utilises = {parent_id for parent_id, _, _ in lignes}
+            feuilles = [categorie_id for categorie_id in feuilles if categorie_id not in utilises]
+            feuilles.extend(categorie_id for categorie_id, _ in enfants)
+            parents = enfants
+        return sorted(feuilles)
+
+    def generer_produits(self, nombre, entreprises, categories, images_par_produit):
+        """Produits traduits et leurs images (métadonnées seules) ; retourne un Produits"""
+        rng = self.rng('produits')
+        produits = Produits()
+        codes = len(NOMS_PRODUITS) * len(QUALIFICATIFS)
+        prefixe_sku = self.prefixe.upper()
+
+        for debut in range(0, nombre, self.taille_lot):
+            lot = []
+            noms_fr = []
+            for index in range(debut, min(debut + self.taille_lot, nombre)):
+                code = rng.randrange(codes)
+                noms = {langue: nom_produit(code, langue) for langue in LANGUES}
+                noms_fr.append(noms['fr'])
+                prix = rng.randrange(1000, 500000, 500)
+                en_promotion = rng.random() < 0.1
+                entreprise_id = rng.choice(entreprises)
+                lot.append(Produit(
+                    entreprise_id=entreprise_id,
+                    categorie_id=rng.choice(categories),
+                    **traductions('nom', noms),
+                    **traductions('description_courte', noms),
+                    **traductions('description', {langue: f'{nom} - Madagascar' for langue, nom in noms.items()}),
+                    slug=f'{slugify(noms["fr"])}-{self.prefixe}-{index}',
+                    sku=f'{prefixe_sku}-{index:08d}',
+                    prix=Decimal(prix),
+                    prix_promo=Decimal(prix * 8 // 10) if en_promotion else None,
+                    en_promotion=en_promotion,
+                    en_vedette=rng.random() < 0.02,
+                    stock=rng.randint(0, 500),
+                    status='active' if rng.random() < 0.9 else rng.choice(['draft', 'inactive']),
+                    nombre_ventes=rng.randint(0, 1000),
+                    nombre_vues=rng.randint(0, 10000),
+                ))
+                produits.entreprises.append(entreprise_id)
+                produits.prix.append(prix)
+                produits.codes.append(code)
+            Produit.objects.bulk_create(lot, batch_size=self.taille_lot)
+
+            # SKU à zéros de tête : l'ordre des SKU est l'ordre de génération
+            ids = list(Produit.objects.filter(
+                sku__gte=lot[0].sku, sku__lte=lot[-1].sku
+            ).order_by('sku').values_list('id', flat=True))
+            produits.ids.extend(ids)
+
+            ImageProduit.objects.bulk_create([
+                ImageProduit(
+                    produit_id=produit_id,
+                    image=f'produits/dataset/{(produit_id + rang) % IMAGES_DISTINCTES}.jpg',
+                    alt_text=alt_text,
+                    est_principale=rang == 0,
+                    ordre=rang,
+                )
+                for produit_id, alt_text in zip(ids, noms_fr)
+                for rang in range(images_par_produit)
+            ], batch_size=self.taille_lot)
+        self.antidater(Produit, produits.ids, 'produits')
+        return produits
+
+    def generer_avis(self, nombre, produits, clients):
+        """
+        Chaque client note des produits distincts : couples (produit, client)
+        uniques sans les garder en mémoire ; limité au nombre de couples possibles
+        """
+        rng = self.rng('avis')
+        nombre = min(nombre, len(produits) * len(clients))
+        if not nombre:
+            return 0
+        par_client, reste = divmod(nombre, len(clients))
+
+        def avis():
+            for rang, client_id in enumerate(clients):
+                for position in rng.sample(range(len(produits)), par_client + (rang < reste)):
+                    yield Avis(
+                        produit_id=produits.ids[position],
+                        client_id=client_id,
+                        note=rng.choices([1, 2, 3, 4, 5], weights=[5, 5, 15, 35, 40])[0],
+                        titre='Avis client',
+                        commentaire='Produit conforme à la description.',
+                        approuve=rng.random() < 0.95,
+                    )
+
+        dernier = Avis.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        total = self.inserer(Avis, avis())
+        self.antidater(Avis, array('q', Avis.objects.filter(
+            pk__gt=dernier
+        ).order_by('pk').values_list('pk', flat=True)), 'avis')
+        return total
+
+    def generer_commandes(self, nombre, produits, clients):
+        """Commandes de 1 à 3 lignes, chacune chez une seule entreprise"""
+        rng = self.rng('commandes')
+        par_entreprise = {}
+        for position, entreprise_id in enumerate(produits.entreprises):
+            par_entreprise.setdefault(entreprise_id, array('q')).append(position)
+        entreprises = sorted(par_entreprise)
+        statuts = [code for code, libelle in Commande.STATUS_CHOICES]
+        frais = Decimal('5000')
+
+        commande_ids = array('q')
+        for debut in range(0, nombre, self.taille_lot):
+            commandes = []
+            lignes = {}
+            for index in range(debut, min(debut + self.taille_lot, nombre)):
+                entreprise_id = rng.choice(entreprises)
+                catalogue = par_entreprise[entreprise_id]
+                positions = rng.sample(catalogue, min(rng.randint(1, 3), len(catalogue)))
+                numero = f'{self.prefixe.upper()}-{index:09d}'
+                lignes[numero] = [(position, rng.randint(1, 3)) for position in positions]
+                montant = Decimal(sum(produits.prix[position] * quantite for position, quantite in lignes[numero]))
+                commandes.append(Commande(
+                    client_id=rng.choice(clients),
+                    entreprise_id=entreprise_id,
+                    numero_commande=numero,
+                    montant_total=montant,
+                    frais_livraison=frais,
+                    montant_final=montant + frais,
+                    adresse_livraison='Lot II A 1',
+                    ville_livraison=rng.choice(VILLES),
+                    code_postal_livraison='101',
+                    pays_livraison='Madagascar',
+                    telephone_livraison='+261340000000',
+                    status=rng.choice(statuts),
+                ))
+            Commande.objects.bulk_create(commandes)
+            ids = dict(Commande.objects.filter(
+                numero_commande__gte=commandes[0].numero_commande,
+                numero_commande__lte=commandes[-1].numero_commande,
+            ).values_list('numero_commande', 'id'))
+            LigneCommande.objects.bulk_create([
+                LigneCommande(
+                    commande_id=ids[numero],
+                    produit_id=produits.ids[position],
+                    nom_produit=nom_produit(produits.codes[position]),
+                    prix_unitaire=Decimal(produits.prix[position]),
+                    quantite=quantite,
+                    prix_total=Decimal(produits.prix[position] * quantite),
+                )
+                for numero, contenu in lignes.items()
+                for position, quantite in contenu
+            ], batch_size=self.taille_lot)
+            commande_ids.extend(ids[commande.numero_commande] for commande in commandes)
+        self.antidater(Commande, commande_ids, 'commandes')
+        return len(commande_ids)
+
+    def generer_notifications(self, nombre, nombre_statuts, clients, entreprises):
+        """
+        Notifications par audience (1 sur 5 à destinataires spécifiques) et
+        statuts lue/masquée de leurs destinataires
+        Retourne (notifications, statuts)
+        """
+        rng = self.rng('notifications')
+        types = [code for code, libelle in Notification.TYPE_CHOICES]
+        audiences = {'all': clients + entreprises, 'clients': clients, 'entreprises': entreprises}
+
+        notifications = []
+        for index in range(nombre):
+            recipient_type = rng.choice(['all', 'all', 'clients', 'entreprises', 'specific'])
+            notifications.append(Notification(
+                type_notification=rng.choice(types),
+                titre=f'Annonce {self.prefixe} {index}',
+                message='Nouveautés de la semaine sur Fanjava.',
+                recipient_type=recipient_type,
+                specific_recipients=(
+                    rng.sample(clients, min(5, len(clients))) if recipient_type == 'specific' else None
+                ),
+            ))
+        self.inserer(Notification, notifications)
+        if not notifications:
+            return 0, 0
+        ids = dict(Notification.objects.filter(
+            titre__startswith=f'Annonce {self.prefixe} '
+        ).values_list('titre', 'id'))
+
+        maintenant = timezone.now()
+        par_notification = -(-nombre_statuts // nombre)
+
+        def statuts():
+            restants = nombre_statuts
+            for notification in notifications:
+                audience = notification.specific_recipients or audiences[notification.recipient_type]
+                # Destinataires distincts : un statut par couple (notification, user)
+                for user_id in rng.sample(audience, min(par_notification, restants, len(audience))):
+                    restants -= 1
+                    supprimee = rng.random() < 0.1
+                    yield NotificationStatus(
+                        notification_id=ids[notification.titre],
+                        user_id=user_id,
+                        lue=True,
+                        date_lecture=maintenant,
+                        supprimee=supprimee,
+                        date_suppression=maintenant if supprimee else None,
+                    )
+
+        return len(notifications), self.inserer(NotificationStatus, statuts())
+
+    def finaliser(self):
+        """Agrégats dénormalisés et caches"""
+        recalculer_toutes_les_notes()
+        if self.indexer:
+            reindexer_tout()
+        reconcilier_compteurs()
+        cache.invalider(cache.PRODUITS, cache.CATEGORIES)
+
+
+def ajouter_options_volumes(parser):
+    """--profil et une option par volume, pour les commandes qui génèrent un jeu"""
+    groupe = parser.add_argument_group('volumes du jeu de données')
+    groupe.add_argument(
+        '--profil',
+        choices=list(PROFILS),
+        default='moyen',
+        help='Volumes de départ (production : un million de produits)'
+    )
+    for nom in VOLUMES_PAR_DEFAUT:
+        groupe.add_argument(f'--{nom.replace("_", "-")}', dest=nom, type=int)
+
+
+def volumes_depuis_options(options):
+    """Volumes du profil choisi, surchargés par les options renseignées"""
+    return {
+        nom: valeur if options.get(nom) is None else options[nom]
+        for nom, valeur in PROFILS[options['profil']].items()
+    }
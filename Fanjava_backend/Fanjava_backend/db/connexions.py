@@ -0,0 +1,249 @@
+# Fanjava_backend/db/connexions.py
+"""
+Réutilisation des connexions à la base
+
+Deux modes, configurés dans DATABASES (voir settings.py) :
+- connexions persistantes (CONN_MAX_AGE + CONN_HEALTH_CHECKS de Django) :
+  une connexion par thread, gardée entre les requêtes (WSGI)
+- pool borné (clé POOL) : les connexions rendues en fin de requête sont
+  gardées dans un pool par processus et resservies après un test de santé ;
+  le nombre total de connexions ouvertes est limité (ASGI, où chaque
+  requête peut tourner dans un thread différent)
+
+Le temps d'obtention de chaque connexion est mesuré (metriques_connexions()).
+"""
+
+import os
+import threading
+import time
+
+from django.db import OperationalError
+
+
+class PoolSature(OperationalError):
+    """Aucune connexion libérée avant la fin du délai d'attente"""
+
+
+# =========================
+# MÉTRIQUES
+# =========================
+
+class MetriquesConnexions:
+    """Compteurs par alias : connexions ouvertes, réutilisées, rejetées, temps d'obtention"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._donnees = {}
+
+    def enregistrer(self, alias, duree, origine):
+        with self._verrou:
+            donnees = self._donnees.setdefault(alias, {
+                'acquisitions': 0,
+                'nouvelles': 0,
+                'reutilisees': 0,
+                'rejetees': 0,
+                'duree_totale_ms': 0.0,
+                'duree_max_ms': 0.0,
+            })
+            duree_ms = duree * 1000
+            donnees['acquisitions'] += 1
+            donnees[origine] += 1
+            donnees['duree_totale_ms'] += duree_ms
+            donnees['duree_max_ms'] = max(donnees['duree_max_ms'], duree_ms)
+
+    def connexion_rejetee(self, alias):
+        """Connexion du pool écartée par le test de santé"""
+        with self._verrou:
+            if alias in self._donnees:
+                self._donnees[alias]['rejetees'] += 1
+
+    def instantane(self):
+        with self._verrou:
+            resultat = {}
+            for alias, donnees in self._donnees.items():
+                resultat[alias] = {
+                    **donnees,
+                    'duree_moyenne_ms': round(
+                        donnees['duree_totale_ms'] / donnees['acquisitions'], 3
+                    ) if donnees['acquisitions'] else 0,
+                    'duree_totale_ms': round(donnees['duree_totale_ms'], 3),
+                    'duree_max_ms': round(donnees['duree_max_ms'], 3),
+                }
+                pool = _pools.get(alias)
+                if pool is not None:
+                    resultat[alias]['pool'] = pool.etat()
+            return resultat
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._donnees.clear()
+
+
+metriques = MetriquesConnexions()
+
+
+def metriques_connexions():
+    """Instantané des métriques de connexion du processus"""
+    return metriques.instantane()
+
+
+# =========================
+# POOL
+# =========================
+
+class PoolConnexions:
+    """
+    Pool borné de connexions DB-API (par alias et par processus)
+    `taille_max` connexions ouvertes au plus (libres + prêtées)
+    """
+
+    def __init__(self, taille_max=10, attente=5):
+        self.taille_max = taille_max
+        self.attente = attente
+        self.libres = []
+        self.ouvertes = 0
+        self.condition = threading.Condition()
+        self.pid = os.getpid()
+
+    def etat(self):
+        with self.condition:
+            return {
+                'taille_max': self.taille_max,
+                'ouvertes': self.ouvertes,
+                'libres': len(self.libres),
+            }
+
+    def prendre(self, creer, valide, alias):
+        """
+        Retourne (connexion, origine) : une connexion libre et valide,
+        sinon une nouvelle si la limite le permet, sinon attend
+        """
+        limite = time.monotonic() + self.attente
+        while True:
+            with self.condition:
+                connexion = self.libres.pop() if self.libres else None
+                if connexion is None:
+                    if self.ouvertes < self.taille_max:
+                        self.ouvertes += 1
+                        break
+                    restant = limite - time.monotonic()
+                    if restant <= 0:
+                        raise PoolSature(
+                            f"Pool de connexions '{alias}' saturé "
+                            f"({self.taille_max} connexions, attente {self.attente}s)"
+                        )
+                    self.condition.wait(restant)
+                    continue
+
+            # Test de santé hors verrou (aller-retour réseau)
+            if valide(connexion):
+                return connexion, 'reutilisees'
+            metriques.connexion_rejetee(alias)
+            self.jeter(connexion)
+
+        try:
+            return creer(), 'nouvelles'
+        except Exception:
+            with self.condition:
+                self.ouvertes -= 1
+                self.condition.notify()
+            raise
+
+    def rendre(self, connexion):
+        with self.condition:
+            self.libres.append(connexion)
+            self.condition.notify()
+
+    def jeter(self, connexion):
+        try:
+            connexion.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.ouvertes -= 1
+            self.condition.notify()
+
+    def vider(self):
+        """Fermer les connexions libres (arrêt, tests)"""
+        with self.condition:
+            libres, self.libres = self.libres, []
+        for connexion in libres:
+            self.jeter(connexion)
+
+
+_pools = {}
+_verrou_pools = threading.Lock()
+
+
+def get_pool(alias, configuration):
+    """
+    Pool de l'alias pour le processus courant
+    Après un fork, les connexions héritées du parent sont abandonnées (sans les fermer)
+    """
+    with _verrou_pools:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            pool = PoolConnexions(
+                taille_max=configuration.get('TAILLE_MAX', 10),
+                attente=configuration.get('ATTENTE', 5),
+            )
+            _pools[alias] = pool
+        return pool
+
+
+# =========================
+# BACKEND
+# =========================
+
+class ConnexionsMixin:
+    """
+    À combiner avec le DatabaseWrapper d'un backend Django
+    Mesure l'obtention des connexions et, si POOL['ACTIF'], les puise dans le pool
+    """
+
+    def get_pool(self):
+        configuration = self.settings_dict.get('POOL') or {}
+        if not configuration.get('ACTIF'):
+            return None
+        return get_pool(self.alias, configuration)
+
+    def connexion_valide(self, connexion):
+        try:
+            curseur = connexion.cursor()
+            curseur.execute('SELECT 1')
+            curseur.fetchall()
+            curseur.close()
+            return True
+        except Exception:
+            return False
+
+    def get_new_connection(self, conn_params):
+        debut = time.perf_counter()
+        pool = self.get_pool()
+        if pool is None:
+            connexion, origine = super().get_new_connection(conn_params), 'nouvelles'
+        else:
+            connexion, origine = pool.prendre(
+                lambda: super(ConnexionsMixin, self).get_new_connection(conn_params),
+                self.connexion_valide,
+                self.alias
+            )
+        metriques.enregistrer(self.alias, time.perf_counter() - debut, origine)
+        return connexion
+
+    def _close(self):
+        pool = self.get_pool()
+        if pool is None or self.connection is None:
+            return super()._close()
+
+        connexion = self.connection
+        # Connexion douteuse (erreur, transaction en cours) : fermée, pas rendue
+        if self.errors_occurred or self.in_atomic_block:
+            pool.jeter(connexion)
+            return
+        try:
+            connexion.rollback()
+        except Exception:
+            pool.jeter(connexion)
+            return
+        pool.rendre(connexion)
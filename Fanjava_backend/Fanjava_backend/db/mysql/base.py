@@ -0,0 +1,22 @@
+# Fanjava_backend/db/mysql/base.py
+"""
+Backend MySQL (PyMySQL) avec métriques et pool de connexions optionnel
+ENGINE = 'Fanjava_backend.db.mysql'
+"""
+
+try:
+    import MySQLdb  # noqa: F401
+except ImportError:
+    # PyMySQL (requirements.txt) à la place de mysqlclient
+    import pymysql
+
+    pymysql.version_info = (2, 2, 1, 'final', 0)  # version minimale exigée par Django
+    pymysql.install_as_MySQLdb()
+
+from django.db.backends.mysql import base
+
+from ..connexions import ConnexionsMixin
+
+
+class DatabaseWrapper(ConnexionsMixin, base.DatabaseWrapper):
+    pass
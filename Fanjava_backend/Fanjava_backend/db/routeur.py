@@ -0,0 +1,135 @@
+# Fanjava_backend/db/routeur.py
+"""
+Lectures sur les réplicas
+
+Les écritures vont toujours au primaire (default). Les lectures ne partent
+vers un réplica (settings.DATABASE_REPLICAS) que pendant les actions en
+lecture seule déclarées par les vues (LectureReplicaMixin.actions_replica) :
+le reste du code (checkout, notifications...) ne lit jamais de données en retard.
+
+Lire ses propres écritures :
+- dans une même requête, dès la première écriture, les lectures suivantes
+  repartent au primaire ;
+- après une requête d'écriture (POST/PUT/PATCH/DELETE réussie), l'auteur
+  est épinglé au primaire pendant REPLICA_EPINGLAGE_SECONDES, par cookie et
+  par identifiant utilisateur dans le cache (clients JWT sans cookies).
+  Avec plusieurs serveurs, le cache default doit être partagé (Redis...).
+
+Le délai d'épinglage doit rester supérieur au retard de réplication.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+COOKIE_EPINGLAGE = 'fj_primaire'
+CLE_EPINGLAGE = 'db:primaire:{user_id}'
+
+# Réplica choisi pour la requête en cours (None : primaire)
+_replica = ContextVar('replica_lecture', default=None)
+# Une écriture a eu lieu depuis l'activation du réplica
+_ecriture = ContextVar('ecriture_effectuee', default=False)
+
+
+def replicas():
+    """Alias des réplicas configurés"""
+    return [
+        alias for alias in getattr(settings, 'DATABASE_REPLICAS', [])
+        if alias in connections.settings
+    ]
+
+
+def duree_epinglage():
+    return getattr(settings, 'REPLICA_EPINGLAGE_SECONDES', 5)
+
+
+def est_epingle(request):
+    """L'auteur de la requête a écrit récemment"""
+    if COOKIE_EPINGLAGE in request.COOKIES:
+        return True
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return cache.get(CLE_EPINGLAGE.format(user_id=user.pk)) is not None
+    return False
+
+
+def epingler(request, response):
+    """Épingler l'auteur d'une écriture au primaire"""
+    duree = duree_epinglage()
+    response.set_cookie(COOKIE_EPINGLAGE, '1', max_age=duree, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(CLE_EPINGLAGE.format(user_id=user.pk), 1, duree)
+
+
+def activer_replica(alias):
+    """Router les lectures vers `alias` ; retourne les jetons pour desactiver_replica()"""
+    return _replica.set(alias), _ecriture.set(False)
+
+
+def desactiver_replica(jetons):
+    jeton_replica, jeton_ecriture = jetons
+    _replica.reset(jeton_replica)
+    _ecriture.reset(jeton_ecriture)
+
+
+class RouteurReplicas:
+    """Routeur Django (settings.DATABASE_ROUTERS)"""
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or _ecriture.get():
+            return DEFAULT_DB_ALIAS
+        # Objets liés : même base que l'instance d'origine
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Aussi appelé pour select_for_update() et get_or_create()
+        _ecriture.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas et primaire contiennent les mêmes données
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Le schéma des réplicas vient de la réplication
+        if db in getattr(settings, 'DATABASE_REPLICAS', []):
+            return False
+        return None
+
+
+class LectureReplicaMixin:
+    """
+    ViewSet dont les actions `actions_replica` (GET) lisent sur un réplica,
+    sauf si l'utilisateur vient d'écrire
+    """
+    actions_replica = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        self._jetons_replica = None
+        super().initial(request, *args, **kwargs)
+
+        disponibles = replicas()
+        if (
+            disponibles
+            and request.method in SAFE_METHODS
+            and self.action in self.actions_replica
+            and not est_epingle(request)
+        ):
+            self._jetons_replica = activer_replica(random.choice(disponibles))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        jetons = getattr(self, '_jetons_replica', None)
+        if jetons is not None:
+            self._jetons_replica = None
+            desactiver_replica(jetons)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,14 @@
+# Fanjava_backend/db/sqlite3/base.py
+"""
+Backend SQLite avec métriques et pool de connexions optionnel
+(développement local et tests du pool)
+ENGINE = 'Fanjava_backend.db.sqlite3'
+"""
+
+from django.db.backends.sqlite3 import base
+
+from ..connexions import ConnexionsMixin
+
+
+class DatabaseWrapper(ConnexionsMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,266 @@
+# Fanjava_backend/instrumentation.py
+"""
+Mesure du coût de chaque action d'API
+
+Pour chaque requête : nombre de requêtes SQL, temps passé en base, temps de
+sérialisation DRF (serializer.data, requêtes déclenchées comprises) et
+latence totale, regroupés par action ("ProduitViewSet.list").
+
+La sérialisation est mesurée explicitement : serializers obtenus par
+get_serializer() des vues qui héritent de SerialisationMesureeMixin, et
+donnees_serialisees(serializer) pour ceux instanciés directement.
+
+- une ligne JSON par requête sur le logger fanjava.instrumentation ;
+- des agrégats par processus servis par /api/_metrics ;
+- des budgets de requêtes déclarés par les vues :
+
+      class ProduitViewSet(...):
+          budget_requetes = {'list': 4, 'retrieve': 5}
+
+  (un entier pour une APIView). Un dépassement est journalisé ; avec
+  INSTRUMENTATION_BUDGET_STRICT (activé par Fanjava_backend/settings_test.py),
+  il lève BudgetRequetesDepasse et fait échouer le test.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('fanjava.instrumentation')
+
+# Mesure de la requête HTTP en cours
+_mesure = ContextVar('mesure_requete', default=None)
+
+
+class BudgetRequetesDepasse(AssertionError):
+    """Une action a exécuté plus de requêtes SQL que son budget"""
+
+
+class Mesure:
+    """Compteurs d'une requête HTTP"""
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.endpoint = None
+        self.budget = None
+        self.requetes = 0
+        self.duree_db = 0.0
+        self.duree_serialisation = 0.0
+        self.profondeur_serialisation = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Wrapper d'exécution SQL (connection.execute_wrapper)"""
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree_db += time.perf_counter() - debut
+            self.requetes += 1
+
+    def resultat(self, status_code):
+        return {
+            'endpoint': self.endpoint,
+            'status': status_code,
+            'requetes': self.requetes,
+            'duree_db_ms': round(self.duree_db * 1000, 3),
+            'duree_serialisation_ms': round(self.duree_serialisation * 1000, 3),
+            'latence_ms': round((time.perf_counter() - self.debut) * 1000, 3),
+        }
+
+
+# =========================
+# SÉRIALISATION
+# =========================
+
+@contextmanager
+def serialisation_mesuree():
+    """Chronomètre le bloc comme sérialisation (seul le bloc le plus externe compte)"""
+    mesure = _mesure.get()
+    if mesure is None:
+        yield
+        return
+    mesure.profondeur_serialisation += 1
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        mesure.profondeur_serialisation -= 1
+        if not mesure.profondeur_serialisation:
+            mesure.duree_serialisation += time.perf_counter() - debut
+
+
+def donnees_serialisees(serializer):
+    """serializer.data chronométré (serializer instancié hors de get_serializer())"""
+    with serialisation_mesuree():
+        return serializer.data
+
+
+class DonneesMesurees:
+    """serializer.data chronométré"""
+
+    @property
+    def data(self):
+        with serialisation_mesuree():
+            return super().data
+
+
+@lru_cache(maxsize=None)
+def classe_mesuree(classe):
+    """Sous-classe de `classe` dont .data est chronométré (une par classe)"""
+    return type(classe.__name__, (DonneesMesurees, classe), {'__module__': classe.__module__})
+
+
+class SerialisationMesureeMixin:
+    """Vues génériques DRF : serializer.data des serializers de get_serializer() chronométré"""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        # Serializer ou ListSerializer (many=True) : même objet, .data mesuré
+        serializer.__class__ = classe_mesuree(type(serializer))
+        return serializer
+
+
+# =========================
+# AGRÉGATS
+# =========================
+
+class MetriquesEndpoints:
+    """Agrégats par action, propres au processus"""
+
+    # Latences gardées par action pour les percentiles
+    taille_echantillon = 500
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._donnees = {}
+
+    def enregistrer(self, resultat, depasse):
+        with self._verrou:
+            donnees = self._donnees.get(resultat['endpoint'])
+            if donnees is None:
+                donnees = self._donnees[resultat['endpoint']] = {
+                    'appels': 0,
+                    'erreurs': 0,
+                    'budgets_depasses': 0,
+                    'requetes_total': 0,
+                    'requetes_max': 0,
+                    'duree_db_ms': 0.0,
+                    'duree_serialisation_ms': 0.0,
+                    'latences': deque(maxlen=self.taille_echantillon),
+                }
+            donnees['appels'] += 1
+            donnees['erreurs'] += resultat['status'] >= 500
+            donnees['budgets_depasses'] += depasse
+            donnees['requetes_total'] += resultat['requetes']
+            donnees['requetes_max'] = max(donnees['requetes_max'], resultat['requetes'])
+            donnees['duree_db_ms'] += resultat['duree_db_ms']
+            donnees['duree_serialisation_ms'] += resultat['duree_serialisation_ms']
+            donnees['latences'].append(resultat['latence_ms'])
+
+    def instantane(self):
+        with self._verrou:
+            resultat = {}
+            for endpoint, donnees in sorted(self._donnees.items()):
+                appels = donnees['appels']
+                latences = sorted(donnees['latences'])
+                resultat[endpoint] = {
+                    'appels': appels,
+                    'erreurs': donnees['erreurs'],
+                    'budgets_depasses': donnees['budgets_depasses'],
+                    'requetes_moyenne': round(donnees['requetes_total'] / appels, 2),
+                    'requetes_max': donnees['requetes_max'],
+                    'duree_db_moyenne_ms': round(donnees['duree_db_ms'] / appels, 3),
+                    'duree_serialisation_moyenne_ms': round(
+                        donnees['duree_serialisation_ms'] / appels, 3
+                    ),
+                    'latence_p50_ms': percentile(latences, 50),
+                    'latence_p95_ms': percentile(latences, 95),
+                    'latence_max_ms': latences[-1],
+                }
+            return resultat
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._donnees.clear()
+
+
+def percentile(valeurs_triees, rang):
+    """Percentile (plus proche rang) d'une liste triée non vide"""
+    index = max(0, -(-len(valeurs_triees) * rang // 100) - 1)
+    return valeurs_triees[index]
+
+
+metriques = MetriquesEndpoints()
+
+
+# =========================
+# MIDDLEWARE
+# =========================
+
+def nom_endpoint(request, view_func):
+    """'Classe.action' pour les vues DRF, nom de la fonction sinon"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+
+
+def budget_requetes(request, view_func):
+    """Budget déclaré par la vue pour l'action appelée (None : pas de budget)"""
+    budget = getattr(getattr(view_func, 'cls', None), 'budget_requetes', None)
+    if isinstance(budget, dict):
+        actions = getattr(view_func, 'actions', None) or {}
+        return budget.get(actions.get(request.method.lower()))
+    return budget
+
+
+class InstrumentationMiddleware:
+    """Mesure chaque requête (voir le docstring du module)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mesure = Mesure()
+        jeton = _mesure.set(mesure)
+        try:
+            with ExitStack() as pile:
+                for connexion in connections.all():
+                    pile.enter_context(connexion.execute_wrapper(mesure))
+                response = self.get_response(request)
+        finally:
+            _mesure.reset(jeton)
+
+        if mesure.endpoint is None:
+            mesure.endpoint = 'non_resolu'
+        resultat = mesure.resultat(response.status_code)
+        depasse = mesure.budget is not None and mesure.requetes > mesure.budget
+        metriques.enregistrer(resultat, depasse)
+        logger.info(json.dumps(resultat))
+
+        if depasse:
+            message = (
+                f"{mesure.endpoint} : {mesure.requetes} requêtes SQL "
+                f"pour un budget de {mesure.budget}"
+            )
+            logger.warning(message)
+            if getattr(settings, 'INSTRUMENTATION_BUDGET_STRICT', False):
+                raise BudgetRequetesDepasse(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        mesure = _mesure.get()
+        if mesure is not None:
+            mesure.endpoint = nom_endpoint(request, view_func)
+            mesure.budget = budget_requetes(request, view_func)
+        return None
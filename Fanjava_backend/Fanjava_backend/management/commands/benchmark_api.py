@@ -0,0 +1,113 @@
+# Fanjava_backend/management/commands/benchmark_api.py
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Fanjava_backend.benchmark import PARCOURS, Benchmark, TransportHTTP, TransportLocal, comparer
+from Fanjava_backend.dataset import (
+    DatasetExistant, GenerateurDataset, ajouter_options_volumes, volumes_depuis_options,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rejoue des parcours utilisateurs (catalogue, recherche, produit, achat, '
+        'notifications) et rapporte p50/p95/p99 et requêtes SQL par endpoint. '
+        'À lancer sur une base de test : les parcours d\'achat créent des commandes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Serveur cible (ex. http://127.0.0.1:8000) ; par défaut, traitement dans le processus'
+        )
+        parser.add_argument('--utilisateurs', type=int, default=10, help='Utilisateurs virtuels simultanés')
+        parser.add_argument('--iterations', type=int, default=20, help='Parcours par utilisateur')
+        parser.add_argument(
+            '--parcours',
+            default=','.join(PARCOURS),
+            help=f'Parcours à rejouer, séparés par des virgules (défaut: {",".join(PARCOURS)})'
+        )
+        parser.add_argument('--graine', type=int, default=42)
+        parser.add_argument('--sortie', help='Fichier JSON du rapport (ex. benchmarks/$(git rev-parse --short HEAD).json)')
+        parser.add_argument('--comparer', help='Rapport JSON précédent à comparer')
+        parser.add_argument('--seuil', type=float, default=20, help='Hausse de p95 tolérée en %% (défaut: 20)')
+
+        parser.add_argument('--generer', action='store_true', help='Générer le jeu de données avant le run')
+        ajouter_options_volumes(parser)
+
+    def handle(self, *args, **options):
+        parcours = [nom.strip() for nom in options['parcours'].split(',') if nom.strip()]
+        inconnus = set(parcours) - set(PARCOURS)
+        if inconnus:
+            raise CommandError(f'Parcours inconnus: {", ".join(sorted(inconnus))}')
+
+        if options['generer']:
+            self.stdout.write(self.style.SUCCESS('🚀 Génération du jeu de données...'))
+            generateur = GenerateurDataset(graine=options['graine'], sortie=self.stdout)
+            try:
+                volumes = generateur.generer(**volumes_depuis_options(options))
+            except DatasetExistant as e:
+                self.stdout.write(self.style.WARNING(f'⚠️  {e}, réutilisé'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ {volumes}'))
+
+        transport = TransportHTTP(options['url']) if options['url'] else TransportLocal()
+        benchmark = Benchmark(
+            transport,
+            parcours=parcours,
+            utilisateurs=options['utilisateurs'],
+            iterations=options['iterations'],
+            graine=options['graine'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'🔥 {options["utilisateurs"]} utilisateur(s) x {options["iterations"]} parcours '
+            f'sur {transport.description}...'
+        ))
+        try:
+            rapport = benchmark.lancer()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.afficher(rapport)
+
+        if options['sortie']:
+            chemin = Path(options['sortie'])
+            chemin.parent.mkdir(parents=True, exist_ok=True)
+            chemin.write_text(json.dumps(rapport, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'💾 Rapport écrit dans {chemin}'))
+
+        if options['comparer']:
+            ancien = json.loads(Path(options['comparer']).read_text(encoding='utf-8'))
+            regressions = comparer(ancien, rapport, options['seuil'])
+            self.stdout.write(f'\nComparaison avec {ancien.get("commit") or options["comparer"]} :')
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('✅ Aucune régression'))
+            for cle, avant, apres in regressions:
+                self.stdout.write(self.style.ERROR(f'❌ {cle}: {avant} → {apres}'))
+
+    def afficher(self, rapport):
+        self.stdout.write(
+            f'\nCommit {rapport["commit"]} - {rapport["duree_s"]} s, '
+            f'{rapport["requetes_par_seconde"]} requêtes HTTP/s\n'
+        )
+        self.stdout.write(f'{"Route":<32}{"appels":>8}{"4xx":>6}{"5xx":>6}{"p50":>10}{"p95":>10}{"p99":>10}')
+        for route, stats in rapport['routes'].items():
+            self.stdout.write(
+                f'{route:<32}{stats["appels"]:>8}{stats["erreurs_4xx"]:>6}{stats["erreurs_5xx"]:>6}'
+                f'{stats["p50_ms"]:>10}{stats["p95_ms"]:>10}{stats["p99_ms"]:>10}'
+            )
+
+        if not rapport['actions']:
+            self.stdout.write(self.style.WARNING(
+                '\n⚠️  Requêtes SQL non disponibles (aucun compte admin pour /api/_metrics/)'
+            ))
+            return
+        self.stdout.write(f'\n{"Action":<44}{"appels":>8}{"SQL moy":>10}{"SQL max":>10}{"DB ms":>10}')
+        for action, stats in rapport['actions'].items():
+            self.stdout.write(
+                f'{action:<44}{stats["appels"]:>8}{stats["requetes_moyenne"]:>10}'
+                f'{stats["requetes_max"]:>10}{stats["duree_db_moyenne_ms"]:>10}'
+            )
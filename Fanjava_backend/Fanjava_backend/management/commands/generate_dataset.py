@@ -0,0 +1,64 @@
+# Fanjava_backend/management/commands/generate_dataset.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Fanjava_backend.dataset import (
+    DatasetExistant, GenerateurDataset, ajouter_options_volumes, volumes_depuis_options,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Génère un jeu de données déterministe (utilisateurs, entreprises, clients, '
+        'catégories en arbre, produits traduits avec images, avis, commandes, '
+        'notifications et statuts) par bulk_create. '
+        'Ex. : --profil production pour un catalogue d\'un million de produits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--graine', type=int, default=42, help='Même graine, mêmes données (défaut: 42)')
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=5000,
+            help='Lignes par INSERT (défaut: 5000)'
+        )
+        parser.add_argument(
+            '--sans-index',
+            action='store_true',
+            help='Ne pas reconstruire l\'index de recherche (lancer indexer_produits ensuite)'
+        )
+        ajouter_options_volumes(parser)
+
+    def handle(self, *args, **options):
+        volumes = volumes_depuis_options(options)
+        if options['taille_lot'] < 1:
+            raise CommandError('--taille-lot doit être positif')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🚀 Jeu de données ds{options["graine"]} (profil {options["profil"]}) : '
+            + ', '.join(f'{nom}={valeur}' for nom, valeur in volumes.items())
+        ))
+        generateur = GenerateurDataset(
+            graine=options['graine'],
+            taille_lot=options['taille_lot'],
+            sortie=self.stdout,
+            indexer=not options['sans_index'],
+        )
+        debut = time.perf_counter()
+        try:
+            crees = generateur.generer(**volumes)
+        except DatasetExistant as e:
+            raise CommandError(f'{e} : changer de graine ou vider la base')
+
+        for nom, nombre in crees.items():
+            self.stdout.write(f'   {nom:<24}{nombre:>12}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Jeu de données généré en {time.perf_counter() - debut:.1f} s'
+        ))
+        if options['sans_index']:
+            self.stdout.write(self.style.WARNING(
+                '⚠️  Index de recherche non reconstruit : python manage.py indexer_produits'
+            ))
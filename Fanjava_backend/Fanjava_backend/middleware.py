@@ -0,0 +1,21 @@
+# Fanjava_backend/middleware.py
+
+from rest_framework.permissions import SAFE_METHODS
+
+from .db.routeur import epingler
+
+
+class EpinglagePrimaireMiddleware:
+    """
+    Après une écriture réussie, épingle son auteur au primaire quelques
+    secondes pour qu'il relise ses propres données (voir db/routeur.py)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            epingler(request, response)
+        return response
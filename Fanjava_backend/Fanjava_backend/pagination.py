@@ -0,0 +1,178 @@
+# Fanjava_backend/pagination.py
+"""
+Pagination des listes
+
+Par défaut : PageNumberPagination (?page=N), qui exécute un COUNT(*) et un
+OFFSET de plus en plus coûteux sur les pages profondes.
+
+Mode curseur (keyset), sur demande : ?pagination=curseur puis les liens
+next/previous (?cursor=...). La page suivante est lue avec une condition
+sur la dernière position, ex. pour "-created_at, id" :
+    created_at < x OR (created_at = x AND id > y)
+ce qui reste rapide quelle que soit la profondeur, sans COUNT(*).
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur sur un tri (champ, id)
+    Les champs de tri autorisés sont déclarés par la vue (keyset_ordering_fields)
+    et ne doivent pas être NULL
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering_par_defaut = '-created_at'
+    champ_unique = 'id'
+    message_curseur_invalide = 'Curseur invalide'
+
+    def get_ordering(self, request, view):
+        """[(champ, décroissant)] : tri demandé (?ordering=) s'il est autorisé, puis id"""
+        autorises = getattr(view, 'keyset_ordering_fields', [])
+        defaut = (getattr(view, 'ordering', None) or [self.ordering_par_defaut])[0]
+
+        demande = request.query_params.get('ordering', '').split(',')[0].strip()
+        ordre = demande if demande.lstrip('-') in autorises else defaut
+
+        return [(ordre.lstrip('-'), ordre.startswith('-')), (self.champ_unique, False)]
+
+    def encoder_curseur(self, position, arriere):
+        brut = json.dumps({'p': position, 'r': int(arriere)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(brut.encode()).decode()
+
+    def decoder_curseur(self, request, modele):
+        """Retourne (position, arrière) ; position None pour la première page"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            donnees = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            position = [
+                modele._meta.get_field(champ).to_python(valeur)
+                for (champ, desc), valeur in zip(self.ordre, donnees['p'], strict=True)
+            ]
+            return position, bool(donnees['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.message_curseur_invalide)
+
+    def position(self, objet):
+        """Valeurs de tri d'un objet, sérialisables en JSON"""
+        valeurs = []
+        for champ, desc in self.ordre:
+            valeur = getattr(objet, champ)
+            if isinstance(valeur, (datetime, date)):
+                valeur = valeur.isoformat()
+            elif isinstance(valeur, Decimal):
+                valeur = str(valeur)
+            valeurs.append(valeur)
+        return valeurs
+
+    def condition_apres(self, position, arriere):
+        """(a, b) strictement après (x, y) dans le sens de lecture"""
+        conditions = []
+        egalites = {}
+        for (champ, desc), valeur in zip(self.ordre, position):
+            lookup = 'lt' if desc != arriere else 'gt'
+            conditions.append(Q(**egalites, **{f'{champ}__{lookup}': valeur}))
+            egalites[champ] = valeur
+        return reduce(or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordre = self.get_ordering(request, view)
+
+        position, arriere = self.decoder_curseur(request, queryset.model)
+
+        queryset = queryset.order_by(*[
+            ('-' if desc != arriere else '') + champ for champ, desc in self.ordre
+        ])
+        if position is not None:
+            queryset = queryset.filter(self.condition_apres(position, arriere))
+
+        # Une ligne de plus pour savoir s'il reste une page
+        lignes = list(queryset[:self.page_size + 1])
+        reste = len(lignes) > self.page_size
+        lignes = lignes[:self.page_size]
+        if arriere:
+            lignes.reverse()
+
+        self.has_next = reste if not arriere else True
+        self.has_previous = reste if arriere else position is not None
+        self.page = lignes
+        return lignes
+
+    def get_lien(self, objet, arriere):
+        curseur = self.encoder_curseur(self.position(objet), arriere)
+        return replace_query_param(self.base_url, self.cursor_query_param, curseur)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_lien(self.page[-1], arriere=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.get_lien(self.page[0], arriere=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PaginationHybride(PageNumberPagination):
+    """
+    PageNumberPagination par défaut ; mode curseur (KeysetPagination) sur
+    l'action list avec ?pagination=curseur ou un ?cursor= déjà obtenu
+    """
+    mode_query_param = 'pagination'
+    mode_curseur = 'curseur'
+
+    def utilise_curseur(self, request, view):
+        return getattr(view, 'action', None) == 'list' and (
+            request.query_params.get(self.mode_query_param) == self.mode_curseur
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.utilise_curseur(request, view):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 from django.utils.translation import gettext_lazy as _
@@ -46,12 +47,17 @@ INSTALLED_APPS = [
     'orders.apps.OrdersConfig',
     'payments.apps.PaymentsConfig',
     'notifications.apps.NotificationsConfig',
+    'jobs.apps.JobsConfig',
+
+    # Projet : commandes transverses (jeu de données, tests de charge)
+    'Fanjava_backend',
 ]
 
 # =========================
 # MIDDLEWARE
 # =========================
 MIDDLEWARE = [
+    'Fanjava_backend.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
 
     'corsheaders.middleware.CorsMiddleware',
@@ -64,6 +70,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+
+    'Fanjava_backend.middleware.EpinglagePrimaireMiddleware',
 ]
 
 # =========================
@@ -106,17 +114,41 @@ WSGI_APPLICATION = 'Fanjava_backend.wsgi.application'
 # =========================
 # DATABASE
 # =========================
+# Réutilisation des connexions (voir Fanjava_backend/db/connexions.py) :
+# - DB_POOL_ACTIF = False : connexions persistantes par thread (WSGI)
+# - DB_POOL_ACTIF = True  : pool borné par processus (ASGI)
+DB_POOL_ACTIF = False
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'Fanjava_backend.db.mysql',
         'NAME': 'marketplace_db',
         'USER': 'django_user',
         'PASSWORD': '1234.Djangomysql',
         'HOST': 'localhost',
         'PORT': '3306',
+        # Avec le pool, la connexion est rendue au pool en fin de requête
+        'CONN_MAX_AGE': 0 if DB_POOL_ACTIF else 60,
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'ACTIF': DB_POOL_ACTIF,
+            'TAILLE_MAX': 10,  # connexions ouvertes au plus par processus
+            'ATTENTE': 5,      # secondes d'attente d'une connexion libre
+        },
     }
 }
 
+# Réplicas en lecture seule (réplication MySQL du primaire), ex. :
+# DATABASES['replica1'] = {
+#     **DATABASES['default'], 'HOST': 'replica1.local', 'TEST': {'MIRROR': 'default'},
+# }
+# Les actions de catalogue et de reporting y lisent (voir Fanjava_backend/db/routeur.py)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['Fanjava_backend.db.routeur.RouteurReplicas']
+
+# Après une écriture, son auteur lit sur le primaire pendant ce délai
+REPLICA_EPINGLAGE_SECONDES = 5
+
 # =========================
 # INTERNATIONALIZATION
 # =========================
@@ -146,6 +178,24 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# =========================
+# IMAGES DÉRIVÉES
+# =========================
+# Tailles générées pour les images produits et catégories (plus grand côté, en pixels)
+# Après changement : python manage.py generer_derivees
+IMAGES_DERIVEES = {
+    'miniature': 160,
+    'carte': 480,
+    'detail': 1200,
+}
+IMAGES_DERIVEES_QUALITE = {
+    'webp': 80,
+    'jpeg': 85,
+}
+# Les originaux sont rangés sous l'empreinte de leur contenu (un fichier par
+# contenu) ; un fichier qui n'est plus référencé est supprimé après ce délai
+IMAGES_DELAI_SUPPRESSION = 600  # secondes
+
 # =========================
 # AUTH
 # =========================
@@ -169,6 +219,114 @@ REST_FRAMEWORK = {
     ),
 }
 
+# =========================
+# CACHE
+# =========================
+# Backend du cache catalogue : 'file' ou 'db', partagés entre les processus
+# web et les workers des tâches de fond qui invalident ce cache ('db' nécessite
+# `python manage.py createcachetable`) ; 'locmem' (par processus) pour les tests
+CATALOGUE_CACHE_BACKEND = 'file'
+
+CATALOGUE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fanjava-catalogue',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'catalogue',
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'fanjava_cache_catalogue',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogue': {
+        **CATALOGUE_CACHE_BACKENDS[CATALOGUE_CACHE_BACKEND],
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Durée de vie des réponses en cache (les écritures invalident avant)
+CATALOGUE_CACHE_TIMEOUT = 300  # secondes
+
+# Statistiques du tableau de bord admin
+ADMIN_STATS_CACHE_TIMEOUT = 60  # secondes
+
+# =========================
+# RECHERCHE PRODUITS
+# =========================
+# 'auto' : FULLTEXT sous MySQL, index inversé ailleurs ; ou 'fulltext' / 'termes'
+# Après changement : python manage.py indexer_produits
+RECHERCHE_MOTEUR = 'auto'
+# Longueur minimale d'un mot indexé : garder innodb_ft_min_token_size
+RECHERCHE_LONGUEUR_MIN_TERME = 3
+
+# =========================
+# FACETTES PRODUITS
+# =========================
+# Bornes des tranches de prix de /api/products/produits/facettes/
+FACETTES_TRANCHES_PRIX = [10000, 50000, 100000, 500000]
+
+# =========================
+# COMPTEUR DE VUES PRODUITS
+# =========================
+# Vues en attente comptées dans le cache `vues`, partagé entre les processus
+# (mêmes backends que le cache catalogue, emplacement distinct : jamais évincées
+# par les réponses en cache), puis écrites par une tâche de fond demandée
+# toutes les PRODUIT_VUES_FLUSH_INTERVAL secondes ou par `python manage.py flush_vues`
+PRODUIT_VUES_CACHE_BACKEND = 'file'
+
+PRODUIT_VUES_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fanjava-vues',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'vues',
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'fanjava_cache_vues',
+    },
+}
+
+CACHES['vues'] = {
+    **PRODUIT_VUES_CACHE_BACKENDS[PRODUIT_VUES_CACHE_BACKEND],
+    'TIMEOUT': None,
+    'OPTIONS': {'MAX_ENTRIES': 1000000},
+}
+
+PRODUIT_VUES_FLUSH_INTERVAL = 30  # secondes
+
+# =========================
+# INSTRUMENTATION
+# =========================
+# Budgets de requêtes SQL déclarés par les vues (budget_requetes) :
+# avertissement en production, exception (test en échec) avec les réglages
+# de test (Fanjava_backend/settings_test.py) ou INSTRUMENTATION_BUDGET_STRICT=1
+INSTRUMENTATION_BUDGET_STRICT = os.environ.get('INSTRUMENTATION_BUDGET_STRICT') == '1'
+
+# =========================
+# TÂCHES DE FOND (JOBS)
+# =========================
+# File en base exécutée par `python manage.py run_workers` (voir jobs/file.py)
+# Synchrone avec les réglages de test : les tâches s'exécutent à la mise en file
+# Les workers invalident le cache catalogue : backend partagé ('file', 'db') requis
+JOBS_SYNCHRONES = False
+JOBS_PROCESSUS = 1
+JOBS_THREADS = 2
+JOBS_INTERVALLE = 1.0  # secondes entre deux scrutations d'une file vide
+JOBS_TENTATIVES_MAX = 3
+JOBS_DELAI_VISIBILITE = 300  # secondes avant reprise d'un job non terminé
+JOBS_DELAI_NOUVEL_ESSAI = 30  # secondes, doublé à chaque échec
+
 # =========================
 # JWT
 # =========================
@@ -194,4 +352,13 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO',
     },
+    'loggers': {
+        # Une ligne JSON par requête (voir Fanjava_backend/instrumentation.py)
+        'fanjava.instrumentation': {
+            'level': 'INFO',
+        },
+        'fanjava.images': {
+            'level': 'INFO',
+        },
+    },
 }
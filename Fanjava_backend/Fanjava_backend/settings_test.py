@@ -0,0 +1,27 @@
+# Fanjava_backend/settings_test.py
+"""
+Réglages des tests
+
+`python manage.py test` les charge par défaut ; avec un autre lanceur
+(pytest...), définir DJANGO_SETTINGS_MODULE=Fanjava_backend.settings_test.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, CATALOGUE_CACHE_BACKENDS, LOGGING, PRODUIT_VUES_CACHE_BACKENDS
+
+# Budgets de requêtes dépassés : le test échoue
+INSTRUMENTATION_BUDGET_STRICT = True
+
+# Tâches de fond exécutées à la mise en file
+JOBS_SYNCHRONES = True
+
+# Caches catalogue et vues en mémoire : rien n'est partagé entre deux lancements
+CATALOGUE_CACHE_BACKEND = 'locmem'
+CACHES['catalogue'].update(CATALOGUE_CACHE_BACKENDS[CATALOGUE_CACHE_BACKEND])
+PRODUIT_VUES_CACHE_BACKEND = 'locmem'
+CACHES['vues'].update(PRODUIT_VUES_CACHE_BACKENDS[PRODUIT_VUES_CACHE_BACKEND])
+
+# Une ligne JSON par requête : seulement les dépassements de budget
+LOGGING['loggers']['fanjava.instrumentation']['level'] = 'WARNING'
+# Les tests créent des images sans fichier réel
+LOGGING['loggers']['fanjava.images']['level'] = 'ERROR'
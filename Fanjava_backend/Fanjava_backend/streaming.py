@@ -0,0 +1,108 @@
+# Fanjava_backend/streaming.py
+"""
+Réponses d'export en streaming (CSV / JSON)
+
+Les lignes sont lues par tranches d'id croissants (par_lots) et envoyées
+au fil de l'eau : la mémoire reste bornée quelle que soit la taille de
+l'export, même avec un pilote MySQL qui met tout le résultat en tampon
+(ce que ferait iterator(chunk_size=...) sans curseur serveur).
+
+Les vues d'export passent par reponse_export(), qui lit ?format_export=
+csv (défaut), json (tableau) ou jsonl (un objet par ligne).
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+
+
+FORMATS_EXPORT = ('csv', 'json', 'jsonl')
+
+
+def _cle(ligne):
+    """Id d'une ligne : instance, dictionnaire (values) ou tuple (values_list, id en premier)"""
+    if isinstance(ligne, dict):
+        return ligne['id']
+    if isinstance(ligne, tuple):
+        return ligne[0]
+    return ligne.pk
+
+
+def par_lots(queryset, taille=2000):
+    """Parcourt un queryset par tranches de `taille` lignes, triées par id"""
+    queryset = queryset.order_by('pk')
+    dernier = None
+    while True:
+        lot = queryset if dernier is None else queryset.filter(pk__gt=dernier)
+        lot = list(lot[:taille])
+        if not lot:
+            return
+        yield from lot
+        dernier = _cle(lot[-1])
+
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def reponse_csv(lignes, entetes, nom_fichier):
+    """lignes : itérable de tuples dans l'ordre des entêtes"""
+    writer = csv.writer(_Echo())
+
+    def contenu():
+        # BOM : Excel ouvre le fichier en UTF-8
+        yield '\ufeff' + writer.writerow(entetes)
+        for ligne in lignes:
+            yield writer.writerow(ligne)
+
+    response = StreamingHttpResponse(contenu(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}.csv"'
+    return response
+
+
+def reponse_json(lignes, nom_fichier):
+    """lignes : itérable de dictionnaires ; produit un tableau JSON"""
+    def contenu():
+        yield '['
+        for index, ligne in enumerate(lignes):
+            yield (',\n' if index else '\n') + json.dumps(ligne, cls=DjangoJSONEncoder, ensure_ascii=False)
+        yield '\n]\n'
+
+    response = StreamingHttpResponse(contenu(), content_type='application/json; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}.json"'
+    return response
+
+
+def reponse_jsonl(lignes, nom_fichier):
+    """lignes : itérable de dictionnaires ; un objet JSON par ligne (JSON lines)"""
+    def contenu():
+        for ligne in lignes:
+            yield json.dumps(ligne, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+    response = StreamingHttpResponse(contenu(), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}.jsonl"'
+    return response
+
+
+def reponse_export(request, queryset, colonnes, nom_fichier, taille=2000):
+    """
+    Export d'un queryset dans le format demandé (?format_export=csv|json|jsonl)
+    colonnes : champs de values(), 'id' en premier (reprise de par_lots)
+    """
+    format_export = request.GET.get('format_export', 'csv')
+    if format_export not in FORMATS_EXPORT:
+        return JsonResponse(
+            {'error': f'format_export doit valoir {", ".join(FORMATS_EXPORT)}'},
+            status=400
+        )
+    if format_export == 'csv':
+        return reponse_csv(par_lots(queryset.values_list(*colonnes), taille), colonnes, nom_fichier)
+    lignes = par_lots(queryset.values(*colonnes), taille)
+    if format_export == 'json':
+        return reponse_json(lignes, nom_fichier)
+    return reponse_jsonl(lignes, nom_fichier)
@@ -0,0 +1,289 @@
+import os
+import sqlite3
+import tempfile
+from datetime import timedelta
+from unittest import SkipTest, mock
+
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import F
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from products import cache
+from notifications.models import NotificationStatus
+from orders.models import Commande
+from products.models import Avis, Categorie, ImageProduit, Produit
+from products.views import CategorieViewSet
+from products.vues import compteur_vues
+from users.models import CustomUser
+from .benchmark import Benchmark, TransportLocal, comparer
+from .dataset import DatasetExistant, GenerateurDataset
+from .db.connexions import PoolSature, _pools, metriques, metriques_connexions
+from .db.routeur import COOKIE_EPINGLAGE, RouteurReplicas, activer_replica, desactiver_replica
+from .db.sqlite3.base import DatabaseWrapper
+from .instrumentation import BudgetRequetesDepasse, metriques as metriques_endpoints
+
+
+class PoolConnexionsTests(TestCase):
+    """Pool borné : réutilisation, test de santé, saturation, métriques"""
+
+    alias = 'pool_test'
+
+    def setUp(self):
+        dossier = tempfile.mkdtemp()
+        self.configuration = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(dossier, 'pool.sqlite3'),
+            'POOL': {'ACTIF': True, 'TAILLE_MAX': 2, 'ATTENTE': 0.1},
+        }
+        self.wrappers = []
+        metriques.reinitialiser()
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+        _pools.pop(self.alias).vider()
+        metriques.reinitialiser()
+
+    def wrapper(self):
+        wrapper = DatabaseWrapper(self.configuration, alias=self.alias)
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def test_connexion_rendue_puis_reutilisee(self):
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        brute = wrapper.connection
+        wrapper.close()
+
+        autre = self.wrapper()
+        autre.ensure_connection()
+        self.assertIs(autre.connection, brute)
+
+        stats = metriques_connexions()[self.alias]
+        self.assertEqual((stats['nouvelles'], stats['reutilisees']), (1, 1))
+        self.assertEqual(stats['pool'], {'taille_max': 2, 'ouvertes': 1, 'libres': 0})
+
+    def test_connexion_invalide_ecartee(self):
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        brute = wrapper.connection
+        wrapper.close()
+        brute.close()
+
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, brute)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+        stats = metriques_connexions()[self.alias]
+        self.assertEqual((stats['nouvelles'], stats['rejetees']), (2, 1))
+        self.assertEqual(stats['pool']['ouvertes'], 1)
+
+    def test_connexion_en_erreur_non_rendue(self):
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        wrapper.errors_occurred = True
+        wrapper.close()
+        self.assertEqual(_pools[self.alias].etat()['ouvertes'], 0)
+
+    def test_pool_sature(self):
+        for index in range(2):
+            self.wrapper().ensure_connection()
+        with self.assertRaises(PoolSature):
+            self.wrapper().ensure_connection()
+
+
+class SanteTests(TestCase):
+    """Endpoint de supervision /api/_health/"""
+
+    def test_sante(self):
+        api = APIClient()
+        response = api.get('/api/_health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['database']['status'], 'ok')
+        self.assertNotIn('connexions', response.data)
+
+        admin = CustomUser.objects.create_user(username='admin', user_type='admin', is_staff=True)
+        api.force_authenticate(admin)
+        self.assertIn('connexions', api.get('/api/_health/').data)
+
+
+REPLICA = 'replica_test'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class RouteurReplicasTests(TestCase):
+    """
+    Lectures sur réplica : une seconde base SQLite avec le schéma du primaire
+    mais sans ses données, pour voir d'où viennent les lignes lues
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        primaire = connections['default'].settings_dict
+        if connections['default'].vendor != 'sqlite':
+            raise SkipTest('Test écrit pour SQLite')
+        nom = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        with sqlite3.connect(primaire['NAME']) as source, sqlite3.connect(nom) as copie:
+            source.backup(copie)
+        # Base déclarée après la création des bases de test par le runner
+        connections.settings[REPLICA] = {**primaire, 'NAME': nom}
+        cls.databases = {'default', REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    @classmethod
+    def setUpTestData(cls):
+        Categorie.objects.using(REPLICA).create(nom='Réplica')
+
+    def setUp(self):
+        cache.get_cache().clear()
+        Categorie.objects.create(nom='Primaire')
+
+    def noms(self, response):
+        return [categorie['nom'] for categorie in response.data['results']]
+
+    def test_lectures_catalogue_sur_replica(self):
+        response = APIClient().get('/api/products/categories/')
+        self.assertEqual(self.noms(response), ['Réplica'])
+        # Hors actions déclarées : primaire
+        self.assertEqual(Categorie.objects.get().nom, 'Primaire')
+
+    def test_auteur_epingle_au_primaire(self):
+        admin = CustomUser.objects.create_user(username='admin', user_type='admin', is_staff=True)
+        api = APIClient()
+        api.force_authenticate(admin)
+
+        response = api.post('/api/products/categories/', {'nom': 'Nouvelle'})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(COOKIE_EPINGLAGE, response.cookies)
+
+        # Épinglé par cookie et par utilisateur (clients JWT)
+        self.assertIn('Nouvelle', self.noms(api.get('/api/products/categories/')))
+        api.cookies.clear()
+        self.assertIn('Nouvelle', self.noms(api.get('/api/products/categories/')))
+
+        cache.get_cache().clear()
+        self.assertEqual(self.noms(APIClient().get('/api/products/categories/')), ['Réplica'])
+
+    def test_ecriture_ramene_les_lectures_au_primaire(self):
+        routeur = RouteurReplicas()
+        jetons = activer_replica(REPLICA)
+        try:
+            self.assertEqual(routeur.db_for_read(Categorie), REPLICA)
+            self.assertEqual(routeur.db_for_write(Categorie), 'default')
+            self.assertEqual(routeur.db_for_read(Categorie), 'default')
+        finally:
+            desactiver_replica(jetons)
+        self.assertEqual(routeur.db_for_read(Categorie), 'default')
+
+
+class InstrumentationTests(TestCase):
+    """Mesure par action, endpoint /api/_metrics/, budgets de requêtes"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        metriques_endpoints.reinitialiser()
+        self.api = APIClient()
+
+    def test_metriques_par_action(self):
+        Categorie.objects.create(nom='Maison')
+        self.api.get('/api/products/produits/')
+        self.api.get('/api/products/produits/nouveautes/')
+        self.api.get('/api/products/categories/')
+
+        admin = CustomUser.objects.create_user(username='admin', user_type='admin', is_staff=True)
+        self.api.force_authenticate(admin)
+        endpoints = self.api.get('/api/_metrics/').data['endpoints']
+
+        self.assertEqual(endpoints['ProduitViewSet.list']['appels'], 1)
+        self.assertEqual(endpoints['CategorieViewSet.list']['requetes_max'], 3)
+        self.assertGreater(endpoints['CategorieViewSet.list']['duree_serialisation_moyenne_ms'], 0)
+        self.assertGreater(endpoints['ProduitViewSet.nouveautes']['duree_serialisation_moyenne_ms'], 0)
+        # Mesure explicite : DRF n'est pas modifié pour les autres serializers
+        from rest_framework.serializers import BaseSerializer
+        self.assertEqual(BaseSerializer.data.fget.__module__, 'rest_framework.serializers')
+
+        self.api.delete('/api/_metrics/')
+        self.assertEqual(list(self.api.get('/api/_metrics/').data['endpoints']), ['MetriquesView.delete'])
+
+    def test_metriques_reservees_aux_admins(self):
+        self.assertEqual(self.api.get('/api/_metrics/').status_code, 401)
+
+    def test_budget_depasse(self):
+        Categorie.objects.create(nom='Maison')
+        with mock.patch.object(CategorieViewSet, 'budget_requetes', {'list': 1}):
+            with self.assertRaises(BudgetRequetesDepasse):
+                self.api.get('/api/products/categories/')
+        self.assertEqual(
+            metriques_endpoints.instantane()['CategorieViewSet.list']['budgets_depasses'], 1
+        )
+
+
+class BenchmarkTests(TestCase):
+    """Jeu de données synthétique et parcours rejoués dans le processus"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.volumes = GenerateurDataset(graine=7, taille_lot=50).generer(
+            clients=20, entreprises=4, categories=12, produits=120, images_par_produit=1,
+            avis=300, commandes=40, notifications=10, statuts_notifications=20
+        )
+        CustomUser.objects.create_user(username='admin', user_type='admin', is_staff=True)
+
+    def setUp(self):
+        cache.get_cache().clear()
+        # Flush des vues hors des requêtes mesurées (tâche de fond en production)
+        caches['vues'].clear()
+        compteur_vues.flush()
+
+    def test_jeu_de_donnees(self):
+        self.assertEqual(self.volumes['produits'], Produit.objects.count())
+        self.assertEqual(self.volumes['avis'], Avis.objects.count())
+        self.assertEqual(Commande.objects.filter(lignes__isnull=True).count(), 0)
+        # Notes dénormalisées recalculées
+        produit = Produit.objects.filter(nombre_avis__gt=0).first()
+        self.assertEqual(produit.nombre_avis, produit.avis.filter(approuve=True).count())
+        # Arbre de catégories, produits traduits dans les feuilles
+        self.assertEqual(Categorie.objects.filter(parent__parent__isnull=False).count(), 2)
+        self.assertFalse(Produit.objects.filter(categorie__sous_categories__isnull=False).exists())
+        self.assertTrue(Produit.objects.exclude(nom_en=F('nom_fr')).exists())
+        self.assertEqual(ImageProduit.objects.count(), 120)
+        self.assertEqual(NotificationStatus.objects.count(), self.volumes['statuts_notifications'])
+        with self.assertRaises(DatasetExistant):
+            GenerateurDataset(graine=7).generer()
+
+    def test_dates_de_creation_reparties(self):
+        for queryset in (
+            Produit.objects.all(),
+            Avis.objects.all(),
+            Commande.objects.all(),
+            CustomUser.objects.filter(username__startswith='ds7_c'),
+        ):
+            dates = list(queryset.order_by('pk').values_list('created_at', flat=True))
+            with self.subTest(modele=queryset.model.__name__):
+                self.assertEqual(dates, sorted(dates))
+                self.assertGreater(dates[-1] - dates[0], timedelta(days=600))
+                self.assertGreater(len({date.date() for date in dates}), len(dates) // 2)
+
+    def test_parcours(self):
+        rapport = Benchmark(TransportLocal(), utilisateurs=1, iterations=15).lancer()
+
+        self.assertEqual(sum(stats['erreurs_5xx'] for stats in rapport['routes'].values()), 0)
+        self.assertIn('produits.retrieve', rapport['routes'])
+        self.assertLessEqual(rapport['actions']['ProduitViewSet.retrieve']['requetes_max'], 5)
+        self.assertEqual(comparer(rapport, rapport), [])
+
+    def test_parcours_achat(self):
+        rapport = Benchmark(TransportLocal(), parcours=['achat'], utilisateurs=1, iterations=3).lancer()
+        self.assertEqual(rapport['routes']['commandes.create_from_cart']['appels'], 3)
+        self.assertEqual(rapport['routes']['commandes.create_from_cart']['erreurs_4xx'], 0)
+        self.assertEqual(Commande.objects.count(), 43)
@@ -1,14 +1,28 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from products.images import DOSSIER as DOSSIER_DERIVEES
+from products.views import image_derivee
+from .views import MetriquesView, SanteView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/products/', include('products.urls')),
     path('api/orders/', include('orders.urls')),
+    path('api/payments/', include('payments.urls')),
     path('api/notifications/', include('notifications.urls')),
+    path('api/_health/', SanteView.as_view(), name='health'),
+    path('api/_metrics/', MetriquesView.as_view(), name='metrics'),
+    # Dérivées d'images absentes du stockage, générées à la demande (voir products/images.py)
+    re_path(
+        rf'^{settings.MEDIA_URL.strip("/")}/{DOSSIER_DERIVEES}/[0-9a-f]{{2}}/'
+        r'(?P<empreinte>[0-9a-f]{64})-(?P<taille>\w+)\.(?P<format_>webp|jpeg)$',
+        image_derivee,
+        name='image-derivee'
+    ),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,67 @@
+# Fanjava_backend/views.py
+
+import time
+
+from django.db import DatabaseError, connection
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from products import cache
+from users.permissions import IsAdminUser
+from .db.connexions import metriques_connexions
+from .instrumentation import metriques
+
+
+class SanteView(APIView):
+    """
+    Vérification de l'état du service (load balancer, supervision)
+    200 si la base répond, 503 sinon ; les admins voient aussi les
+    métriques de connexion du processus
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        debut = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            base = {'status': 'ok'}
+        except DatabaseError as e:
+            base = {'status': 'erreur', 'error': str(e)}
+        base['latence_ms'] = round((time.perf_counter() - debut) * 1000, 3)
+
+        donnees = {
+            'status': 'ok' if base['status'] == 'ok' else 'degrade',
+            'database': base,
+        }
+        user = request.user
+        if user.is_authenticated and (user.is_staff or getattr(user, 'user_type', None) == 'admin'):
+            donnees['connexions'] = metriques_connexions()
+
+        return Response(
+            donnees,
+            status=status.HTTP_200_OK if base['status'] == 'ok' else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+class MetriquesView(APIView):
+    """
+    Métriques du processus (admins) : coût par action d'API, connexions DB,
+    cache catalogue ; DELETE remet les compteurs des actions à zéro
+    """
+    permission_classes = [IsAdminUser]
+    budget_requetes = 1
+
+    def get(self, request):
+        return Response({
+            'endpoints': metriques.instantane(),
+            'connexions': metriques_connexions(),
+            'cache_catalogue': cache.get_stats(),
+        })
+
+    def delete(self, request):
+        metriques.reinitialiser()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,22 @@
+# jobs/admin.py
+from django.contrib import admin
+
+from .file import relancer
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tache', 'status', 'priorite', 'tentatives', 'disponible_le', 'updated_at']
+    list_filter = ['status', 'tache']
+    search_fields = ['tache', 'cle']
+    readonly_fields = ['verrouille_par', 'verrouille_jusqu_a', 'derniere_erreur', 'created_at', 'updated_at']
+    actions = ['relancer_jobs']
+
+    @admin.action(description="Relancer les jobs sélectionnés")
+    def relancer_jobs(self, request, queryset):
+        nombre = relancer(queryset)
+        self.message_user(request, f"{nombre} job(s) remis en attente")
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,225 @@
+# jobs/file.py
+"""
+File de tâches de fond stockée en base (table Job), sans broker externe
+
+Déclarer une tâche dans le module jobs.py d'une app :
+
+    @tache(priorite=PRIORITE_BASSE, cle='derivees:produit:{pk}')
+    def generer_derivees_image_produit(pk):
+        ...
+
+puis la mettre en file depuis une vue ou un signal :
+
+    generer_derivees_image_produit.differer(pk=42)
+
+Le job est inséré dans la transaction en cours : il n'est visible des
+workers (python manage.py run_workers) qu'une fois celle-ci validée.
+Avec `cle`, une seule exécution en attente par clé : les demandes répétées
+avant le passage d'un worker sont fusionnées (les tâches relisent l'état
+courant, elles sont idempotentes). La fusion est un UPDATE conditionnel sur
+le job encore jamais pris : il verrouille la ligne jusqu'à la fin de la
+transaction de l'appelant, si bien qu'un worker ne peut réclamer ce job
+qu'après validation des écritures qui l'ont redemandé. Si le job a été pris
+entre-temps, l'UPDATE ne trouve plus de ligne et un nouveau job est créé.
+
+Réclamation : SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8, PostgreSQL), puis
+UPDATE conditionnel marquant les jobs avec un jeton propre au worker ; sur
+les bases sans verrou de ligne (SQLite), l'UPDATE conditionnel suffit à ce
+que deux workers ne prennent pas le même job.
+
+Un job pris reste invisible pendant son délai de visibilité ; si le worker
+s'arrête sans le terminer, il est repris par un autre. Un échec est retenté
+avec un délai doublé à chaque tentative ; après `tentatives_max`, le job
+reste en base au statut 'echoue'. Les jobs réussis sont supprimés.
+
+Avec JOBS_SYNCHRONES (tests, développement sans worker), les tâches sont
+exécutées immédiatement à la mise en file.
+"""
+
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger('fanjava.jobs')
+
+PRIORITE_BASSE = -10
+PRIORITE_NORMALE = 0
+PRIORITE_HAUTE = 10
+
+# Nom de la tâche -> fonction
+TACHES = {}
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+def tache(nom=None, priorite=PRIORITE_NORMALE, cle=None, tentatives_max=None, delai_visibilite=None,
+          transactionnelle=True):
+    """
+    Enregistre une fonction comme tâche de fond et lui ajoute
+    `.differer(**arguments)` et `.differer_dans(delai, **arguments)`
+    cle : modèle de clé de dédoublonnage formaté avec les arguments ('derivees:produit:{pk}')
+    transactionnelle : False pour les tâches longues qui valident elles-mêmes
+    leurs écritures par étapes (exécutées hors de la transaction de executer())
+    """
+    def decorer(fonction):
+        nom_tache = nom or f'{fonction.__module__}.{fonction.__name__}'
+        TACHES[nom_tache] = fonction
+
+        def differer_dans(delai, **arguments):
+            return mettre_en_file(
+                nom_tache,
+                arguments,
+                cle=cle.format(**arguments) if cle else '',
+                priorite=priorite,
+                tentatives_max=tentatives_max,
+                delai_visibilite=delai_visibilite,
+                dans=delai,
+            )
+
+        fonction.nom_tache = nom_tache
+        fonction.transactionnelle = transactionnelle
+        fonction.differer = lambda **arguments: differer_dans(None, **arguments)
+        fonction.differer_dans = differer_dans
+        return fonction
+    return decorer
+
+
+def mettre_en_file(nom, arguments=None, cle='', priorite=PRIORITE_NORMALE,
+                   tentatives_max=None, delai_visibilite=None, dans=None):
+    """
+    Crée le job (ou l'exécute tout de suite avec JOBS_SYNCHRONES)
+    Retourne le Job, ou None s'il a été exécuté ou fusionné avec un job en attente
+    dans : délai avant exécution (timedelta)
+    """
+    arguments = arguments or {}
+    if _reglage('JOBS_SYNCHRONES', False):
+        TACHES[nom](**arguments)
+        return None
+    disponible_le = timezone.now() + (dans or timedelta())
+    # Fusion seulement avec un job jamais réclamé et disponible au plus tard à la même date
+    if cle and Job.objects.filter(
+        cle=cle, status=Job.EN_ATTENTE, tentatives=0, disponible_le__lte=disponible_le
+    ).update(updated_at=timezone.now()):
+        return None
+    return Job.objects.create(
+        tache=nom,
+        arguments=arguments,
+        cle=cle,
+        priorite=priorite,
+        tentatives_max=tentatives_max or _reglage('JOBS_TENTATIVES_MAX', 3),
+        delai_visibilite=delai_visibilite or _reglage('JOBS_DELAI_VISIBILITE', 300),
+        disponible_le=disponible_le,
+    )
+
+
+def reclamer(worker, nombre=1, taches=None):
+    """
+    Prend jusqu'à `nombre` jobs disponibles pour `worker`
+    Retourne les jobs pris (statut en_cours, tentative comptée)
+    """
+    jeton = f'{worker}:{uuid.uuid4().hex[:12]}'[-100:]
+    maintenant = timezone.now()
+    with transaction.atomic():
+        candidats = Job.objects.reclamables(maintenant).select_for_update(skip_locked=True)
+        if taches:
+            candidats = candidats.filter(tache__in=taches)
+        lignes = list(candidats.ordre_execution().values_list('delai_visibilite', 'id')[:nombre])
+        if not lignes:
+            return []
+        for delai, groupe in groupby(sorted(lignes), key=lambda ligne: ligne[0]):
+            # Condition répétée : protège les bases sans SKIP LOCKED
+            Job.objects.reclamables(maintenant).filter(
+                id__in=[job_id for delai, job_id in groupe]
+            ).update(
+                status=Job.EN_COURS,
+                verrouille_par=jeton,
+                verrouille_jusqu_a=maintenant + timedelta(seconds=delai),
+                tentatives=F('tentatives') + 1,
+            )
+    return list(Job.objects.filter(verrouille_par=jeton, status=Job.EN_COURS).ordre_execution())
+
+
+def delai_nouvel_essai(tentatives):
+    """Délai avant la tentative suivante : doublé à chaque échec (plafonné à 1 h)"""
+    base = _reglage('JOBS_DELAI_NOUVEL_ESSAI', 30)
+    return timedelta(seconds=min(base * 2 ** max(tentatives - 1, 0), 3600))
+
+
+def executer(job):
+    """
+    Exécute un job pris par reclamer() dans une transaction (sauf tâche
+    déclarée transactionnelle=False)
+    Succès : le job est supprimé ; échec : nouvelle tentative planifiée ou statut 'echoue'
+    Retourne True en cas de succès
+    """
+    fonction = TACHES.get(job.tache)
+    try:
+        if fonction is None:
+            raise LookupError(f"Tâche inconnue : {job.tache}")
+        if fonction.transactionnelle:
+            with transaction.atomic():
+                fonction(**job.arguments)
+        else:
+            fonction(**job.arguments)
+    except Exception:
+        erreur = traceback.format_exc()
+        echoue = job.tentatives >= job.tentatives_max
+        logger.warning(
+            "Job %s (%s) en échec, tentative %s/%s", job.pk, job.tache, job.tentatives, job.tentatives_max
+        )
+        changements = {'derniere_erreur': erreur, 'verrouille_par': '', 'verrouille_jusqu_a': None}
+        if echoue:
+            changements['status'] = Job.ECHOUE
+        else:
+            changements['status'] = Job.EN_ATTENTE
+            changements['disponible_le'] = timezone.now() + delai_nouvel_essai(job.tentatives)
+        # Seulement si le job n'a pas été repris entre-temps (délai de visibilité dépassé)
+        Job.objects.filter(pk=job.pk, verrouille_par=job.verrouille_par).update(
+            updated_at=timezone.now(), **changements
+        )
+        return False
+
+    Job.objects.filter(pk=job.pk, verrouille_par=job.verrouille_par).delete()
+    return True
+
+
+def expirer():
+    """
+    Jobs dont le worker a disparu alors qu'ils n'avaient plus de tentative :
+    passés en 'echoue' (les autres sont repris par reclamer())
+    Retourne le nombre de jobs concernés
+    """
+    return Job.objects.filter(
+        status=Job.EN_COURS,
+        verrouille_jusqu_a__lt=timezone.now(),
+        tentatives__gte=F('tentatives_max')
+    ).update(
+        status=Job.ECHOUE,
+        verrouille_par='',
+        derniere_erreur="Délai de visibilité dépassé (worker arrêté ?)",
+        updated_at=timezone.now()
+    )
+
+
+def relancer(jobs):
+    """Remet des jobs échoués en attente, compteur de tentatives remis à zéro"""
+    return jobs.update(
+        status=Job.EN_ATTENTE,
+        tentatives=0,
+        disponible_le=timezone.now(),
+        verrouille_par='',
+        verrouille_jusqu_a=None,
+        updated_at=timezone.now()
+    )
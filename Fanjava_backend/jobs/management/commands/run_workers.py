@@ -0,0 +1,121 @@
+# jobs/management/commands/run_workers.py
+
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.file import TACHES
+from jobs.processus import demarrer
+from jobs.worker import lancer_threads
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance les workers de la file de tâches (jobs en base) : N processus de "
+        "M threads ; arrêt propre sur SIGTERM / Ctrl+C"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processus',
+            type=int,
+            default=getattr(settings, 'JOBS_PROCESSUS', 1),
+            help='Nombre de processus (défaut: JOBS_PROCESSUS)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=getattr(settings, 'JOBS_THREADS', 2),
+            help='Threads par processus (défaut: JOBS_THREADS)'
+        )
+        parser.add_argument(
+            '--lot',
+            type=int,
+            default=1,
+            help='Jobs réclamés à la fois par thread (défaut: 1)'
+        )
+        parser.add_argument(
+            '--intervalle',
+            type=float,
+            default=getattr(settings, 'JOBS_INTERVALLE', 1.0),
+            help='Secondes entre deux scrutations quand la file est vide'
+        )
+        parser.add_argument(
+            '--taches',
+            nargs='+',
+            help='Ne traiter que ces tâches (ex. products.jobs.generer_derivees_image)'
+        )
+        parser.add_argument(
+            '--une-fois',
+            action='store_true',
+            help='Vider la file puis s\'arrêter (cron, déploiement)'
+        )
+
+    def handle(self, *args, **options):
+        if options['processus'] < 1 or options['threads'] < 1 or options['lot'] < 1:
+            raise CommandError('--processus, --threads et --lot doivent être positifs')
+        inconnues = set(options['taches'] or []) - set(TACHES)
+        if inconnues:
+            raise CommandError(f"Tâche(s) inconnue(s) : {', '.join(sorted(inconnues))}")
+
+        worker_options = {
+            'lot': options['lot'],
+            'intervalle': options['intervalle'],
+            'taches': options['taches'],
+        }
+        arret = threading.Event()
+        for signal_arret in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signal_arret, lambda *args: arret.set())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'⚙️  {options["processus"]} processus × {options["threads"]} thread(s), '
+            f'{len(TACHES)} tâche(s) enregistrée(s)'
+        ))
+        if options['processus'] == 1:
+            workers = lancer_threads(
+                options['threads'], arret, une_fois=options['une_fois'], **worker_options
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Arrêt : {sum(w.reussis for w in workers)} job(s) réussi(s), '
+                f'{sum(w.echoues for w in workers)} en échec'
+            ))
+            return
+
+        self.superviser(options, worker_options, arret)
+        self.stdout.write(self.style.SUCCESS('✅ Workers arrêtés'))
+
+    def superviser(self, options, worker_options, arret):
+        """Démarre les processus, remplace ceux qui meurent, les arrête sur signal"""
+        contexte = multiprocessing.get_context('spawn')
+        connections.close_all()
+
+        def lancer():
+            processus = contexte.Process(
+                target=demarrer,
+                args=(options['threads'], options['une_fois'], worker_options),
+                daemon=False
+            )
+            processus.start()
+            return processus
+
+        pool = [lancer() for index in range(options['processus'])]
+        while not arret.is_set():
+            if options['une_fois'] and not any(processus.is_alive() for processus in pool):
+                break
+            for index, processus in enumerate(pool):
+                if not processus.is_alive() and not options['une_fois']:
+                    self.stdout.write(self.style.WARNING(
+                        f'⚠️  Processus {processus.pid} arrêté (code {processus.exitcode}), relancé'
+                    ))
+                    pool[index] = lancer()
+            arret.wait(1)
+
+        for processus in pool:
+            if processus.is_alive():
+                processus.terminate()
+        for processus in pool:
+            processus.join()
@@ -0,0 +1,128 @@
+# jobs/models.py
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class JobQuerySet(models.QuerySet):
+
+    def reclamables(self, maintenant=None):
+        """
+        Jobs qu'un worker peut prendre : en attente et disponibles, ou en cours
+        dont le délai de visibilité a expiré (worker arrêté en cours de route)
+        """
+        maintenant = maintenant or timezone.now()
+        return self.filter(
+            Q(status=Job.EN_ATTENTE, disponible_le__lte=maintenant)
+            | Q(
+                status=Job.EN_COURS,
+                verrouille_jusqu_a__lt=maintenant,
+                tentatives__lt=models.F('tentatives_max')
+            )
+        )
+
+    def ordre_execution(self):
+        return self.order_by('-priorite', 'disponible_le', 'id')
+
+
+class Job(models.Model):
+    """
+    Tâche de fond en attente d'exécution par un worker (voir jobs/file.py)
+    Les jobs réussis sont supprimés ; les jobs échoués restent pour analyse
+    """
+
+    EN_ATTENTE = 'en_attente'
+    EN_COURS = 'en_cours'
+    ECHOUE = 'echoue'
+
+    STATUS_CHOICES = (
+        (EN_ATTENTE, _('En attente')),
+        (EN_COURS, _('En cours')),
+        (ECHOUE, _('Échoué')),
+    )
+
+    tache = models.CharField(
+        max_length=150,
+        verbose_name=_("Tâche")
+    )
+    arguments = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_("Arguments")
+    )
+    # Un seul job en attente par clé (ex. 'derivees:produit:42') : les demandes répétées sont fusionnées
+    cle = models.CharField(
+        max_length=150,
+        blank=True,
+        db_index=True,
+        verbose_name=_("Clé de dédoublonnage")
+    )
+    priorite = models.SmallIntegerField(
+        default=0,
+        verbose_name=_("Priorité"),
+        help_text=_("Les plus grandes valeurs passent en premier")
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=EN_ATTENTE,
+        verbose_name=_("Statut")
+    )
+
+    tentatives = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("Tentatives")
+    )
+    tentatives_max = models.PositiveSmallIntegerField(
+        default=3,
+        verbose_name=_("Tentatives maximum")
+    )
+    disponible_le = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_("Disponible le")
+    )
+    delai_visibilite = models.PositiveIntegerField(
+        default=300,
+        verbose_name=_("Délai de visibilité (secondes)"),
+        help_text=_("Au-delà, un job en cours est repris par un autre worker")
+    )
+    verrouille_par = models.CharField(
+        max_length=100,
+        blank=True,
+        db_index=True,
+        verbose_name=_("Verrouillé par")
+    )
+    verrouille_jusqu_a = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Verrouillé jusqu'à")
+    )
+    derniere_erreur = models.TextField(
+        blank=True,
+        verbose_name=_("Dernière erreur")
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_("Date de création")
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_("Date de modification")
+    )
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Job")
+        verbose_name_plural = _("Jobs")
+        ordering = ['-priorite', 'disponible_le', 'id']
+        indexes = [
+            models.Index(fields=['status', '-priorite', 'disponible_le']),
+            models.Index(fields=['status', 'verrouille_jusqu_a']),
+        ]
+
+    def __str__(self):
+        return f"{self.tache} ({self.get_status_display()})"
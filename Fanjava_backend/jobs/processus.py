@@ -0,0 +1,22 @@
+# jobs/processus.py
+"""
+Point d'entrée d'un processus worker lancé par run_workers (--processus N)
+
+Les processus sont démarrés en mode 'spawn' (aucune connexion ni thread
+hérité du parent) : Django est initialisé ici, avant tout import de modèle.
+"""
+
+import signal
+import threading
+
+
+def demarrer(threads, une_fois, options):
+    import django
+    django.setup()
+
+    from .worker import lancer_threads
+
+    arret = threading.Event()
+    for signal_arret in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signal_arret, lambda *args: arret.set())
+    lancer_threads(threads, arret, une_fois=une_fois, **options)
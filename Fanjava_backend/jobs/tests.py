@@ -0,0 +1,121 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .file import PRIORITE_HAUTE, TACHES, executer, expirer, reclamer, tache
+from .models import Job
+from .worker import Worker
+
+
+EXECUTIONS = []
+
+
+@tache(nom='tests.noter', cle='noter:{valeur}')
+def noter(valeur):
+    EXECUTIONS.append(valeur)
+
+
+@tache(nom='tests.urgente', priorite=PRIORITE_HAUTE)
+def urgente(valeur):
+    EXECUTIONS.append(valeur)
+
+
+@tache(nom='tests.echouer', tentatives_max=2)
+def echouer():
+    raise ValueError('échec volontaire')
+
+
+@override_settings(JOBS_SYNCHRONES=False)
+class FileJobsTests(TestCase):
+    """Mise en file, réclamation, nouvelles tentatives et délai de visibilité"""
+
+    def setUp(self):
+        EXECUTIONS.clear()
+
+    def test_dedoublonnage_et_priorite(self):
+        noter.differer(valeur=1)
+        self.assertIsNone(noter.differer(valeur=1))
+        noter.differer(valeur=2)
+        urgente.differer(valeur=3)
+        self.assertEqual(Job.objects.count(), 3)
+
+        jobs = reclamer('worker-a', nombre=2)
+        self.assertEqual([job.tache for job in jobs], ['tests.urgente', 'tests.noter'])
+        self.assertTrue(all(job.status == Job.EN_COURS and job.tentatives == 1 for job in jobs))
+        # Déjà pris : invisibles pour un autre worker
+        self.assertEqual(len(reclamer('worker-b', nombre=10)), 1)
+        # Plus de job en attente pour la clé : une nouvelle demande crée un job
+        self.assertIsNotNone(noter.differer(valeur=1))
+
+        for job in jobs:
+            self.assertTrue(executer(job))
+        self.assertEqual(EXECUTIONS, [3, 1])
+        self.assertFalse(Job.objects.filter(pk__in=[job.pk for job in jobs]).exists())
+
+    def test_fusion_seulement_avec_un_job_jamais_pris(self):
+        noter.differer(valeur=1)
+        # Réclamé avant la validation d'une nouvelle demande : celle-ci n'est pas perdue
+        job, = reclamer('worker-a')
+        self.assertIsNotNone(noter.differer(valeur=1))
+        # Job remis en attente après un échec : pas de fusion non plus
+        Job.objects.filter(pk=job.pk).update(status=Job.EN_ATTENTE)
+        Job.objects.exclude(pk=job.pk).delete()
+        self.assertIsNotNone(noter.differer(valeur=1))
+        # Job différé : une demande immédiate ne l'attend pas
+        Job.objects.all().delete()
+        noter.differer_dans(timedelta(hours=1), valeur=1)
+        self.assertIsNotNone(noter.differer(valeur=1))
+        self.assertIsNone(noter.differer_dans(timedelta(hours=2), valeur=1))
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_nouvelles_tentatives_puis_echec(self):
+        echouer.differer()
+        job, = reclamer('worker-a')
+        with self.assertLogs('fanjava.jobs', 'WARNING'):
+            self.assertFalse(executer(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.EN_ATTENTE)
+        self.assertIn('échec volontaire', job.derniere_erreur)
+        self.assertGreater(job.disponible_le, timezone.now())
+        self.assertEqual(reclamer('worker-a'), [])
+
+        Job.objects.update(disponible_le=timezone.now())
+        job, = reclamer('worker-a')
+        with self.assertLogs('fanjava.jobs', 'WARNING'):
+            executer(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.tentatives), (Job.ECHOUE, 2))
+
+    def test_delai_de_visibilite(self):
+        noter.differer(valeur=1)
+        job, = reclamer('worker-a')
+        Job.objects.update(verrouille_jusqu_a=timezone.now() - timedelta(seconds=1))
+
+        repris, = reclamer('worker-b')
+        self.assertEqual((repris.pk, repris.tentatives), (job.pk, 2))
+        # Le premier worker ne peut plus ni terminer ni replanifier le job
+        self.assertTrue(executer(job))
+        self.assertTrue(Job.objects.filter(pk=job.pk).exists())
+
+        Job.objects.update(tentatives=3, verrouille_jusqu_a=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reclamer('worker-c'), [])
+        self.assertEqual(expirer(), 1)
+        self.assertEqual(Job.objects.get().status, Job.ECHOUE)
+
+    def test_worker_execute_les_jobs_disponibles(self):
+        noter.differer(valeur=4)
+        echouer.differer()
+
+        worker = Worker()
+        with self.assertLogs('fanjava.jobs', 'WARNING'):
+            self.assertEqual(worker.executer_disponibles(), 2)
+        self.assertEqual(EXECUTIONS, [4])
+        self.assertEqual(Job.objects.get().tache, 'tests.echouer')
+
+    def test_taches_des_apps_enregistrees(self):
+        for nom in (
+            'products.jobs.generer_derivees_image_produit',
+            'products.jobs.importer_catalogue',
+        ):
+            self.assertIn(nom, TACHES)
@@ -0,0 +1,87 @@
+# jobs/worker.py
+"""
+Workers de la file de tâches
+
+Chaque thread exécute une boucle indépendante (sa propre connexion à la
+base) : réclamer des jobs, les exécuter, attendre `intervalle` secondes
+quand la file est vide. L'arrêt est coopératif : le job en cours est
+terminé avant de sortir.
+"""
+
+import logging
+import os
+import socket
+import threading
+
+from django.db import DatabaseError, connection
+
+from .file import executer, expirer, reclamer
+
+
+logger = logging.getLogger('fanjava.jobs')
+
+
+def identifiant_worker():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+class Worker:
+
+    def __init__(self, arret=None, lot=1, intervalle=1.0, taches=None):
+        self.arret = arret or threading.Event()
+        self.lot = lot
+        self.intervalle = intervalle
+        self.taches = taches
+        self.reussis = 0
+        self.echoues = 0
+
+    def executer_disponibles(self):
+        """Exécute les jobs jusqu'à ce que la file soit vide ; retourne le nombre traité"""
+        traites = 0
+        nom = identifiant_worker()
+        while not self.arret.is_set():
+            jobs = reclamer(nom, self.lot, self.taches)
+            if not jobs:
+                break
+            for job in jobs:
+                if executer(job):
+                    self.reussis += 1
+                else:
+                    self.echoues += 1
+                traites += 1
+        return traites
+
+    def boucle(self, une_fois=False):
+        """Boucle du thread ; avec une_fois, s'arrête dès que la file est vide"""
+        try:
+            while not self.arret.is_set():
+                try:
+                    traites = self.executer_disponibles()
+                    if not traites:
+                        expirer()
+                except DatabaseError:
+                    logger.exception("Erreur de base de données dans le worker")
+                    connection.close()
+                    traites = 0
+                if une_fois:
+                    break
+                if not traites:
+                    self.arret.wait(self.intervalle)
+        finally:
+            connection.close()
+
+
+def lancer_threads(nombre, arret, une_fois=False, **options):
+    """Démarre `nombre` workers dans des threads et attend leur fin"""
+    workers = [Worker(arret, **options) for index in range(nombre)]
+    threads = [
+        threading.Thread(target=worker.boucle, args=(une_fois,), name=f'worker-{index}')
+        for index, worker in enumerate(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # join() par intervalles : le thread principal reste réactif aux signaux
+        while thread.is_alive():
+            thread.join(0.5)
+    return workers
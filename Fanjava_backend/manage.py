@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Fanjava_backend.settings')
+    # Réglages de test par défaut pour `manage.py test` (voir Fanjava_backend/settings_test.py)
+    reglages = 'Fanjava_backend.settings_test' if sys.argv[1:2] == ['test'] else 'Fanjava_backend.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', reglages)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
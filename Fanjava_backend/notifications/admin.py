@@ -1,7 +1,7 @@
 # notifications/admin.py - VERSION V2
 
 from django.contrib import admin
-from .models import Notification, NotificationStatus
+from .models import Notification, NotificationStatus, CompteurNotifications
 
 
 @admin.register(Notification)
@@ -120,4 +120,17 @@ class NotificationStatusAdmin(admin.ModelAdmin):
     
     def has_add_permission(self, request):
         """Empêcher la création manuelle de statuts"""
+        return False
+
+
+@admin.register(CompteurNotifications)
+class CompteurNotificationsAdmin(admin.ModelAdmin):
+    """Compteurs de badge (reconstruits par reconcilier_compteurs_notifications)"""
+    
+    list_display = ['user', 'non_lues']
+    search_fields = ['user__username', 'user__email']
+    readonly_fields = ['user', 'non_lues']
+    
+    def has_add_permission(self, request):
+        """Les compteurs sont maintenus automatiquement"""
         return False
\ No newline at end of file
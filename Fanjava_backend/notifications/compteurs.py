@@ -0,0 +1,173 @@
+# notifications/compteurs.py
+"""
+Compteurs de notifications non lues (badge)
+
+Le badge est lu en une requête indexée sur CompteurNotifications.
+Les compteurs sont ajustés à l'écriture :
+- publication / désactivation / réactivation / suppression d'une notification
+  (signaux, voir notifications/signals.py) : un UPDATE sur les destinataires
+- mark_read, mark_unread, hide, mark_all_read (vues) : un UPDATE sur l'utilisateur
+
+Une notification compte comme non lue pour un utilisateur si elle est active,
+lui est destinée et qu'il ne l'a ni lue ni masquée.
+"""
+
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+
+from users.models import CustomUser
+from .models import Notification, NotificationStatus, CompteurNotifications
+
+
+def _ajuster(compteurs, delta):
+    """Ajoute delta aux compteurs (sans jamais passer sous zéro)"""
+    if delta:
+        compteurs.update(non_lues=Greatest(F('non_lues') + delta, Value(0)))
+
+
+def ajuster_utilisateur(user, delta):
+    """Ajuster le compteur d'un utilisateur (lecture, masquage...)"""
+    _ajuster(CompteurNotifications.objects.filter(user=user), delta)
+
+
+def est_comptee(statut):
+    """Un statut (éventuellement absent) laisse-t-il la notification non lue ?"""
+    return statut is None or not (statut.lue or statut.supprimee)
+
+
+def _destinataires_non_lus(notification):
+    """Destinataires qui n'ont ni lu ni masqué la notification"""
+    deja_traites = NotificationStatus.objects.filter(
+        notification=notification
+    ).filter(Q(lue=True) | Q(supprimee=True)).values('user_id')
+    return notification.destinataires().exclude(id__in=deja_traites)
+
+
+def notification_publiee(notification):
+    """Nouvelle notification active : +1 pour chaque destinataire"""
+    _ajuster(
+        CompteurNotifications.objects.filter(user__in=notification.destinataires()),
+        1
+    )
+
+
+def notification_retiree(notification):
+    """Notification désactivée ou supprimée : -1 là où elle était non lue"""
+    _ajuster(
+        CompteurNotifications.objects.filter(user__in=_destinataires_non_lus(notification)),
+        -1
+    )
+
+
+def notification_reactivee(notification):
+    """Notification réactivée : +1 là où elle n'a été ni lue ni masquée"""
+    _ajuster(
+        CompteurNotifications.objects.filter(user__in=_destinataires_non_lus(notification)),
+        1
+    )
+
+
+def compteur_non_lues(user):
+    """
+    Valeur du badge (une requête indexée)
+    Le compteur est initialisé depuis la boîte de réception s'il n'existe pas encore
+    """
+    non_lues = CompteurNotifications.objects.filter(user=user).values_list(
+        'non_lues', flat=True
+    ).first()
+    if non_lues is None:
+        non_lues = initialiser_compteur(user).non_lues
+    return non_lues
+
+
+def initialiser_compteur(user):
+    """Créer (ou recalculer) le compteur d'un utilisateur depuis sa boîte de réception"""
+    non_lues = Notification.objects.boite_de_reception(user).non_lues().count()
+    compteur, created = CompteurNotifications.objects.update_or_create(
+        user=user,
+        defaults={'non_lues': non_lues}
+    )
+    return compteur
+
+
+def reconcilier_compteurs(batch_size=1000):
+    """
+    Reconstruit tous les compteurs à partir des notifications actives et de
+    NotificationStatus, en un nombre fixe de requêtes groupées
+    Retourne le nombre de compteurs écrits
+    """
+    actives = Notification.objects.filter(active=True)
+
+    # Notifications diffusées par audience
+    par_audience = Counter(dict(
+        actives.exclude(recipient_type='specific').order_by().values_list(
+            'recipient_type'
+        ).annotate(nombre=Count('id'))
+    ))
+
+    # Le créateur ne reçoit pas ses propres notifications
+    propres = Counter()
+    for createur_id, recipient_type, nombre in actives.exclude(
+        recipient_type='specific'
+    ).exclude(created_by=None).order_by().values_list(
+        'created_by_id', 'recipient_type'
+    ).annotate(nombre=Count('id')):
+        propres[(createur_id, recipient_type)] += nombre
+
+    # Envois spécifiques
+    specifiques = Counter()
+    for createur_id, destinataires in actives.filter(
+        recipient_type='specific'
+    ).values_list('created_by_id', 'specific_recipients'):
+        for user_id in set(destinataires or []):
+            if user_id != createur_id:
+                specifiques[user_id] += 1
+
+    # Notifications actives lues ou masquées
+    traitees = Counter(dict(
+        NotificationStatus.objects.filter(notification__active=True).filter(
+            Q(lue=True) | Q(supprimee=True)
+        ).order_by().values_list('user_id').annotate(nombre=Count('id'))
+    ))
+
+    audience_du_type = {'client': 'clients', 'entreprise': 'entreprises'}
+    total = 0
+    compteurs = []
+
+    # MySQL (ON DUPLICATE KEY UPDATE) n'accepte pas de colonnes cibles
+    cible = ['user'] if connection.features.supports_update_conflicts_with_target else None
+
+    def ecrire(compteurs):
+        CompteurNotifications.objects.bulk_create(
+            compteurs,
+            update_conflicts=True,
+            unique_fields=cible,
+            update_fields=['non_lues']
+        )
+
+    users = CustomUser.objects.order_by('pk').values_list('id', 'user_type')
+    for user_id, user_type in users.iterator(chunk_size=batch_size):
+        audiences = ['all']
+        if user_type in audience_du_type:
+            audiences.append(audience_du_type[user_type])
+
+        non_lues = (
+            sum(par_audience[audience] - propres[(user_id, audience)] for audience in audiences)
+            + specifiques[user_id]
+            - traitees[user_id]
+        )
+        compteurs.append(CompteurNotifications(user_id=user_id, non_lues=max(non_lues, 0)))
+
+        if len(compteurs) >= batch_size:
+            ecrire(compteurs)
+            total += len(compteurs)
+            compteurs = []
+
+    if compteurs:
+        ecrire(compteurs)
+        total += len(compteurs)
+
+    return total
@@ -0,0 +1,21 @@
+# notifications/management/commands/reconcilier_compteurs_notifications.py
+
+from django.core.management.base import BaseCommand
+from notifications.compteurs import reconcilier_compteurs
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les compteurs de notifications non lues à partir de NotificationStatus'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre de compteurs écrits par requête (défaut: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🔄 Reconstruction des compteurs de notifications...'))
+        total = reconcilier_compteurs(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} compteur(s) reconstruit(s)'))
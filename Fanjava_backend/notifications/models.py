@@ -1,10 +1,65 @@
 # notifications/models.py - NOUVELLE ARCHITECTURE
 
-from django.db import models
+from django.db import connections, models
+from django.db.models import Count, F, FilteredRelation, Q, Value
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 from users.models import CustomUser
 
 
+class NotificationQuerySet(models.QuerySet):
+    """Requêtes ensemblistes pour la boîte de réception"""
+    
+    def pour_utilisateur(self, user):
+        """
+        Notifications actives destinées à l'utilisateur
+        (même règles que Notification.is_for_user, mais en SQL)
+        """
+        cible = Q(recipient_type='all')
+        if user.user_type == 'client':
+            cible |= Q(recipient_type='clients')
+        elif user.user_type == 'entreprise':
+            cible |= Q(recipient_type='entreprises')
+        
+        if connections[self.db].features.supports_json_field_contains:
+            cible |= Q(recipient_type='specific', specific_recipients__contains=[user.id])
+        else:
+            # SQLite : pas de JSON_CONTAINS, on cherche l'id dans le texte JSON "[1, 2, 3]"
+            cible |= Q(
+                recipient_type='specific',
+                specific_recipients__regex=rf'[\[,\s]{int(user.id)}[\],\s]'
+            )
+        
+        return self.filter(cible, active=True).exclude(created_by_id=user.id)
+    
+    def avec_statut(self, user):
+        """
+        LEFT JOIN sur le statut de l'utilisateur (qui peut ne pas exister)
+        Ajoute statut_lue, statut_date_lecture et exclut les notifications masquées
+        """
+        return self.annotate(
+            statut_user=FilteredRelation(
+                'user_statuses',
+                condition=Q(user_statuses__user=user)
+            )
+        ).filter(
+            Q(statut_user__isnull=True) | Q(statut_user__supprimee=False)
+        ).annotate(
+            statut_lue=Coalesce(F('statut_user__lue'), Value(False)),
+            statut_date_lecture=F('statut_user__date_lecture')
+        )
+    
+    def boite_de_reception(self, user):
+        """Boîte de réception complète de l'utilisateur, la plus récente en premier"""
+        return self.pour_utilisateur(user).avec_statut(user).select_related(
+            'created_by'
+        ).order_by('-created_at', '-id')
+    
+    def non_lues(self):
+        """À chaîner après avec_statut()"""
+        return self.filter(statut_lue=False)
+
+
 class Notification(models.Model):
     """
     Notification globale créée par l'admin
@@ -86,6 +141,8 @@ class Notification(models.Model):
         verbose_name=_("Date de création")
     )
     
+    objects = NotificationQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _("Notification")
         verbose_name_plural = _("Notifications")
@@ -116,8 +173,48 @@ class Notification(models.Model):
         
         return False
     
-    def get_recipient_count(self):
-        """Nombre total de destinataires"""
+    @staticmethod
+    def compter_utilisateurs_par_type():
+        """Nombre d'utilisateurs par user_type (une seule requête groupée)"""
+        comptes = dict(
+            CustomUser.objects.order_by().values_list('user_type').annotate(Count('id'))
+        )
+        comptes['total'] = sum(comptes.values())
+        return comptes
+    
+    def destinataires(self):
+        """Utilisateurs ciblés par cette notification (miroir SQL de is_for_user)"""
+        if self.recipient_type == 'all':
+            users = CustomUser.objects.all()
+        elif self.recipient_type == 'clients':
+            users = CustomUser.objects.filter(user_type='client')
+        elif self.recipient_type == 'entreprises':
+            users = CustomUser.objects.filter(user_type='entreprise')
+        elif self.recipient_type == 'specific':
+            users = CustomUser.objects.filter(id__in=self.specific_recipients or [])
+        else:
+            users = CustomUser.objects.none()
+        
+        if self.created_by_id:
+            users = users.exclude(id=self.created_by_id)
+        return users
+    
+    def get_recipient_count(self, comptes=None):
+        """
+        Nombre total de destinataires
+        `comptes` (voir compter_utilisateurs_par_type) évite une requête par notification
+        """
+        if comptes is not None:
+            if self.recipient_type == 'all':
+                return comptes['total'] - (1 if self.created_by_id else 0)
+            elif self.recipient_type == 'clients':
+                return comptes.get('client', 0)
+            elif self.recipient_type == 'entreprises':
+                return comptes.get('entreprise', 0)
+            elif self.recipient_type == 'specific':
+                return len(self.specific_recipients or [])
+            return 0
+        
         if self.recipient_type == 'all':
             count = CustomUser.objects.exclude(id=self.created_by_id).count()
         elif self.recipient_type == 'clients':
@@ -194,17 +291,60 @@ class NotificationStatus(models.Model):
         return f"{self.user.username} - {self.notification.titre}"
     
     def marquer_comme_lue(self):
-        """Marque comme lue"""
+        """Marque comme lue (retourne True si le statut a changé)"""
         from django.utils import timezone
+        if self.lue:
+            return False
+        self.lue = True
+        self.date_lecture = timezone.now()
+        # UPDATE conditionnel : deux requêtes simultanées ne comptent qu'une fois
+        return NotificationStatus.objects.filter(pk=self.pk, lue=False).update(
+            lue=True, date_lecture=self.date_lecture
+        ) == 1
+    
+    def marquer_comme_non_lue(self):
+        """Marque comme non lue (retourne True si le statut a changé)"""
         if not self.lue:
-            self.lue = True
-            self.date_lecture = timezone.now()
-            self.save()
+            return False
+        self.lue = False
+        self.date_lecture = None
+        return NotificationStatus.objects.filter(pk=self.pk, lue=True).update(
+            lue=False, date_lecture=None
+        ) == 1
     
     def masquer(self):
-        """Masque la notification pour l'utilisateur (soft delete)"""
+        """Masque la notification pour l'utilisateur (soft delete, retourne True si changé)"""
         from django.utils import timezone
-        if not self.supprimee:
-            self.supprimee = True
-            self.date_suppression = timezone.now()
-            self.save()
\ No newline at end of file
+        if self.supprimee:
+            return False
+        self.supprimee = True
+        self.date_suppression = timezone.now()
+        return NotificationStatus.objects.filter(pk=self.pk, supprimee=False).update(
+            supprimee=True, date_suppression=self.date_suppression
+        ) == 1
+
+class CompteurNotifications(models.Model):
+    """
+    Nombre de notifications non lues par utilisateur (badge)
+    Maintenu à l'écriture par notifications/compteurs.py, reconstruit par
+    la commande reconcilier_compteurs_notifications
+    """
+    
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='compteur_notifications',
+        verbose_name=_("Utilisateur")
+    )
+    
+    non_lues = models.IntegerField(
+        default=0,
+        verbose_name=_("Notifications non lues")
+    )
+    
+    class Meta:
+        verbose_name = _("Compteur de notifications")
+        verbose_name_plural = _("Compteurs de notifications")
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.non_lues} non lue(s)"
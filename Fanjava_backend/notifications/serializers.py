@@ -38,10 +38,14 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'created_by']
     
     def get_recipient_count(self, obj):
-        return obj.get_recipient_count()
+        return obj.get_recipient_count(self.context.get('comptes_utilisateurs'))
     
     def get_lue(self, obj):
         """Récupérer le statut de lecture pour l'utilisateur actuel"""
+        # Annoté par Notification.objects.avec_statut() : pas de requête
+        if hasattr(obj, 'statut_lue'):
+            return bool(obj.statut_lue)
+        
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             status = NotificationStatus.objects.filter(
@@ -53,6 +57,9 @@ class NotificationSerializer(serializers.ModelSerializer):
     
     def get_date_lecture(self, obj):
         """Récupérer la date de lecture pour l'utilisateur actuel"""
+        if hasattr(obj, 'statut_date_lecture'):
+            return obj.statut_date_lecture
+        
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             status = NotificationStatus.objects.filter(
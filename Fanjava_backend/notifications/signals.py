@@ -0,0 +1,51 @@
+# notifications/signals.py
+
+from django.db.models.signals import pre_save, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import CustomUser
+from .models import Notification
+from . import compteurs
+
+
+@receiver(pre_save, sender=Notification)
+def memoriser_etat_actif(sender, instance, **kwargs):
+    """Retenir l'ancienne valeur de `active` pour détecter un basculement"""
+    instance._active_precedent = None
+    if instance.pk:
+        instance._active_precedent = Notification.objects.filter(
+            pk=instance.pk
+        ).values_list('active', flat=True).first()
+
+
+@receiver(post_save, sender=Notification)
+def notification_enregistree(sender, instance, created, raw=False, **kwargs):
+    """Publication, désactivation ou réactivation d'une notification"""
+    if raw:
+        return
+    if created:
+        if instance.active:
+            compteurs.notification_publiee(instance)
+        return
+
+    precedent = getattr(instance, '_active_precedent', None)
+    if precedent is None or precedent == instance.active:
+        return
+    if instance.active:
+        compteurs.notification_reactivee(instance)
+    else:
+        compteurs.notification_retiree(instance)
+
+
+@receiver(pre_delete, sender=Notification)
+def notification_supprimee(sender, instance, **kwargs):
+    """Avant la suppression (les statuts existent encore)"""
+    if instance.active:
+        compteurs.notification_retiree(instance)
+
+
+@receiver(post_save, sender=CustomUser)
+def utilisateur_cree(sender, instance, created, raw=False, **kwargs):
+    """Chaque utilisateur a un compteur dès sa création"""
+    if created and not raw:
+        compteurs.initialiser_compteur(instance)
@@ -1,3 +1,185 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+from .models import Notification, NotificationStatus, CompteurNotifications
+
+
+class NotificationsTestCase(TestCase):
+    """Un admin, un client et une entreprise ; requêtes faites en tant que client"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username='admin', password='password123', user_type='admin', is_staff=True
+        )
+        cls.client_user = CustomUser.objects.create_user(
+            username='client', password='password123', user_type='client'
+        )
+        cls.entreprise_user = CustomUser.objects.create_user(
+            username='entreprise', password='password123', user_type='entreprise'
+        )
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def notifier(self, recipient_type='all', **extra):
+        return Notification.objects.create(
+            created_by=self.admin,
+            type_notification='general',
+            titre=f'Notification {recipient_type}',
+            message='Message de test',
+            recipient_type=recipient_type,
+            **extra
+        )
+
+
+class BoiteDeReceptionTests(NotificationsTestCase):
+    """La boîte de réception est calculée en SQL, sans boucle par notification"""
+
+    def test_ciblage(self):
+        pour_tous = self.notifier('all')
+        pour_clients = self.notifier('clients')
+        self.notifier('entreprises')
+        specifique = self.notifier('specific', specific_recipients=[self.client_user.id])
+        self.notifier('specific', specific_recipients=[self.entreprise_user.id])
+        self.notifier('all', active=False)
+
+        ids = set(
+            Notification.objects.boite_de_reception(self.client_user).values_list('id', flat=True)
+        )
+        self.assertEqual(ids, {pour_tous.id, pour_clients.id, specifique.id})
+        # Le créateur ne reçoit pas sa propre notification
+        self.assertFalse(Notification.objects.boite_de_reception(self.admin).exists())
+
+        for notification in Notification.objects.all():
+            self.assertEqual(
+                notification.id in ids,
+                notification.active and notification.is_for_user(self.client_user)
+            )
+
+    def test_liste_nombre_requetes_constant(self):
+        for _ in range(30):
+            self.notifier('all')
+
+        with self.assertNumQueries(3):
+            response = self.api.get('/api/notifications/')
+
+        self.assertEqual(response.data['count'], 30)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertFalse(response.data['results'][0]['lue'])
+        # Aucun statut créé à la simple lecture de la boîte
+        self.assertFalse(NotificationStatus.objects.exists())
+
+    def test_statuts_lue_et_masquee(self):
+        lue = self.notifier('all')
+        masquee = self.notifier('all')
+        self.notifier('all')
+        NotificationStatus.objects.create(notification=lue, user=self.client_user, lue=True)
+        NotificationStatus.objects.create(notification=masquee, user=self.client_user, supprimee=True)
+        # Le statut d'un autre utilisateur ne compte pas
+        NotificationStatus.objects.create(notification=masquee, user=self.entreprise_user, lue=True)
+
+        response = self.api.get('/api/notifications/')
+        resultats = {item['id']: item['lue'] for item in response.data['results']}
+        self.assertNotIn(masquee.id, resultats)
+        self.assertTrue(resultats[lue.id])
+
+        with self.assertNumQueries(1):
+            non_lues = Notification.objects.boite_de_reception(self.client_user).non_lues().count()
+        self.assertEqual(non_lues, 1)
+
+    def test_mark_all_read(self):
+        deja_statut = self.notifier('all')
+        NotificationStatus.objects.create(notification=deja_statut, user=self.client_user)
+        for _ in range(5):
+            self.notifier('all')
+
+        response = self.api.post('/api/notifications/mark_all_read/')
+
+        self.assertEqual(response.data['count'], 6)
+        self.assertEqual(
+            NotificationStatus.objects.filter(user=self.client_user, lue=True).count(), 6
+        )
+        self.assertEqual(self.api.get('/api/notifications/unread_count/').data['count'], 0)
+
+
+class CompteurNonLuesTests(NotificationsTestCase):
+    """Le badge est un compteur maintenu à l'écriture"""
+
+    def badge(self):
+        with self.assertNumQueries(1):
+            return self.api.get('/api/notifications/unread_count/').data['count']
+
+    def verifier_coherence(self):
+        """Le compteur doit toujours égaler le calcul complet"""
+        for user in CustomUser.objects.all():
+            attendu = Notification.objects.boite_de_reception(user).non_lues().count()
+            self.assertEqual(
+                CompteurNotifications.objects.get(user=user).non_lues, attendu, user.username
+            )
+
+    def test_cycle_de_vie(self):
+        premiere = self.notifier('all')
+        seconde = self.notifier('clients')
+        self.notifier('entreprises')
+        self.assertEqual(self.badge(), 2)
+        self.verifier_coherence()
+
+        self.api.post(f'/api/notifications/{premiere.id}/mark_read/')
+        self.api.post(f'/api/notifications/{premiere.id}/mark_read/')
+        self.assertEqual(self.badge(), 1)
+
+        self.api.post(f'/api/notifications/{premiere.id}/mark_unread/')
+        self.assertEqual(self.badge(), 2)
+
+        self.api.delete(f'/api/notifications/{seconde.id}/hide/')
+        self.assertEqual(self.badge(), 1)
+        self.verifier_coherence()
+
+        premiere.active = False
+        premiere.save()
+        self.assertEqual(self.badge(), 0)
+        premiere.active = True
+        premiere.save()
+        self.assertEqual(self.badge(), 1)
+        self.verifier_coherence()
+
+        self.api.post('/api/notifications/mark_all_read/')
+        self.assertEqual(self.badge(), 0)
+
+        self.notifier('specific', specific_recipients=[self.client_user.id])
+        self.assertEqual(self.badge(), 1)
+        self.verifier_coherence()
+
+    @override_settings(JOBS_SYNCHRONES=False)
+    def test_badge_ajuste_sans_worker(self):
+        """Les badges des destinataires sont ajustés dans la transaction, sans tâche de fond"""
+        from jobs.models import Job
+
+        notification = self.notifier('clients')
+        self.assertEqual(self.badge(), 1)
+        notification.delete()
+        self.assertEqual(self.badge(), 0)
+        self.assertFalse(Job.objects.exists())
+        self.verifier_coherence()
+
+    def test_nouvel_utilisateur_et_reconciliation(self):
+        self.notifier('all')
+        self.notifier('entreprises')
+        nouveau = CustomUser.objects.create_user(
+            username='nouveau', password='password123', user_type='entreprise'
+        )
+        self.assertEqual(CompteurNotifications.objects.get(user=nouveau).non_lues, 2)
+
+        lue = self.notifier('clients')
+        NotificationStatus.objects.create(notification=lue, user=self.client_user, lue=True)
+        CompteurNotifications.objects.update(non_lues=42)
+
+        call_command('reconcilier_compteurs_notifications', stdout=StringIO())
+
+        self.verifier_coherence()
@@ -7,7 +7,9 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.utils import timezone
 from django.db.models import Q
 
+from Fanjava_backend.instrumentation import SerialisationMesureeMixin
 from .models import Notification, NotificationStatus
+from . import compteurs
 from .serializers import (
     NotificationSerializer,
     NotificationCreateSerializer,
@@ -16,59 +18,40 @@ from .serializers import (
 )
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(SerialisationMesureeMixin, viewsets.ModelViewSet):
     """
     ViewSet pour les notifications V2
     """
     permission_classes = [IsAuthenticated]
     serializer_class = NotificationSerializer
+    # Requêtes SQL max par action, authentification JWT comprise
+    budget_requetes = {'list': 4, 'unread_count': 2}
     
     def get_queryset(self):
         """
         Retourne les notifications pertinentes pour l'utilisateur connecté
-        avec leurs statuts
+        avec leurs statuts (une seule requête, LEFT JOIN sur NotificationStatus)
         """
-        user = self.request.user
-        
-        # Récupérer toutes les notifications actives destinées à l'utilisateur
-        notifications = Notification.objects.filter(
-            active=True
-        ).order_by('-created_at')
-        
-        # Filtrer celles qui sont pour cet utilisateur
-        result = []
-        for notif in notifications:
-            if notif.is_for_user(user):
-                # Récupérer ou créer le statut pour cet utilisateur
-                status_obj, created = NotificationStatus.objects.get_or_create(
-                    notification=notif,
-                    user=user
-                )
-                
-                # Ne pas inclure si masquée
-                if not status_obj.supprimee:
-                    result.append(notif)
-        
-        return result
+        return Notification.objects.boite_de_reception(self.request.user)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            # Une requête groupée pour tous les recipient_count de la page
+            context['comptes_utilisateurs'] = Notification.compter_utilisateurs_par_type()
+        return context
     
     def list(self, request, *args, **kwargs):
-        """Liste des notifications avec leurs statuts"""
-        notifications = self.get_queryset()
+        """Liste paginée des notifications avec leurs statuts"""
+        queryset = self.get_queryset()
         
-        # Préparer les données avec statuts
-        data = []
-        for notif in notifications:
-            status_obj = NotificationStatus.objects.get(
-                notification=notif,
-                user=request.user
-            )
-            
-            notif_data = NotificationSerializer(notif).data
-            notif_data['lue'] = status_obj.lue
-            notif_data['date_lecture'] = status_obj.date_lecture
-            data.append(notif_data)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         
-        return Response(data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def mark_read(self, request, pk=None):
@@ -90,7 +73,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
             )
             
             # Marquer comme lue
-            status_obj.marquer_comme_lue()
+            if status_obj.marquer_comme_lue() and notification.active and not status_obj.supprimee:
+                compteurs.ajuster_utilisateur(request.user, -1)
             
             return Response({'status': 'marked as read'})
             
@@ -119,9 +103,9 @@ class NotificationViewSet(viewsets.ModelViewSet):
                     notification=notification,
                     user=request.user
                 )
-                status_obj.lue = False
-                status_obj.date_lecture = None
-                status_obj.save()
+                if (status_obj.marquer_comme_non_lue() and notification.active
+                        and not status_obj.supprimee):
+                    compteurs.ajuster_utilisateur(request.user, 1)
                 
                 return Response({'status': 'marked as unread'})
             except NotificationStatus.DoesNotExist:
@@ -136,18 +120,41 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def mark_all_read(self, request):
         """Marquer toutes les notifications comme lues"""
-        notifications = self.get_queryset()
+        maintenant = timezone.now()
+        non_lues = self.get_queryset().non_lues()
         
-        for notif in notifications:
-            status_obj, created = NotificationStatus.objects.get_or_create(
-                notification=notif,
-                user=request.user
-            )
-            status_obj.marquer_comme_lue()
+        # Statuts existants non lus / notifications sans statut
+        a_creer = []
+        a_mettre_a_jour = []
+        for notification_id, statut_id in non_lues.values_list('id', 'statut_user__id'):
+            (a_mettre_a_jour if statut_id else a_creer).append(notification_id)
+        
+        NotificationStatus.objects.bulk_create(
+            [
+                NotificationStatus(
+                    notification_id=notification_id,
+                    user=request.user,
+                    lue=True,
+                    date_lecture=maintenant
+                )
+                for notification_id in a_creer
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        mis_a_jour = 0
+        for debut in range(0, len(a_mettre_a_jour), 1000):
+            mis_a_jour += NotificationStatus.objects.filter(
+                user=request.user,
+                lue=False,
+                notification_id__in=a_mettre_a_jour[debut:debut + 1000]
+            ).update(lue=True, date_lecture=maintenant)
+        
+        compteurs.ajuster_utilisateur(request.user, -(len(a_creer) + mis_a_jour))
         
         return Response({
             'status': 'all marked as read',
-            'count': len(notifications)
+            'count': len(a_creer) + len(a_mettre_a_jour)
         })
     
     @action(detail=True, methods=['delete'], permission_classes=[IsAuthenticated])
@@ -169,8 +176,10 @@ class NotificationViewSet(viewsets.ModelViewSet):
                 user=request.user
             )
             
-            # Masquer
-            status_obj.masquer()
+            # Masquer (une notification non lue disparaît du badge)
+            etait_lue = status_obj.lue
+            if status_obj.masquer() and notification.active and not etait_lue:
+                compteurs.ajuster_utilisateur(request.user, -1)
             
             return Response({'status': 'notification hidden'})
             
@@ -182,23 +191,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def unread_count(self, request):
-        """Nombre de notifications non lues"""
-        notifications = self.get_queryset()
-        
-        unread = 0
-        for notif in notifications:
-            try:
-                status_obj = NotificationStatus.objects.get(
-                    notification=notif,
-                    user=request.user
-                )
-                if not status_obj.lue:
-                    unread += 1
-            except NotificationStatus.DoesNotExist:
-                # Si pas de statut, c'est non lu
-                unread += 1
-        
-        return Response({'count': unread})
+        """Nombre de notifications non lues (compteur maintenu à l'écriture)"""
+        return Response({'count': compteurs.compteur_non_lues(request.user)})
     
     @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
     def create_notification(self, request):
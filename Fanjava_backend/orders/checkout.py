@@ -0,0 +1,163 @@
+# orders/checkout.py
+"""
+Création des commandes depuis le panier
+
+Toutes les écritures se font dans une transaction :
+1. verrou sur le panier (évite un double passage de commande)
+2. un seul SELECT ... FOR UPDATE sur les produits, triés par id
+   (ordre déterministe => pas d'interblocage entre deux paniers)
+3. vérification du stock de chaque article (erreurs détaillées)
+4. un seul UPDATE conditionnel (stock >= quantité) pour décrémenter
+   stock et nombre_ventes via F()
+5. une commande par entreprise, lignes insérées avec bulk_create
+"""
+
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from products import cache
+from products.models import Produit
+from .models import Panier, Commande, LigneCommande
+
+
+class PanierVide(Exception):
+    """Le panier ne contient aucun article"""
+
+
+class StockInsuffisant(Exception):
+    """Un ou plusieurs articles ne sont plus disponibles en quantité suffisante"""
+
+    def __init__(self, erreurs):
+        self.erreurs = erreurs
+        noms = ', '.join(erreur['nom_produit'] for erreur in erreurs)
+        super().__init__(f"Stock insuffisant pour: {noms}")
+
+
+def _erreur_stock(produit, quantite, disponible):
+    return {
+        'produit_id': produit.pk,
+        'nom_produit': produit.nom,
+        'quantite_demandee': quantite,
+        'stock_disponible': disponible,
+    }
+
+
+def _quantite_par_produit(quantites):
+    """CASE id WHEN ... THEN quantité ... END"""
+    return Case(
+        *[When(pk=produit_id, then=Value(quantite)) for produit_id, quantite in quantites],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _decrementer_stocks(quantites):
+    """
+    Décrémente stock et nombre_ventes de tous les produits en une requête
+    La requête ne touche que les lignes dont le stock suffit encore
+    Retourne le nombre de produits mis à jour
+    """
+    quantites = list(quantites.items())
+    condition = reduce(or_, [
+        Q(pk=produit_id, stock__gte=quantite) for produit_id, quantite in quantites
+    ])
+    return Produit.objects.filter(condition).update(
+        stock=F('stock') - _quantite_par_produit(quantites),
+        nombre_ventes=F('nombre_ventes') + _quantite_par_produit(quantites)
+    )
+
+
+def creer_commandes_depuis_panier(client, donnees_livraison):
+    """
+    Crée une commande par entreprise à partir du panier du client
+    Lève PanierVide ou StockInsuffisant (avec le détail par article)
+    Retourne la liste des commandes créées
+    """
+    with transaction.atomic():
+        panier = Panier.objects.select_for_update().get(client=client)
+        items = list(panier.items.all())
+        if not items:
+            raise PanierVide("Le panier est vide")
+
+        quantites = defaultdict(int)
+        for item in items:
+            quantites[item.produit_id] += item.quantite
+
+        # Verrouiller tous les produits en une requête, dans un ordre fixe
+        produits = {
+            produit.pk: produit
+            for produit in Produit.objects.select_for_update().filter(
+                pk__in=quantites.keys()
+            ).order_by('pk')
+        }
+
+        erreurs = [
+            _erreur_stock(produits[produit_id], quantite, produits[produit_id].stock)
+            for produit_id, quantite in quantites.items()
+            if produits[produit_id].stock < quantite
+        ]
+        if erreurs:
+            raise StockInsuffisant(erreurs)
+
+        if _decrementer_stocks(quantites) != len(quantites):
+            # Stock modifié entre la lecture et l'écriture (base sans FOR UPDATE)
+            stocks = dict(
+                Produit.objects.filter(pk__in=quantites.keys()).values_list('pk', 'stock')
+            )
+            raise StockInsuffisant([
+                _erreur_stock(produits[produit_id], quantite, stocks.get(produit_id, 0))
+                for produit_id, quantite in quantites.items()
+                if stocks.get(produit_id, 0) < quantite
+            ])
+
+        # Regrouper les articles par entreprise
+        items_par_entreprise = defaultdict(list)
+        for item in items:
+            produit = produits[item.produit_id]
+            items_par_entreprise[produit.entreprise_id].append((item, produit))
+
+        commandes = []
+        lignes = []
+        for entreprise_id, articles in items_par_entreprise.items():
+            montant_total = sum(
+                produit.get_prix_final() * item.quantite for item, produit in articles
+            )
+            commande = Commande.objects.create(
+                client=client,
+                entreprise_id=entreprise_id,
+                montant_total=montant_total,
+                frais_livraison=donnees_livraison['frais_livraison'],
+                adresse_livraison=donnees_livraison['adresse_livraison'],
+                ville_livraison=donnees_livraison['ville_livraison'],
+                code_postal_livraison=donnees_livraison['code_postal_livraison'],
+                pays_livraison=donnees_livraison['pays_livraison'],
+                telephone_livraison=donnees_livraison['telephone_livraison'],
+                note_client=donnees_livraison.get('note_client', ''),
+            )
+            commandes.append(commande)
+
+            # bulk_create n'appelle pas save() : snapshot et total calculés ici
+            for item, produit in articles:
+                prix_unitaire = produit.get_prix_final()
+                lignes.append(LigneCommande(
+                    commande=commande,
+                    produit=produit,
+                    nom_produit=produit.nom,
+                    prix_unitaire=prix_unitaire,
+                    quantite=item.quantite,
+                    prix_total=prix_unitaire * item.quantite
+                ))
+
+        LigneCommande.objects.bulk_create(lignes)
+
+        # Vider le panier
+        panier.items.all().delete()
+
+        # Les stocks ont changé sans passer par save() : pas de signal
+        cache.invalider_apres_commit(cache.PRODUITS)
+
+    return commandes
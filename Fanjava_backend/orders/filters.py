@@ -0,0 +1,27 @@
+# orders/filters.py
+
+from datetime import timedelta
+
+import django_filters
+
+from users.filters import debut_du_jour
+from .models import Commande
+
+
+class CommandeFilter(django_filters.FilterSet):
+    """
+    Filtres des commandes (liste et exports)
+    Les dates sont converties en bornes datetime (index sur created_at utilisable)
+    """
+    passee_apres = django_filters.DateFilter(method='filtrer_passee_apres')
+    passee_avant = django_filters.DateFilter(method='filtrer_passee_avant')
+
+    class Meta:
+        model = Commande
+        fields = ['status']
+
+    def filtrer_passee_apres(self, queryset, name, value):
+        return queryset.filter(created_at__gte=debut_du_jour(value))
+
+    def filtrer_passee_avant(self, queryset, name, value):
+        return queryset.filter(created_at__lt=debut_du_jour(value + timedelta(days=1)))
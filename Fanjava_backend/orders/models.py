@@ -1,10 +1,11 @@
 # orders/models.py
 
 from django.db import models
+from django.db.models import OuterRef, Subquery
 from django.core.validators import MinValueValidator
 from django.utils.translation import gettext_lazy as _
 from users.models import Client, Entreprise
-from products.models import Produit
+from products.models import Produit, ImageProduit
 import random
 import string
 
@@ -50,6 +51,20 @@ class Panier(models.Model):
     def get_nombre_items(self):
         """Retourne le nombre total d'articles"""
         return sum(item.quantite for item in self.items.all())
+    
+    def get_items_detailles(self):
+        """
+        Articles avec produit, entreprise et image principale en une seule requête
+        (l'image principale est lue par sous-requête : chemin dans `image_principale`,
+        empreinte de ses dérivées dans `image_principale_empreinte`)
+        """
+        image_principale = ImageProduit.objects.filter(
+            produit=OuterRef('produit_id')
+        ).order_by('-est_principale', 'ordre', 'id')
+        return self.items.select_related('produit__entreprise').annotate(
+            image_principale=Subquery(image_principale.values('image')[:1]),
+            image_principale_empreinte=Subquery(image_principale.values('empreinte')[:1])
+        ).order_by('created_at', 'id')
 
 
 class PanierItem(models.Model):
@@ -96,6 +111,25 @@ class PanierItem(models.Model):
         return self.produit.get_prix_final() * self.quantite
 
 
+class CommandeQuerySet(models.QuerySet):
+    """Requêtes ensemblistes sur les commandes"""
+    
+    def visibles_par(self, user):
+        """
+        Commandes accessibles à l'utilisateur
+        - Client : ses propres commandes
+        - Entreprise : commandes reçues
+        - Admin : toutes les commandes
+        """
+        if hasattr(user, 'client'):
+            return self.filter(client=user.client)
+        if hasattr(user, 'entreprise'):
+            return self.filter(entreprise=user.entreprise)
+        if user.is_staff or user.is_superuser:
+            return self.all()
+        return self.none()
+
+
 class Commande(models.Model):
     """
     Commandes clients
@@ -219,6 +253,8 @@ class Commande(models.Model):
         verbose_name=_("Date de livraison réelle")
     )
     
+    objects = CommandeQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _("Commande")
         verbose_name_plural = _("Commandes")
@@ -227,6 +263,8 @@ class Commande(models.Model):
             models.Index(fields=['numero_commande']),
             models.Index(fields=['client', 'status']),
             models.Index(fields=['entreprise', 'status']),
+            models.Index(fields=['client', 'created_at', 'id']),
+            models.Index(fields=['entreprise', 'created_at', 'id']),
             models.Index(fields=['created_at']),
         ]
     
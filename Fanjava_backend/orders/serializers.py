@@ -1,10 +1,44 @@
+from decimal import Decimal
+
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Panier, PanierItem, Commande, LigneCommande
-from products.serializers import ProduitSerializer
+from products.images import nom_derivee, tailles
+from products.models import Produit
+
+
+class ProduitPanierSerializer(serializers.ModelSerializer):
+    """Résumé du produit dans le panier (sans images ni avis)"""
+    prix_final = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        read_only=True,
+        source='get_prix_final'
+    )
+    entreprise_nom = serializers.CharField(source='entreprise.nom_entreprise', read_only=True)
+    
+    class Meta:
+        model = Produit
+        fields = [
+            'id',
+            'nom',
+            'slug',
+            'prix',
+            'prix_promo',
+            'prix_final',
+            'en_promotion',
+            'stock',
+            'entreprise_nom',
+        ]
 
 
 class PanierItemSerializer(serializers.ModelSerializer):
-    produit = ProduitSerializer(read_only=True)
+    """
+    Article du panier
+    Attend les articles de Panier.get_items_detailles() (produit joint,
+    chemin de l'image principale annoté)
+    """
+    produit = ProduitPanierSerializer(read_only=True)
     produit_id = serializers.IntegerField(write_only=True)
     prix_total = serializers.DecimalField(
         max_digits=10, 
@@ -25,30 +59,57 @@ class PanierItemSerializer(serializers.ModelSerializer):
             'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+    
+    def to_representation(self, item):
+        data = super().to_representation(item)
+        data['produit']['image_principale'] = self.get_image_principale(item)
+        return data
+    
+    def get_image_principale(self, item):
+        """Miniature WebP une fois générée, sinon l'original"""
+        chemin = getattr(item, 'image_principale', None)
+        if not chemin:
+            return None
+        empreinte = getattr(item, 'image_principale_empreinte', None)
+        if empreinte and 'miniature' in tailles():
+            chemin = nom_derivee(empreinte, 'miniature', 'webp')
+        url = default_storage.url(chemin)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 class PanierSerializer(serializers.ModelSerializer):
-    items = PanierItemSerializer(many=True, read_only=True)
-    total = serializers.DecimalField(
-        max_digits=10, 
-        decimal_places=2, 
-        read_only=True,
-        source='get_total'
-    )
-    nombre_items = serializers.IntegerField(read_only=True, source='get_nombre_items')
+    """
+    Panier complet : articles chargés en une requête,
+    total et nombre d'articles calculés en un seul passage
+    """
     
     class Meta:
         model = Panier
         fields = [
             'id', 
             'client', 
-            'items', 
-            'total', 
-            'nombre_items',
             'created_at',
             'updated_at'
         ]
         read_only_fields = ['client', 'created_at', 'updated_at']
+    
+    def to_representation(self, panier):
+        data = super().to_representation(panier)
+        items = list(panier.get_items_detailles())
+        
+        total = Decimal('0.00')
+        nombre_items = 0
+        for item in items:
+            total += item.get_prix_total()
+            nombre_items += item.quantite
+        
+        data['items'] = PanierItemSerializer(items, many=True, context=self.context).data
+        data['total'] = serializers.DecimalField(
+            max_digits=10, decimal_places=2
+        ).to_representation(total)
+        data['nombre_items'] = nombre_items
+        return data
 
 
 class LigneCommandeSerializer(serializers.ModelSerializer):
@@ -116,5 +177,5 @@ class CommandeCreateSerializer(serializers.Serializer):
     frais_livraison = serializers.DecimalField(
         max_digits=10, 
         decimal_places=2, 
-        default=0.00
+        default=Decimal('0.00')
     )
\ No newline at end of file
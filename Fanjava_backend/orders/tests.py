@@ -1,3 +1,278 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from rest_framework.test import APIClient
+
+from products.models import Categorie, Produit, ImageProduit
+from products.tests import creer_client, creer_entreprise
+from .checkout import creer_commandes_depuis_panier, StockInsuffisant
+from .models import Panier, PanierItem, Commande, LigneCommande
+
+
+LIVRAISON = {
+    'adresse_livraison': '12 Rue Test',
+    'ville_livraison': 'Antananarivo',
+    'code_postal_livraison': '101',
+    'pays_livraison': 'Madagascar',
+    'telephone_livraison': '+261340000000',
+    'frais_livraison': Decimal('5.00'),
+}
+
+
+def creer_produit(entreprise, nom, stock, prix='10.00'):
+    return Produit.objects.create(
+        entreprise=entreprise,
+        categorie=Categorie.objects.get_or_create(nom='Divers')[0],
+        nom=nom,
+        description='Description de test',
+        prix=Decimal(prix),
+        stock=stock
+    )
+
+
+def remplir_panier(client, *articles):
+    """articles: (produit, quantite)"""
+    panier, created = Panier.objects.get_or_create(client=client)
+    for produit, quantite in articles:
+        PanierItem.objects.create(panier=panier, produit=produit, quantite=quantite)
+    return panier
+
+
+class CheckoutTests(TestCase):
+    """Création des commandes depuis le panier"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entreprise_a = creer_entreprise('vendeur_a')
+        cls.entreprise_b = creer_entreprise('vendeur_b')
+        cls.acheteur = creer_client()
+
+    def test_une_commande_par_entreprise(self):
+        p1 = creer_produit(self.entreprise_a, 'Riz', 10)
+        p2 = creer_produit(self.entreprise_a, 'Vanille', 10, prix='20.00')
+        p3 = creer_produit(self.entreprise_b, 'Café', 10)
+        remplir_panier(self.acheteur, (p1, 2), (p2, 1), (p3, 3))
+
+        commandes = creer_commandes_depuis_panier(self.acheteur, LIVRAISON)
+
+        self.assertEqual(len(commandes), 2)
+        commande_a = Commande.objects.get(entreprise=self.entreprise_a)
+        self.assertEqual(commande_a.montant_total, Decimal('40.00'))
+        self.assertEqual(commande_a.montant_final, Decimal('45.00'))
+        ligne = LigneCommande.objects.get(produit=p2)
+        self.assertEqual(ligne.nom_produit, 'Vanille')
+        self.assertEqual(ligne.prix_total, Decimal('20.00'))
+
+        p1.refresh_from_db()
+        self.assertEqual((p1.stock, p1.nombre_ventes), (8, 2))
+        self.assertFalse(PanierItem.objects.exists())
+
+    def test_erreurs_stock_par_article(self):
+        p1 = creer_produit(self.entreprise_a, 'Riz', 1)
+        p2 = creer_produit(self.entreprise_a, 'Vanille', 10)
+        p3 = creer_produit(self.entreprise_b, 'Café', 0)
+        remplir_panier(self.acheteur, (p1, 2), (p2, 1), (p3, 1))
+
+        with self.assertRaises(StockInsuffisant) as ctx:
+            creer_commandes_depuis_panier(self.acheteur, LIVRAISON)
+
+        self.assertEqual(
+            sorted(erreur['produit_id'] for erreur in ctx.exception.erreurs),
+            [p1.pk, p3.pk]
+        )
+        # Rien n'est écrit
+        p2.refresh_from_db()
+        self.assertEqual(p2.stock, 10)
+        self.assertFalse(Commande.objects.exists())
+        self.assertEqual(PanierItem.objects.count(), 3)
+
+    def test_endpoint_conflit_stock(self):
+        produit = creer_produit(self.entreprise_a, 'Riz', 1)
+        remplir_panier(self.acheteur, (produit, 5))
+        api = APIClient()
+        api.force_authenticate(self.acheteur.user)
+
+        data = {key: str(value) for key, value in LIVRAISON.items()}
+        response = api.post('/api/orders/commandes/create_from_cart/', data)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['articles'][0]['stock_disponible'], 1)
+
+    def test_endpoint_sans_frais_de_livraison(self):
+        produit = creer_produit(self.entreprise_a, 'Riz', 5)
+        remplir_panier(self.acheteur, (produit, 2))
+        api = APIClient()
+        api.force_authenticate(self.acheteur.user)
+
+        data = {key: str(value) for key, value in LIVRAISON.items() if key != 'frais_livraison'}
+        response = api.post('/api/orders/commandes/create_from_cart/', data)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Commande.objects.get().montant_final, Decimal('20.00'))
+
+    def test_nombre_requetes_independant_du_nombre_articles(self):
+        produits = [
+            creer_produit(self.entreprise_a, f'Article {index}', 10)
+            for index in range(20)
+        ]
+        remplir_panier(self.acheteur, *[(produit, 1) for produit in produits])
+
+        # savepoint, panier, items, produits, UPDATE, commande, lignes,
+        # vidage panier, release
+        with self.assertNumQueries(9):
+            creer_commandes_depuis_panier(self.acheteur, LIVRAISON)
+
+
+class PanierLectureTests(TestCase):
+    """Le panier est lu en un nombre fixe de requêtes, quel que soit le nombre d'articles"""
+
+    def test_panier_50_articles(self):
+        entreprise = creer_entreprise()
+        acheteur = creer_client()
+        produits = [
+            creer_produit(entreprise, f'Article {index}', 10, prix='2.50')
+            for index in range(50)
+        ]
+        for produit in produits[:10]:
+            ImageProduit.objects.create(produit=produit, image=f'produits/{produit.pk}_0.jpg', ordre=0)
+            ImageProduit.objects.create(
+                produit=produit, image=f'produits/{produit.pk}_1.jpg', ordre=1, est_principale=True
+            )
+        remplir_panier(acheteur, *[(produit, 2) for produit in produits])
+        api = APIClient()
+        api.force_authenticate(acheteur.user)
+
+        # panier, articles (produit + entreprise + image principale)
+        with self.assertNumQueries(2):
+            response = api.get('/api/orders/panier/')
+
+        self.assertEqual(len(response.data['items']), 50)
+        self.assertEqual(response.data['nombre_items'], 100)
+        self.assertEqual(response.data['total'], '250.00')
+        premier = response.data['items'][0]['produit']
+        self.assertEqual(premier['entreprise_nom'], entreprise.nom_entreprise)
+        self.assertTrue(premier['image_principale'].endswith(f'{produits[0].pk}_1.jpg'))
+        self.assertIsNone(response.data['items'][-1]['produit']['image_principale'])
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CheckoutConcurrenceTests(TransactionTestCase):
+    """Des commandes simultanées sur le même produit ne doivent jamais survendre"""
+
+    acheteurs = 8
+    stock_initial = 5
+
+    def test_pas_de_survente(self):
+        entreprise = creer_entreprise()
+        produit = creer_produit(entreprise, 'Vente flash', self.stock_initial)
+        clients = [creer_client(f'acheteur{index}') for index in range(self.acheteurs)]
+        for client in clients:
+            remplir_panier(client, (produit, 1))
+
+        resultats = []
+        depart = threading.Barrier(len(clients))
+
+        def passer_commande(client):
+            try:
+                depart.wait()
+                creer_commandes_depuis_panier(client, LIVRAISON)
+                resultats.append('ok')
+            except StockInsuffisant:
+                resultats.append('stock')
+            except Exception as e:
+                resultats.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=passer_commande, args=(c,)) for c in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        erreurs = [r for r in resultats if r not in ('ok', 'stock')]
+        self.assertEqual(erreurs, [])
+        self.assertEqual(resultats.count('ok'), self.stock_initial)
+
+        produit.refresh_from_db()
+        self.assertEqual(produit.stock, 0)
+        self.assertEqual(produit.nombre_ventes, self.stock_initial)
+        self.assertEqual(
+            sum(LigneCommande.objects.filter(produit=produit).values_list('quantite', flat=True)),
+            self.stock_initial
+        )
+
+
+class CommandesPaginationCurseurTests(TestCase):
+    """Liste des commandes en mode curseur"""
+
+    def test_parcours(self):
+        client = creer_client()
+        entreprise = creer_entreprise()
+        for _ in range(25):
+            Commande.objects.create(
+                client=client,
+                entreprise=entreprise,
+                montant_total=Decimal('10.00'),
+                **{cle: valeur for cle, valeur in LIVRAISON.items()}
+            )
+        api = APIClient()
+        api.force_authenticate(client.user)
+
+        premiere = api.get('/api/orders/commandes/?pagination=curseur')
+        seconde = api.get(premiere.data['next'])
+
+        ids = [c['id'] for c in premiere.data['results'] + seconde.data['results']]
+        self.assertEqual(
+            ids, list(Commande.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+        )
+        self.assertIsNone(seconde.data['next'])
+
+
+
+class ExportCommandesTests(TestCase):
+    """Export en streaming : une ligne par article, commandes visibles seulement"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_1 = creer_client()
+        cls.entreprise = creer_entreprise()
+        autre = creer_entreprise('concurrent')
+        produit = creer_produit(cls.entreprise, 'Lampe', 10)
+        for entreprise, statut in ((cls.entreprise, 'pending'), (cls.entreprise, 'delivered'), (autre, 'pending')):
+            commande = Commande.objects.create(
+                client=cls.client_1, entreprise=entreprise, montant_total=Decimal('20.00'),
+                status=statut, **LIVRAISON
+            )
+            for quantite in (1, 2):
+                LigneCommande.objects.create(
+                    commande=commande, produit=produit, nom_produit='Lampe',
+                    prix_unitaire=Decimal('10.00'), quantite=quantite, prix_total=Decimal('10.00') * quantite
+                )
+
+    def exporter(self, user, **params):
+        api = APIClient()
+        api.force_authenticate(user)
+        response = api.get('/api/orders/commandes/export/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8-sig')
+
+    def test_export_csv_entreprise(self):
+        lignes = list(csv.reader(io.StringIO(self.exporter(self.entreprise.user))))
+        self.assertEqual(lignes[0][:2], ['id', 'commande__numero_commande'])
+        self.assertEqual(len(lignes), 5)
+        self.assertEqual({ligne[5] for ligne in lignes[1:]}, {self.entreprise.nom_entreprise})
+
+        lignes = list(csv.reader(io.StringIO(self.exporter(self.entreprise.user, status='delivered'))))
+        self.assertEqual(len(lignes), 3)
+
+    def test_export_jsonl_client(self):
+        lignes = [json.loads(ligne) for ligne in self.exporter(self.client_1.user, format_export='jsonl').splitlines()]
+        self.assertEqual(len(lignes), 6)
+        self.assertEqual(lignes[1]['quantite'], 2)
+        self.assertEqual(lignes[1]['prix_total'], '20.00')
@@ -3,8 +3,11 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from django.db import transaction
-from collections import defaultdict
+from django.db.models import prefetch_related_objects
+
+from Fanjava_backend.instrumentation import SerialisationMesureeMixin
+from Fanjava_backend.pagination import PaginationHybride
+from Fanjava_backend.streaming import reponse_export
 
 from .models import Panier, PanierItem, Commande, LigneCommande
 from .serializers import (
@@ -12,18 +15,22 @@ from .serializers import (
     CommandeSerializer,
     CommandeCreateSerializer
 )
+from .filters import CommandeFilter
+from .checkout import creer_commandes_depuis_panier, PanierVide, StockInsuffisant
 from products.models import Produit
 
 
 class PanierViewSet(viewsets.ViewSet):
     """ViewSet pour gérer le panier du client"""
     permission_classes = [IsAuthenticated]
+    # Requêtes SQL max, authentification JWT et création du panier comprises
+    budget_requetes = {'list': 7}
     
     def list(self, request):
         """Récupérer le panier de l'utilisateur connecté"""
         client = request.user.client
         panier, created = Panier.objects.get_or_create(client=client)
-        serializer = PanierSerializer(panier)
+        serializer = PanierSerializer(panier, context={'request': request})
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'])
@@ -67,7 +74,7 @@ class PanierViewSet(viewsets.ViewSet):
             item.quantite = nouvelle_quantite
             item.save()
         
-        serializer = PanierSerializer(panier)
+        serializer = PanierSerializer(panier, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 @action(detail=False, methods=['patch'])
@@ -117,7 +124,7 @@ def update(self, request, *args, **kwargs):
         item = get_object_or_404(PanierItem, id=item_id, panier=panier)
         item.delete()
         
-        serializer = PanierSerializer(panier)
+        serializer = PanierSerializer(panier, context={'request': request})
         return Response(serializer.data)
     
     @action(detail=False, methods=['delete'])
@@ -127,41 +134,46 @@ def update(self, request, *args, **kwargs):
         panier = get_object_or_404(Panier, client=client)
         panier.items.all().delete()
         
-        serializer = PanierSerializer(panier)
+        serializer = PanierSerializer(panier, context={'request': request})
         return Response(serializer.data)
 
 
-class CommandeViewSet(viewsets.ModelViewSet):  # ← CHANGÉ DE ReadOnlyModelViewSet à ModelViewSet
+class CommandeViewSet(SerialisationMesureeMixin, viewsets.ModelViewSet):  # ← CHANGÉ DE ReadOnlyModelViewSet à ModelViewSet
     """ViewSet pour gérer les commandes"""
     permission_classes = [IsAuthenticated]
     serializer_class = CommandeSerializer
+    pagination_class = PaginationHybride
+    keyset_ordering_fields = ['created_at']
+    filterset_class = CommandeFilter
+    budget_requetes = {'list': 5, 'retrieve': 4}
+    
+    # Colonnes de l'export : une ligne par article commandé
+    colonnes_export = [
+        'id',
+        'commande__numero_commande',
+        'commande__created_at',
+        'commande__status',
+        'commande__client__user__username',
+        'commande__entreprise__nom_entreprise',
+        'commande__montant_total',
+        'commande__frais_livraison',
+        'commande__montant_final',
+        'commande__ville_livraison',
+        'commande__pays_livraison',
+        'commande__numero_suivi',
+        'produit',
+        'nom_produit',
+        'prix_unitaire',
+        'quantite',
+        'prix_total',
+    ]
     
     def get_queryset(self):
-        """
-        Retourner les commandes selon le type d'utilisateur
-        - Client : ses propres commandes
-        - Entreprise : commandes reçues
-        - Admin : toutes les commandes
-        """
-        user = self.request.user
-        
-        # Si c'est un client
-        if hasattr(user, 'client'):
-            return Commande.objects.filter(
-                client=user.client
-            ).prefetch_related('lignes')
-        
-        # Si c'est une entreprise
-        elif hasattr(user, 'entreprise'):
-            return Commande.objects.filter(
-                entreprise=user.entreprise
-            ).prefetch_related('lignes', 'client__user')
-        
-        # Si c'est un admin
-        elif user.is_staff or user.is_superuser:
-            return Commande.objects.all().prefetch_related('lignes', 'client__user')
-        
-        return Commande.objects.none()
+        """Commandes visibles par l'utilisateur (voir CommandeQuerySet.visibles_par)"""
+        commandes = Commande.objects.visibles_par(self.request.user)
+        if hasattr(self.request.user, 'client'):
+            return commandes.prefetch_related('lignes')
+        return commandes.prefetch_related('lignes', 'client__user')
     
     def update(self, request, *args, **kwargs):
         """
@@ -193,6 +205,16 @@ class CommandeViewSet(viewsets.ModelViewSet):  # ← CHANGÉ DE ReadOnlyModelVie
         """Permettre les mises à jour partielles (PATCH)"""
         return self.update(request, *args, **kwargs)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Export des commandes visibles et de leurs lignes en streaming
+        ?format_export=csv|json|jsonl, filtres status, passee_apres, passee_avant
+        """
+        commandes = self.filter_queryset(Commande.objects.visibles_par(request.user))
+        lignes = LigneCommande.objects.filter(commande__in=commandes.values('pk'))
+        return reponse_export(request, lignes, self.colonnes_export, 'commandes')
+    
     @action(detail=False, methods=['post'])
     def create_from_cart(self, request):
         """Créer une ou plusieurs commandes depuis le panier (une par entreprise)"""
@@ -214,75 +236,30 @@ class CommandeViewSet(viewsets.ModelViewSet):  # ← CHANGÉ DE ReadOnlyModelVie
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        validated_data = create_serializer.validated_data
-        
-        # Regrouper les items du panier par entreprise
-        items_par_entreprise = defaultdict(list)
-        
-        for item in panier.items.all():
-            entreprise = item.produit.entreprise
-            items_par_entreprise[entreprise].append(item)
-        
-        # Transaction atomique pour créer toutes les commandes
         try:
-            with transaction.atomic():
-                commandes_creees = []
-                
-                # Créer une commande pour chaque entreprise
-                for entreprise, items in items_par_entreprise.items():
-                    # Calculer le montant total pour cette entreprise
-                    montant_total = sum(item.get_prix_total() for item in items)
-                    
-                    # Créer la commande
-                    commande = Commande.objects.create(
-                        client=client,
-                        entreprise=entreprise,
-                        montant_total=montant_total,
-                        frais_livraison=validated_data['frais_livraison'],
-                        adresse_livraison=validated_data['adresse_livraison'],
-                        ville_livraison=validated_data['ville_livraison'],
-                        code_postal_livraison=validated_data['code_postal_livraison'],
-                        pays_livraison=validated_data['pays_livraison'],
-                        telephone_livraison=validated_data['telephone_livraison'],
-                        note_client=validated_data.get('note_client', ''),
-                    )
-                    
-                    # Créer les lignes de commande et décrémenter le stock
-                    for item in items:
-                        # Vérifier le stock disponible
-                        if item.produit.stock < item.quantite:
-                            raise Exception(
-                                f"Stock insuffisant pour {item.produit.nom}. "
-                                f"Stock disponible: {item.produit.stock}"
-                            )
-                        
-                        # Créer la ligne de commande
-                        LigneCommande.objects.create(
-                            commande=commande,
-                            produit=item.produit,
-                            nom_produit=item.produit.nom,
-                            prix_unitaire=item.produit.get_prix_final(),
-                            quantite=item.quantite
-                        )
-                        
-                        # Décrémenter le stock
-                        item.produit.stock -= item.quantite
-                        item.produit.nombre_ventes += item.quantite
-                        item.produit.save()
-                    
-                    commandes_creees.append(commande)
-                
-                # Vider le panier après création des commandes
-                panier.items.all().delete()
-                
-                # Sérialiser toutes les commandes créées
-                serializer = CommandeSerializer(commandes_creees, many=True)
-                
-                return Response({
-                    'message': f'{len(commandes_creees)} commande(s) créée(s) avec succès',
-                    'commandes': serializer.data
-                }, status=status.HTTP_201_CREATED)
-                
+            commandes_creees = creer_commandes_depuis_panier(
+                client, create_serializer.validated_data
+            )
+            prefetch_related_objects(commandes_creees, 'lignes')
+            
+            # Sérialiser toutes les commandes créées
+            serializer = CommandeSerializer(commandes_creees, many=True)
+            
+            return Response({
+                'message': f'{len(commandes_creees)} commande(s) créée(s) avec succès',
+                'commandes': serializer.data
+            }, status=status.HTTP_201_CREATED)
+        
+        except StockInsuffisant as e:
+            return Response(
+                {'error': str(e), 'articles': e.erreurs},
+                status=status.HTTP_409_CONFLICT
+            )
+        except PanierVide as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -1,3 +1,41 @@
+import json
+from decimal import Decimal
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from orders.models import Commande
+from orders.tests import LIVRAISON
+from products.tests import creer_client, creer_entreprise
+from .models import Paiement
+
+
+class ExportPaiementsTests(TestCase):
+    """Export des paiements des commandes visibles"""
+
+    @classmethod
+    def setUpTestData(cls):
+        client = creer_client()
+        cls.entreprise = creer_entreprise()
+        autre = creer_entreprise('concurrent')
+        for entreprise, statut in ((cls.entreprise, 'completed'), (cls.entreprise, 'failed'), (autre, 'completed')):
+            commande = Commande.objects.create(
+                client=client, entreprise=entreprise, montant_total=Decimal('20.00'), **LIVRAISON
+            )
+            Paiement.objects.create(
+                commande=commande, montant=Decimal('25.00'), methode='mobile_money',
+                status=statut, provider_response={'secret': 'x'}
+            )
+
+    def test_export(self):
+        api = APIClient()
+        api.force_authenticate(self.entreprise.user)
+        response = api.get('/api/payments/export/', {'format_export': 'json', 'status': 'completed'})
+        paiements = json.loads(b''.join(response.streaming_content))
+
+        self.assertEqual(len(paiements), 1)
+        self.assertEqual(paiements[0]['commande__entreprise__nom_entreprise'], self.entreprise.nom_entreprise)
+        self.assertNotIn('provider_response', paiements[0])
 
-# Create your tests here.
+        response = api.get('/api/payments/export/', {'format_export': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import PaiementExportView
+
+urlpatterns = [
+    path('export/', PaiementExportView.as_view(), name='paiements-export'),
+]
@@ -1,3 +1,41 @@
-from django.shortcuts import render
+# payments/views.py
 
-# Create your views here.
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+
+from Fanjava_backend.instrumentation import SerialisationMesureeMixin
+from Fanjava_backend.streaming import reponse_export
+from orders.models import Commande
+from .models import Paiement
+
+
+class PaiementExportView(SerialisationMesureeMixin, generics.GenericAPIView):
+    """
+    Export des paiements en streaming (?format_export=csv|json|jsonl)
+    Paiements des commandes visibles par l'utilisateur (voir CommandeQuerySet.visibles_par)
+    Filtres : status, methode
+    """
+    permission_classes = [IsAuthenticated]
+    queryset = Paiement.objects.all()
+    filterset_fields = ['status', 'methode']
+    
+    # La réponse brute du prestataire n'est pas exportée
+    colonnes_export = [
+        'id',
+        'commande__numero_commande',
+        'commande__entreprise__nom_entreprise',
+        'montant',
+        'methode',
+        'status',
+        'transaction_id',
+        'error_message',
+        'created_at',
+        'updated_at',
+    ]
+    
+    def get(self, request):
+        commandes = Commande.objects.visibles_par(request.user)
+        paiements = self.filter_queryset(
+            self.get_queryset().filter(commande__in=commandes.values('pk'))
+        )
+        return reponse_export(request, paiements, self.colonnes_export, 'paiements')
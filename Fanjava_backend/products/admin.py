@@ -1,6 +1,6 @@
 # products/admin.py
 from django.contrib import admin
-from .models import Categorie, Produit, ImageProduit, Avis
+from .models import Categorie, Produit, ImageProduit, Avis, ImportCatalogue
 
 @admin.register(Categorie)
 class CategorieAdmin(admin.ModelAdmin):
@@ -59,4 +59,10 @@ class AvisAdmin(admin.ModelAdmin):
     list_filter = ['note', 'approuve', 'created_at']
     search_fields = ['produit__nom', 'client__user__username', 'commentaire']
     readonly_fields = ['created_at', 'updated_at']
-    list_editable = ['approuve']
\ No newline at end of file
+    list_editable = ['approuve']
+
+@admin.register(ImportCatalogue)
+class ImportCatalogueAdmin(admin.ModelAdmin):
+    list_display = ['entreprise', 'format_fichier', 'status', 'created_at', 'termine_le']
+    list_filter = ['status', 'format_fichier']
+    readonly_fields = ['rapport', 'erreur']
@@ -0,0 +1,77 @@
+# products/arbre.py
+"""
+Arbre des catégories construit en mémoire
+
+Toutes les catégories sont chargées en une requête (avec le nombre de
+produits de chaque catégorie), puis la hiérarchie est reconstruite en
+Python. Les sous-catégories et les totaux cumulés (catégorie + descendants)
+ne coûtent donc plus aucune requête, quelle que soit la profondeur.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Count, Q
+
+from .models import Categorie
+
+
+def charger_categories(inclure_inactives=False):
+    """
+    Une seule requête : catégories annotées de leur nombre de produits
+    Vue publique : catégories et produits actifs seulement
+    """
+    if inclure_inactives:
+        categories = Categorie.objects.annotate(nombre_produits=Count('produits'))
+    else:
+        categories = Categorie.objects.filter(active=True).annotate(
+            nombre_produits=Count('produits', filter=Q(produits__status='active'))
+        )
+    return list(categories.order_by('ordre', 'nom'))
+
+
+class ArbreCategories:
+    """
+    Hiérarchie des catégories chargées
+    Une catégorie dont le parent n'a pas été chargé (parent inactif en vue
+    publique) est masquée avec tout son sous-arbre.
+    """
+
+    def __init__(self, categories):
+        self.par_id = {categorie.pk: categorie for categorie in categories}
+        self.enfants = defaultdict(list)
+        self.racines = []
+        for categorie in categories:
+            if categorie.parent_id is None:
+                self.racines.append(categorie)
+            elif categorie.parent_id in self.par_id:
+                self.enfants[categorie.parent_id].append(categorie)
+        self._totaux = {}
+
+    @classmethod
+    def charger(cls, inclure_inactives=False):
+        return cls(charger_categories(inclure_inactives))
+
+    def sous_categories(self, categorie):
+        return self.enfants.get(categorie.pk, [])
+
+    def nombre_produits_total(self, categorie):
+        """Produits de la catégorie et de tous ses descendants"""
+        if not self._totaux:
+            self._calculer_totaux()
+        return self._totaux.get(categorie.pk, getattr(categorie, 'nombre_produits', 0))
+
+    def _calculer_totaux(self):
+        """
+        Parcours en profondeur itératif depuis les racines
+        (chaque catégorie n'a qu'un parent : les nœuds atteints forment un arbre)
+        """
+        pile = [(racine, False) for racine in self.racines]
+        while pile:
+            categorie, enfants_traites = pile.pop()
+            if enfants_traites:
+                self._totaux[categorie.pk] = categorie.nombre_produits + sum(
+                    self._totaux[enfant.pk] for enfant in self.sous_categories(categorie)
+                )
+            else:
+                pile.append((categorie, True))
+                pile.extend((enfant, False) for enfant in self.sous_categories(categorie))
@@ -0,0 +1,188 @@
+# products/cache.py
+"""
+Cache applicatif des lectures du catalogue
+
+Les réponses sérialisées des actions de liste (catégories, produits,
+nouveautés, promotions, vedette) sont mises en cache dans le cache
+`catalogue` (voir CACHES dans settings.py).
+
+La clé contient un numéro de version par modèle. Les signaux de
+Produit, Categorie et ImageProduit incrémentent ces versions : les
+anciennes entrées ne sont plus jamais lues et expirent d'elles-mêmes.
+
+Requêtes conditionnelles : l'ETag d'une réponse est l'empreinte de son
+contenu, calculée à la mise en cache et conservée avec les données. Un
+client qui renvoie If-None-Match reçoit un 304 vide sans sérialisation.
+L'ETag ne dérive pas des versions : celles-ci sont propres à chaque
+processus avec le backend locmem, et une lecture sur un réplica en retard
+peut associer une nouvelle version à d'anciennes données. Un 304 n'est donc
+jamais plus ancien que la réponse que le processus servirait, elle-même
+bornée par CATALOGUE_CACHE_TIMEOUT. Pas de Last-Modified : aucune date de
+modification fiable n'est connue sans requête SQL.
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.translation import get_language
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+ALIAS_CACHE = 'catalogue'
+
+PRODUITS = 'produits'
+CATEGORIES = 'categories'
+
+CLE_VERSION = 'catalogue:version:{}'
+CLE_STATS = 'catalogue:stats:{}'
+
+
+def get_cache():
+    return caches[ALIAS_CACHE]
+
+
+def get_version(modele):
+    """Version courante d'un modèle (initialisée à l'horodatage si absente)"""
+    cache = get_cache()
+    cle = CLE_VERSION.format(modele)
+    version = cache.get(cle)
+    if version is None:
+        # Horodatage plutôt que 1 : pas de collision avec d'anciennes entrées
+        # si la clé de version a été évincée
+        cache.add(cle, int(time.time() * 1000), timeout=None)
+        version = cache.get(cle)
+    return version
+
+
+def invalider(*modeles):
+    """Incrémenter la version des modèles modifiés"""
+    cache = get_cache()
+    for modele in modeles:
+        cle = CLE_VERSION.format(modele)
+        try:
+            cache.incr(cle)
+        except ValueError:
+            cache.set(cle, int(time.time() * 1000), timeout=None)
+
+
+def invalider_apres_commit(*modeles):
+    """
+    Invalider tout de suite, puis à nouveau au commit de la transaction :
+    une lecture concurrente a pu remettre l'ancien état en cache entre-temps
+    """
+    invalider(*modeles)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: invalider(*modeles))
+
+
+def _incrementer_stat(nom):
+    cache = get_cache()
+    cle = CLE_STATS.format(nom)
+    try:
+        cache.incr(cle)
+    except ValueError:
+        cache.add(cle, 0, timeout=None)
+        cache.incr(cle)
+
+
+def get_stats():
+    """Compteurs de hits/miss pour le monitoring"""
+    cache = get_cache()
+    hits = cache.get(CLE_STATS.format('hits'), 0)
+    misses = cache.get(CLE_STATS.format('misses'), 0)
+    total = hits + misses
+    return {
+        'backend': settings.CACHES[ALIAS_CACHE]['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'non_modifiees': cache.get(CLE_STATS.format('non_modifiees'), 0),
+        'hit_ratio': round(hits / total, 4) if total else 0,
+        'versions': {modele: get_version(modele) for modele in (PRODUITS, CATEGORIES)},
+    }
+
+
+def reinitialiser_stats():
+    get_cache().delete_many([
+        CLE_STATS.format(nom) for nom in ('hits', 'misses', 'non_modifiees')
+    ])
+
+
+def cle_reponse(request, espace, modeles, variante=''):
+    """
+    Clé de cache d'une réponse : action, langue, hôte, paramètres de requête,
+    variante (ex: vue admin) et versions des modèles dont elle dépend
+    """
+    parametres = sorted(
+        (cle, valeur)
+        for cle in request.query_params
+        for valeur in request.query_params.getlist(cle)
+    )
+    empreinte = hashlib.md5(
+        repr((request.build_absolute_uri('/'), parametres, variante)).encode()
+    ).hexdigest()
+    versions = '.'.join(str(get_version(modele)) for modele in modeles)
+    return f'catalogue:representation:{espace}:{get_language()}:{versions}:{empreinte}'
+
+
+def etag(data):
+    """ETag fort : empreinte des données sérialisées et de leur langue"""
+    contenu = json.dumps([get_language(), data], cls=JSONEncoder, sort_keys=True)
+    return f'"{hashlib.md5(contenu.encode()).hexdigest()}"'
+
+
+def ajouter_validateurs(response, etag):
+    """
+    ETag sur une réponse 200 ou 304
+    no-cache : le client garde la réponse mais la revalide à chaque usage
+    """
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def non_modifiee(request, etag):
+    """Réponse 304 si le client a déjà cette représentation, sinon None"""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        _incrementer_stat('non_modifiees')
+        ajouter_validateurs(response, etag)
+    return response
+
+
+def reponse_en_cache(request, espace, modeles, calcul, variante='', lue=None):
+    """
+    Retourne la réponse en cache si elle existe (304 si le client l'a déjà),
+    sinon appelle `calcul()` et met en cache les données des réponses 200
+    lue : appelée avec les données servies (ex. compteur de vues)
+    """
+    cache = get_cache()
+    cle = cle_reponse(request, espace, modeles, variante)
+
+    entree = cache.get(cle)
+    if entree is not None:
+        etag_, data = entree
+        if lue is not None:
+            lue(data)
+        response = non_modifiee(request, etag_)
+        if response is not None:
+            return response
+        _incrementer_stat('hits')
+        return ajouter_validateurs(Response(data), etag_)
+
+    _incrementer_stat('misses')
+    response = calcul()
+    if response.status_code != 200:
+        return response
+    if lue is not None:
+        lue(response.data)
+    etag_ = etag(response.data)
+    cache.set(cle, (etag_, response.data), getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 300))
+    # Entrée expirée ou calculée par un autre processus : le client a peut-être déjà ce contenu
+    return non_modifiee(request, etag_) or ajouter_validateurs(response, etag_)
@@ -0,0 +1,175 @@
+# products/facettes.py
+"""
+Facettes du catalogue : nombre de produits par option de filtre
+
+Une seule requête groupée compte les produits par combinaison
+(catégorie, entreprise, promotion, vedette, stock, tranche de prix) ;
+chaque facette est ensuite calculée en Python à partir de ces lignes.
+
+Les filtres de facette (categorie, entreprise, en_promotion, en_vedette,
+en_stock) ne sont donc pas appliqués en SQL : le nombre affiché pour une
+option de facette tient compte des autres filtres sélectionnés mais pas
+de celui de la facette elle-même (on voit combien de produits donnerait
+chaque autre catégorie, pas seulement celle déjà choisie). Les autres
+filtres (prix_min/prix_max, search, status, actif, mes_produits) sont
+appliqués en SQL.
+
+Les catégories comptent aussi les produits de leurs descendants, comme
+l'arbre des catégories (voir products.arbre).
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import BooleanField, Case, Count, ExpressionWrapper, Q, Value, When
+from django_filters import utils
+from django_filters.rest_framework import DjangoFilterBackend
+
+from users.models import Entreprise
+from .arbre import ArbreCategories
+from .models import Categorie
+
+
+FACETTES = ('categorie', 'entreprise', 'en_promotion', 'en_vedette', 'en_stock')
+
+
+def tranches_prix():
+    """Bornes des tranches de prix, croissantes"""
+    return sorted(getattr(settings, 'FACETTES_TRANCHES_PRIX', [10000, 50000, 100000, 500000]))
+
+
+def selection(request, queryset, view):
+    """
+    Applique au queryset les filtres du filterset qui ne sont pas des facettes
+    Retourne (queryset, {facette: valeur sélectionnée})
+    """
+    filterset = DjangoFilterBackend().get_filterset(request, queryset, view)
+    choix = {}
+    if filterset is not None:
+        if not filterset.is_valid():
+            raise utils.translate_validation(filterset.errors)
+        for nom, valeur in filterset.form.cleaned_data.items():
+            if nom in FACETTES:
+                if valeur is not None:
+                    choix[nom] = getattr(valeur, 'pk', valeur)
+            else:
+                queryset = filterset.filters[nom].filter(queryset, valeur)
+    # Comme la liste : seul en_stock=true filtre
+    if request.query_params.get('en_stock') == 'true':
+        choix['en_stock'] = True
+    return queryset, choix
+
+
+def compter(queryset):
+    """Une requête : nombre de produits par combinaison de facettes"""
+    bornes = tranches_prix()
+    tranche = Case(
+        *(When(prix__lt=borne, then=Value(index)) for index, borne in enumerate(bornes)),
+        default=Value(len(bornes)),
+    )
+    return list(
+        queryset.select_related(None).prefetch_related(None).order_by()
+        .values(
+            'categorie',
+            'entreprise',
+            'en_promotion',
+            'en_vedette',
+            en_stock=ExpressionWrapper(Q(stock__gt=0), output_field=BooleanField()),
+            tranche=tranche,
+        )
+        .annotate(nombre=Count('id'))
+    )
+
+
+def retenue(ligne, choix, sauf=None):
+    """La combinaison respecte-t-elle les facettes sélectionnées (sauf une) ?"""
+    return all(
+        ligne[nom] == valeur
+        for nom, valeur in choix.items()
+        if nom != sauf
+    )
+
+
+def calculer_facettes(request, queryset, view):
+    """Facettes du queryset pour les paramètres de la requête (trois requêtes)"""
+    queryset, choix = selection(request, queryset, view)
+    return facettes(compter(queryset), choix)
+
+
+def facettes(lignes, choix):
+    """Nombres par facette à partir des lignes de compter()"""
+    total = 0
+    tranches = Counter()
+    par_facette = {nom: Counter() for nom in FACETTES}
+    for ligne in lignes:
+        if retenue(ligne, choix):
+            total += ligne['nombre']
+            tranches[ligne['tranche']] += ligne['nombre']
+        for nom in FACETTES:
+            if retenue(ligne, choix, sauf=nom):
+                par_facette[nom][ligne[nom]] += ligne['nombre']
+
+    bornes = tranches_prix()
+    return {
+        'total': total,
+        'categories': facette_categories(par_facette['categorie']),
+        'entreprises': facette_entreprises(par_facette['entreprise']),
+        'prix': [
+            {
+                'min': bornes[index - 1] if index else None,
+                'max': bornes[index] if index < len(bornes) else None,
+                'nombre': tranches[index],
+            }
+            for index in range(len(bornes) + 1)
+        ],
+        **{
+            nom: {'true': par_facette[nom][True], 'false': par_facette[nom][False]}
+            for nom in ('en_promotion', 'en_vedette', 'en_stock')
+        },
+    }
+
+
+def facette_categories(comptes):
+    """
+    Catégories actives ayant au moins un produit (descendants compris),
+    dans l'ordre de l'arbre
+    """
+    categories = list(
+        Categorie.objects.filter(active=True).only('id', 'nom', 'slug', 'parent', 'ordre')
+        .order_by('ordre', 'nom')
+    )
+    for categorie in categories:
+        categorie.nombre_produits = comptes.get(categorie.pk, 0)
+    arbre = ArbreCategories(categories)
+
+    resultat = []
+    pile = list(reversed(arbre.racines))
+    while pile:
+        categorie = pile.pop()
+        nombre = arbre.nombre_produits_total(categorie)
+        if not nombre:
+            continue
+        resultat.append({
+            'id': categorie.pk,
+            'nom': categorie.nom,
+            'slug': categorie.slug,
+            'parent': categorie.parent_id,
+            'nombre': nombre,
+        })
+        pile.extend(reversed(arbre.sous_categories(categorie)))
+    return resultat
+
+
+def facette_entreprises(comptes):
+    """Entreprises ayant au moins un produit, les plus fournies d'abord"""
+    noms = dict(
+        Entreprise.objects.filter(pk__in=[pk for pk, nombre in comptes.items() if nombre])
+        .values_list('pk', 'nom_entreprise')
+    )
+    return sorted(
+        (
+            {'id': pk, 'nom': nom, 'nombre': comptes[pk]}
+            for pk, nom in noms.items()
+        ),
+        key=lambda entreprise: (-entreprise['nombre'], entreprise['nom'])
+    )
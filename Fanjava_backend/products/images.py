@@ -0,0 +1,254 @@
+# products/images.py
+"""
+Images dérivées des produits et des catégories
+
+Chaque image envoyée est déclinée en plusieurs tailles (IMAGES_DERIVEES
+dans settings.py : miniature, carte, détail), en WebP et en JPEG.
+Les dérivées sont nommées d'après l'empreinte SHA-256 du fichier source :
+
+    derivees/<2 premiers caractères>/<empreinte>-<taille>.<webp|jpeg>
+
+Un même contenu produit donc toujours les mêmes noms : les dérivées sont
+partagées entre images identiques, jamais régénérées, et leurs URL peuvent
+être mises en cache indéfiniment par les navigateurs et le CDN. Les
+originaux sont eux-mêmes rangés sous cette empreinte (products.stockage).
+
+Génération :
+- après l'enregistrement d'une image, en tâche de fond (products/jobs.py),
+  toutes les tailles sont produites puis l'empreinte est enregistrée ;
+- à la première demande d'une dérivée absente (nouvelle taille, stockage
+  vidé, `generer_derivees --paresseux`), par la vue image_derivee.
+
+Les métadonnées EXIF (GPS, appareil...) ne sont jamais recopiées ;
+l'orientation EXIF est appliquée aux pixels avant redimensionnement.
+"""
+
+import hashlib
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import cache
+from .stockage import empreinte_du_nom
+
+
+logger = logging.getLogger('fanjava.images')
+
+DOSSIER = 'derivees'
+
+# Extension -> format Pillow
+FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+QUALITES_PAR_DEFAUT = {
+    'webp': 80,
+    'jpeg': 85,
+}
+TAILLES_PAR_DEFAUT = {
+    'miniature': 160,
+    'carte': 480,
+    'detail': 1200,
+}
+
+TAILLE_BLOC = 64 * 1024
+
+
+class ImageInvalide(Exception):
+    """Le fichier source n'est pas une image lisible"""
+
+
+def tailles():
+    """{nom: plus grand côté en pixels}"""
+    return getattr(settings, 'IMAGES_DERIVEES', TAILLES_PAR_DEFAUT)
+
+
+def qualite(format_):
+    return getattr(settings, 'IMAGES_DERIVEES_QUALITE', QUALITES_PAR_DEFAUT).get(
+        format_, QUALITES_PAR_DEFAUT[format_]
+    )
+
+
+def nom_derivee(empreinte, taille, format_):
+    return f'{DOSSIER}/{empreinte[:2]}/{empreinte}-{taille}.{format_}'
+
+
+def empreinte_fichier(fichier):
+    """SHA-256 d'un fichier lu par blocs (la position est remise au début)"""
+    fichier.seek(0)
+    sha = hashlib.sha256()
+    while bloc := fichier.read(TAILLE_BLOC):
+        sha.update(bloc)
+    fichier.seek(0)
+    return sha.hexdigest()
+
+
+def urls_derivees(empreinte, request=None):
+    """
+    {taille: {format: url}} d'après l'empreinte (sans accès au stockage),
+    None tant que l'image n'a pas été traitée
+    """
+    if not empreinte:
+        return None
+    urls = {}
+    for taille in tailles():
+        urls[taille] = {}
+        for format_ in FORMATS:
+            url = default_storage.url(nom_derivee(empreinte, taille, format_))
+            urls[taille][format_] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def _ouvrir(source, cote_max):
+    """Image décodée, orientée, en RGB ou RGBA (lève ImageInvalide)"""
+    try:
+        image = Image.open(source)
+        # JPEG : décodage directement à une échelle réduite (1/2, 1/4, 1/8)
+        image.draft('RGB', (cote_max, cote_max))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageInvalide(str(e)) from e
+
+    icc_profile = image.info.get('icc_profile')
+    transparente = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    image = image.convert('RGBA' if transparente else 'RGB')
+    image.info = {'icc_profile': icc_profile} if icc_profile else {}
+    return image
+
+
+def verifier(source):
+    """Lève ImageInvalide si le fichier n'est pas une image (sans la décoder)"""
+    try:
+        Image.open(source).verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ImageInvalide(str(e)) from e
+    finally:
+        source.seek(0)
+
+
+def _encoder(image, format_):
+    if format_ == 'jpeg' and image.mode == 'RGBA':
+        fond = Image.new('RGB', image.size, (255, 255, 255))
+        fond.paste(image, mask=image.getchannel('A'))
+        image = fond
+    options = {'quality': qualite(format_)}
+    if format_ == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    else:
+        options['method'] = 4
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    # Pas d'`exif=` : aucune métadonnée de la source n'est recopiée
+    sortie = BytesIO()
+    image.save(sortie, FORMATS[format_], **options)
+    return sortie.getvalue()
+
+
+def _enregistrer(nom, contenu):
+    enregistre = default_storage.save(nom, ContentFile(contenu))
+    if enregistre != nom:
+        # Générée entre-temps par un autre processus : contenu identique
+        default_storage.delete(enregistre)
+
+
+def derivees_manquantes(empreinte, demandees=None):
+    """[(taille, format)] absents du stockage, parmi `demandees` (par défaut toutes)"""
+    if demandees is None:
+        demandees = [(taille, format_) for taille in tailles() for format_ in FORMATS]
+    return [
+        (taille, format_) for taille, format_ in demandees
+        if not default_storage.exists(nom_derivee(empreinte, taille, format_))
+    ]
+
+
+def supprimer_derivees(empreinte):
+    for taille in tailles():
+        for format_ in FORMATS:
+            default_storage.delete(nom_derivee(empreinte, taille, format_))
+
+
+def generer_derivees(source, empreinte, demandees=None):
+    """
+    Génère les dérivées absentes du stockage
+    demandees : [(taille, format)], par défaut toutes
+    Retourne les noms générés (lève ImageInvalide)
+    """
+    a_generer = derivees_manquantes(empreinte, demandees)
+    if not a_generer:
+        return []
+
+    cotes = tailles()
+    image = _ouvrir(source, max(cotes[taille] for taille, format_ in a_generer))
+    generes = []
+    # Du plus grand au plus petit : chaque taille est réduite depuis la précédente
+    for taille in sorted({taille for taille, format_ in a_generer}, key=cotes.get, reverse=True):
+        cote = cotes[taille]
+        if max(image.size) > cote:
+            image = image.copy()
+            image.thumbnail((cote, cote), Image.Resampling.LANCZOS)
+        for format_ in FORMATS:
+            if (taille, format_) in a_generer:
+                nom = nom_derivee(empreinte, taille, format_)
+                _enregistrer(nom, _encoder(image, format_))
+                generes.append(nom)
+    return generes
+
+
+def traiter(instance, champ, champ_empreinte, modele_cache, generer=True):
+    """
+    Calcule l'empreinte de l'image `champ` d'une instance, génère ses
+    dérivées (sauf generer=False : elles le seront à la première demande)
+    et enregistre l'empreinte
+    Retourne l'empreinte, ou None si l'image est absente ou illisible
+    """
+    fichier = getattr(instance, champ)
+    if not fichier:
+        return None
+    # Stockage adressé par contenu : l'empreinte est dans le nom, et les
+    # dérivées d'un contenu déjà connu existent (rien à relire)
+    empreinte = empreinte_du_nom(fichier.name)
+    try:
+        if empreinte is None or (generer and derivees_manquantes(empreinte)):
+            with fichier.open('rb'):
+                empreinte = empreinte or empreinte_fichier(fichier)
+                if generer:
+                    generer_derivees(fichier, empreinte)
+                else:
+                    verifier(fichier)
+    except (ImageInvalide, OSError) as e:
+        logger.warning("Image %s ignorée : %s", fichier.name, e)
+        return None
+
+    # Seulement si l'image n'a pas été remplacée entre-temps
+    type(instance)._default_manager.filter(
+        pk=instance.pk, **{champ: fichier.name}
+    ).update(**{champ_empreinte: empreinte})
+    setattr(instance, champ_empreinte, empreinte)
+    cache.invalider_apres_commit(modele_cache)
+    return empreinte
+
+
+def traiter_image_produit(image, generer=True):
+    return traiter(image, 'image', 'empreinte', cache.PRODUITS, generer)
+
+
+def traiter_categorie(categorie, generer=True):
+    return traiter(categorie, 'image', 'image_empreinte', cache.CATEGORIES, generer)
+
+
+def source(empreinte):
+    """Fichier d'une image produit ou catégorie d'empreinte donnée, None sinon"""
+    from .models import Categorie, ImageProduit
+
+    image = ImageProduit.objects.filter(empreinte=empreinte).only('image').first()
+    if image is not None:
+        return image.image
+    categorie = Categorie.objects.filter(image_empreinte=empreinte).only('image').first()
+    return categorie.image if categorie is not None else None
@@ -0,0 +1,311 @@
+# products/importation.py
+"""
+Import en masse des produits d'une entreprise (CSV ou JSON lines)
+
+Le fichier est lu ligne à ligne et traité par lots : la mémoire reste
+bornée quelle que soit sa taille (50 000 lignes et plus).
+
+Pour chaque lot :
+- une requête charge les produits existants par SKU (upsert : SKU connu
+  = mise à jour partielle, SKU inconnu = création) ;
+- chaque ligne est validée avec les règles de ProduitCreateUpdateSerializer
+  (ProduitImportSerializer, construit une seule fois pour tout le fichier) ;
+- les slugs des nouveaux produits sont attribués en quelques requêtes
+  (nom, puis nom-sku, puis nom-sku-2...) ;
+- bulk_create / bulk_update des seules colonnes modifiées, puis
+  réindexation groupée de la recherche si un texte a changé.
+
+Les lignes rejetées sont rapportées avec leur numéro et leurs erreurs ;
+les autres sont enregistrées. L'encodage est vérifié sur tout le fichier
+avant le premier lot (verifier_encodage) : un fichier non UTF-8 est refusé
+sans rien écrire, plutôt que d'échouer au milieu de l'import.
+"""
+
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework.exceptions import ValidationError
+
+from . import cache
+from .models import Categorie, Produit
+from .recherche import COLONNES_INDEXEES, indexer_produits
+from .serializers import ProduitImportSerializer
+
+
+FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+TAILLE_LOT = 1000
+# Erreurs détaillées gardées dans le rapport (les suivantes sont seulement comptées)
+ERREURS_MAX = 1000
+
+LONGUEUR_BASE_SLUG = 150
+
+
+def format_fichier(nom_fichier, format_demande=None):
+    """'csv' ou 'jsonl', d'après le format demandé ou l'extension"""
+    if format_demande:
+        if format_demande not in FORMATS.values():
+            raise ValueError(f"Format inconnu : {format_demande} (csv ou jsonl)")
+        return format_demande
+    for extension, format_ in FORMATS.items():
+        if nom_fichier.lower().endswith(extension):
+            return format_
+    raise ValueError("Extension non reconnue (.csv, .jsonl ou .ndjson)")
+
+
+def verifier_encodage(fichier, taille_bloc=1024 * 1024):
+    """
+    Lit tout le fichier binaire pour vérifier qu'il est en UTF-8 (BOM accepté),
+    puis le rembobine ; lève ValueError avec le numéro de la première ligne fautive
+    (ex. CSV Latin-1 enregistré par Excel)
+    """
+    fichier = getattr(fichier, 'file', fichier)
+    decodeur = codecs.getincrementaldecoder('utf-8-sig')()
+    lignes = 0
+    try:
+        while True:
+            bloc = fichier.read(taille_bloc)
+            try:
+                lignes += decodeur.decode(bloc, final=not bloc).count('\n')
+            except UnicodeDecodeError as e:
+                ligne = lignes + e.object[:e.start].count(b'\n') + 1
+                raise ValueError(
+                    f"Le fichier n'est pas encodé en UTF-8 (ligne {ligne}) : "
+                    "l'enregistrer en « CSV UTF-8 » puis réessayer"
+                )
+            if not bloc:
+                break
+    finally:
+        fichier.seek(0)
+
+
+def ouvrir(fichier):
+    """Flux texte UTF-8 (BOM accepté) sur un fichier binaire ou un UploadedFile"""
+    fichier = getattr(fichier, 'file', fichier)
+    return io.TextIOWrapper(fichier, encoding='utf-8-sig', newline='')
+
+
+def lire_csv(flux):
+    """(numéro de ligne, données, erreur) ; les cellules vides sont ignorées"""
+    lecteur = csv.DictReader(flux)
+    while True:
+        try:
+            ligne = next(lecteur)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # Ligne malformée (champ trop long...) : rapportée, la lecture continue
+            yield lecteur.line_num, None, f"CSV invalide : {e}"
+            continue
+        yield lecteur.line_num, {
+            cle.strip(): valeur.strip()
+            for cle, valeur in ligne.items()
+            if cle and isinstance(valeur, str) and valeur.strip()
+        }, None
+
+
+def lire_jsonl(flux):
+    """(numéro de ligne, données, erreur) ; un objet JSON par ligne"""
+    for numero, ligne in enumerate(flux, start=1):
+        if not ligne.strip():
+            continue
+        try:
+            donnees = json.loads(ligne)
+        except ValueError:
+            yield numero, None, "JSON invalide"
+            continue
+        if not isinstance(donnees, dict):
+            yield numero, None, "Un objet JSON est attendu"
+            continue
+        yield numero, {cle: valeur for cle, valeur in donnees.items() if valeur is not None}, None
+
+
+def lire(flux, format_):
+    return lire_csv(flux) if format_ == 'csv' else lire_jsonl(flux)
+
+
+def messages(detail):
+    """ValidationError.detail -> {champ: [messages]} sérialisable"""
+    if not isinstance(detail, dict):
+        detail = {'non_field_errors': detail}
+    return {
+        champ: [str(message) for message in (erreurs if isinstance(erreurs, list) else [erreurs])]
+        for champ, erreurs in detail.items()
+    }
+
+
+def attribuer_slugs(produits):
+    """
+    Slugs uniques pour des produits non enregistrés, collisions résolues par lot :
+    une requête par tour (nom, nom-sku, nom-sku-2...) pour tous les produits restants
+    """
+    bases = {id(produit): slugify(produit.nom)[:LONGUEUR_BASE_SLUG] or 'produit' for produit in produits}
+    utilises = set()
+    restants = list(produits)
+    tour = 0
+    while restants:
+        candidats = {}
+        for produit in restants:
+            base = bases[id(produit)]
+            if tour:
+                base = f'{base}-{slugify(produit.sku)[:40]}'
+            candidats[id(produit)] = base if tour < 2 else f'{base}-{tour}'
+        pris = utilises | set(Produit.objects.filter(
+            slug__in=set(candidats.values())
+        ).values_list('slug', flat=True))
+
+        suivants = []
+        for produit in restants:
+            candidat = candidats[id(produit)]
+            if candidat in pris:
+                suivants.append(produit)
+            else:
+                produit.slug = candidat
+                pris.add(candidat)
+                utilises.add(candidat)
+        restants = suivants
+        tour += 1
+
+
+class ImportProduits:
+    """Import d'un fichier pour une entreprise ; importer() retourne le rapport"""
+
+    def __init__(self, entreprise, taille_lot=TAILLE_LOT, erreurs_max=ERREURS_MAX):
+        self.entreprise = entreprise
+        self.taille_lot = taille_lot
+        self.erreurs_max = erreurs_max
+        self.lignes = 0
+        self.crees = 0
+        self.mis_a_jour = 0
+        self.inchanges = 0
+        self.nombre_erreurs = 0
+        self.erreurs = []
+        # SKU déjà rencontrés dans le fichier -> numéro de ligne
+        self.skus = {}
+        self.validateur = ProduitImportSerializer(context={
+            'categories': set(Categorie.objects.values_list('id', flat=True))
+        })
+
+    def importer(self, lignes):
+        """lignes : itérable de (numéro, données, erreur) (voir lire())"""
+        lignes = iter(lignes)
+        while lot := list(islice(lignes, self.taille_lot)):
+            self.traiter_lot(lot)
+        if self.crees or self.mis_a_jour:
+            cache.invalider_apres_commit(cache.PRODUITS)
+        return self.rapport()
+
+    def rapport(self):
+        return {
+            'lignes': self.lignes,
+            'crees': self.crees,
+            'mis_a_jour': self.mis_a_jour,
+            'inchanges': self.inchanges,
+            'nombre_erreurs': self.nombre_erreurs,
+            'erreurs': self.erreurs,
+        }
+
+    def erreur(self, numero, sku, erreurs):
+        self.nombre_erreurs += 1
+        if self.erreurs_max is None or len(self.erreurs) < self.erreurs_max:
+            self.erreurs.append({'ligne': numero, 'sku': sku, 'erreurs': erreurs})
+
+    def valider(self, donnees, existant):
+        """Données validées (lève ValidationError)"""
+        # Un seul serializer pour tout le fichier (comme ListSerializer.run_child_validation)
+        self.validateur.instance = existant
+        self.validateur.partial = existant is not None
+        self.validateur.initial_data = donnees
+        return self.validateur.run_validation(donnees)
+
+    def traiter_lot(self, lot):
+        skus = [
+            str(donnees['sku']).strip() for numero, donnees, erreur in lot
+            if donnees and donnees.get('sku') not in (None, '')
+        ]
+        existants = {produit.sku: produit for produit in Produit.objects.filter(sku__in=skus)}
+
+        nouveaux = []
+        modifies = []
+        champs = set()
+        valides = []
+        for numero, donnees, erreur in lot:
+            self.lignes += 1
+            if erreur:
+                self.erreur(numero, None, {'non_field_errors': [erreur]})
+                continue
+            sku = str(donnees.get('sku', '')).strip()
+            existant = existants.get(sku)
+            if existant is not None and existant.entreprise_id != self.entreprise.pk:
+                self.erreur(numero, sku, {'sku': ["SKU déjà utilisé par une autre entreprise"]})
+                continue
+            if sku in self.skus:
+                self.erreur(numero, sku, {'sku': [f"SKU en double (ligne {self.skus[sku]})"]})
+                continue
+            try:
+                validees = self.valider({**donnees, 'sku': sku}, existant)
+            except ValidationError as e:
+                self.erreur(numero, sku or None, messages(e.detail))
+                continue
+
+            self.skus[sku] = numero
+            valides.append((numero, sku))
+            if 'categorie' in validees:
+                validees['categorie_id'] = validees.pop('categorie')
+            if existant is None:
+                nouveaux.append(Produit(entreprise=self.entreprise, **validees))
+            else:
+                # Seules les valeurs modifiées sont écrites (réimport d'un catalogue complet)
+                differences = {
+                    champ: valeur for champ, valeur in validees.items()
+                    if getattr(existant, champ) != valeur
+                }
+                if not differences:
+                    self.inchanges += 1
+                    continue
+                for champ, valeur in differences.items():
+                    setattr(existant, champ, valeur)
+                champs.update(differences)
+                modifies.append(existant)
+
+        try:
+            with transaction.atomic():
+                self.enregistrer(nouveaux, modifies, champs)
+        except IntegrityError:
+            # Conflit avec une écriture concurrente : le lot entier est rejeté
+            for numero, sku in valides:
+                self.erreur(numero, sku, {'non_field_errors': ["Conflit à l'enregistrement, réessayer"]})
+            return
+        self.crees += len(nouveaux)
+        self.mis_a_jour += len(modifies)
+
+    def enregistrer(self, nouveaux, modifies, champs):
+        if nouveaux:
+            attribuer_slugs(nouveaux)
+            Produit.objects.bulk_create(nouveaux, batch_size=self.taille_lot)
+        if modifies:
+            # bulk_update ignore auto_now : la date de modification est posée ici
+            maintenant = timezone.now()
+            for produit in modifies:
+                produit.updated_at = maintenant
+            Produit.objects.bulk_update(
+                modifies, sorted(champs | {'updated_at'}), batch_size=self.taille_lot
+            )
+
+        a_indexer = modifies if COLONNES_INDEXEES.intersection(champs) else []
+        if nouveaux:
+            # MySQL ne renvoie pas les id d'un INSERT multiple : relecture par SKU
+            a_indexer = a_indexer + list(Produit.objects.filter(
+                sku__in=[produit.sku for produit in nouveaux]
+            ))
+        if a_indexer:
+            indexer_produits(a_indexer)
@@ -0,0 +1,88 @@
+# products/jobs.py
+"""Tâches de fond du catalogue (exécutées par run_workers, voir jobs/file.py)"""
+
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from jobs.file import PRIORITE_BASSE, tache
+
+from . import cache, images
+from .importation import ImportProduits, lire, ouvrir
+from .models import Categorie, ImageProduit, ImportCatalogue
+from .stockage import delai_grace, empreinte_du_nom, supprimer_si_orphelin
+from .vues import compteur_vues
+
+
+logger = logging.getLogger('fanjava.imports')
+
+
+@tache(priorite=PRIORITE_BASSE, cle='derivees:produit:{pk}', delai_visibilite=120)
+def generer_derivees_image_produit(pk):
+    """Empreinte et images dérivées d'une nouvelle image produit"""
+    image = ImageProduit.objects.filter(pk=pk).first()
+    # Supprimée, remplacée ou déjà traitée depuis : rien à faire
+    if image is not None and image.image and not image.empreinte:
+        images.traiter_image_produit(image)
+
+
+@tache(priorite=PRIORITE_BASSE, cle='derivees:categorie:{pk}', delai_visibilite=120)
+def generer_derivees_categorie(pk):
+    """Empreinte et images dérivées d'une nouvelle image de catégorie"""
+    categorie = Categorie.objects.filter(pk=pk).first()
+    if categorie is not None and categorie.image and not categorie.image_empreinte:
+        images.traiter_categorie(categorie)
+
+
+@tache(priorite=PRIORITE_BASSE, cle='orphelin:{nom}')
+def supprimer_image_orpheline(nom):
+    """Fichier d'image (et dérivées) supprimé s'il n'est plus référencé"""
+    supprimer_si_orphelin(nom)
+
+
+def liberer_image(nom):
+    """
+    Une référence au fichier `nom` a disparu (image supprimée ou remplacée) :
+    vérification planifiée après le délai de grâce du stockage
+    """
+    if empreinte_du_nom(nom):
+        supprimer_image_orpheline.differer_dans(timedelta(seconds=delai_grace()), nom=nom)
+
+
+# Hors transaction : chaque lot de vues est validé à part
+@tache(priorite=PRIORITE_BASSE, cle='vues:flush', transactionnelle=False)
+def ecrire_vues():
+    """Vues produits en attente écrites en base (demandée par products.vues)"""
+    compteur_vues.flush()
+
+
+# Une seule tentative : un import interrompu (worker arrêté) n'est pas rejoué en aveugle
+# Hors transaction : chaque lot est validé à part (verrous courts, progression visible)
+@tache(tentatives_max=1, delai_visibilite=3600, transactionnelle=False)
+def importer_catalogue(import_id):
+    """
+    Import en masse envoyé par une entreprise (voir ProduitViewSet.importer)
+    Une erreur inattendue est enregistrée sur l'import (statut 'echoue') sans
+    annuler les lots déjà validés, qui figurent dans le rapport
+    """
+    # Prise de l'import conditionnelle : un seul exécutant
+    if not ImportCatalogue.objects.filter(
+        pk=import_id, status=ImportCatalogue.EN_ATTENTE
+    ).update(status=ImportCatalogue.EN_COURS):
+        return
+    importation = ImportCatalogue.objects.select_related('entreprise').get(pk=import_id)
+    import_produits = ImportProduits(importation.entreprise)
+    resultat = {'status': ImportCatalogue.TERMINE}
+    try:
+        with importation.fichier.open('rb') as fichier:
+            import_produits.importer(lire(ouvrir(fichier), importation.format_fichier))
+    except Exception as e:
+        logger.exception("Import %s en échec", import_id)
+        resultat = {'status': ImportCatalogue.ECHOUE, 'erreur': str(e)}
+        if import_produits.crees or import_produits.mis_a_jour:
+            cache.invalider_apres_commit(cache.PRODUITS)
+    importation.fichier.delete(save=False)
+    ImportCatalogue.objects.filter(pk=import_id).update(
+        fichier='', rapport=import_produits.rapport(), termine_le=timezone.now(), **resultat
+    )
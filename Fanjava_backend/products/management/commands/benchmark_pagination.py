@@ -0,0 +1,87 @@
+# products/management/commands/benchmark_pagination.py
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.settings import api_settings
+
+from Fanjava_backend.pagination import KeysetPagination
+from products.models import Produit
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare la latence d\'une page profonde du catalogue : '
+        'OFFSET + COUNT(*) (pagination actuelle) contre curseur (keyset)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=500, help='Numéro de page (défaut: 500)')
+        parser.add_argument('--repetitions', type=int, default=20)
+        parser.add_argument(
+            '--ordering',
+            default='-created_at',
+            choices=['-created_at', 'prix', '-prix', 'nombre_ventes', '-nombre_ventes'],
+        )
+
+    def _mesurer(self, fonction, repetitions):
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            fonction()
+            durees.append((time.perf_counter() - debut) * 1000)
+        return durees
+
+    def handle(self, *args, **options):
+        taille = api_settings.PAGE_SIZE
+        debut_page = (options['page'] - 1) * taille
+        champ = options['ordering']
+        produits = Produit.objects.filter(status='active')
+
+        total = produits.count()
+        if total <= debut_page:
+            self.stdout.write(self.style.ERROR(
+                f'❌ {total} produit(s) actif(s) : la page {options["page"]} est vide '
+                f'(voir generate_dataset ou choisir --page plus petit)'
+            ))
+            return
+
+        ordre = [champ, 'id']
+
+        def page_offset():
+            produits.count()
+            return list(produits.order_by(*ordre)[debut_page:debut_page + taille])
+
+        # Position du dernier produit de la page précédente (ce que contient le curseur)
+        keyset = KeysetPagination()
+        keyset.ordre = [(champ.lstrip('-'), champ.startswith('-')), ('id', False)]
+        precedent = produits.order_by(*ordre)[debut_page - 1] if debut_page else None
+        condition = (
+            keyset.condition_apres(
+                [getattr(precedent, nom) for nom, desc in keyset.ordre], False
+            ) if precedent else None
+        )
+
+        def page_curseur():
+            queryset = produits.order_by(*ordre)
+            if condition is not None:
+                queryset = queryset.filter(condition)
+            return list(queryset[:taille + 1])
+
+        attendu = [p.pk for p in page_offset()]
+        obtenu = [p.pk for p in page_curseur()[:taille]]
+        if attendu != obtenu:
+            self.stdout.write(self.style.ERROR('❌ Les deux paginations ne renvoient pas la même page'))
+            return
+
+        self.stdout.write(
+            f'📊 {total} produit(s) actif(s), page {options["page"]} ({taille} par page), '
+            f'tri {champ}, {options["repetitions"]} répétition(s)'
+        )
+        for nom, fonction in [('OFFSET + COUNT', page_offset), ('Curseur', page_curseur)]:
+            durees = self._mesurer(fonction, options['repetitions'])
+            self.stdout.write(
+                f'  {nom:<15} médiane {statistics.median(durees):8.2f} ms  '
+                f'max {max(durees):8.2f} ms'
+            )
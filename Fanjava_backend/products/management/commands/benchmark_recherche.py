@@ -0,0 +1,66 @@
+# products/management/commands/benchmark_recherche.py
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework import filters
+
+from products.models import Produit
+from products.recherche import rechercher
+from products.views import ProduitViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la latence de la recherche indexée et du SearchFilter "
+        "(LIKE '%terme%') sur les données actuelles"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('termes', nargs='+', help='Requêtes à mesurer')
+        parser.add_argument('--repetitions', type=int, default=20)
+        parser.add_argument('--limite', type=int, default=20, help='Taille de page')
+
+    def _mesurer(self, construire, repetitions, limite):
+        """Durées (ms) d'évaluation de la première page"""
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            list(construire()[:limite])
+            durees.append((time.perf_counter() - debut) * 1000)
+        return durees
+
+    def _filtre_actuel(self, requete):
+        """Équivalent de ?search=... sur ProduitViewSet"""
+        vue = ProduitViewSet()
+
+        class Requete:
+            query_params = {'search': requete}
+
+        return filters.SearchFilter().filter_queryset(
+            Requete(), Produit.objects.filter(status='active'), vue
+        )
+
+    def handle(self, *args, **options):
+        repetitions = options['repetitions']
+        limite = options['limite']
+        self.stdout.write(
+            f'📊 {Produit.objects.count()} produit(s), '
+            f'{repetitions} répétition(s), page de {limite}'
+        )
+
+        for requete in options['termes']:
+            mesures = {
+                'SearchFilter': lambda: self._filtre_actuel(requete),
+                'Index': lambda: rechercher(Produit.objects.filter(status='active'), requete),
+            }
+            self.stdout.write(self.style.SUCCESS(f'\n🔎 "{requete}"'))
+            for nom, construire in mesures.items():
+                resultats = construire().count()
+                durees = self._mesurer(construire, repetitions, limite)
+                self.stdout.write(
+                    f'  {nom:<13} {resultats:>6} résultat(s)  '
+                    f'médiane {statistics.median(durees):8.2f} ms  '
+                    f'max {max(durees):8.2f} ms'
+                )
@@ -0,0 +1,114 @@
+# products/management/commands/dedoublonner_images.py
+
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.images import empreinte_fichier
+from products.models import Categorie, ImageProduit
+from products.stockage import (
+    DOSSIER, DOSSIER_TEMPORAIRE, delai_grace, empreinte_du_nom, extension, nom_fichier,
+    stockage_images, supprimer_si_orphelin
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Range les images envoyées avant le stockage par empreinte sous le nom de "
+        "leur contenu (un fichier par contenu), puis supprime les fichiers qui ne "
+        "sont plus référencés"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simulation',
+            action='store_true',
+            help='Afficher ce qui serait fait sans rien modifier'
+        )
+
+    def handle(self, *args, **options):
+        self.simulation = options['simulation']
+        if self.simulation:
+            self.stdout.write(self.style.WARNING('🔍 Simulation : aucune modification'))
+        self.ranger_anciens_fichiers()
+        self.supprimer_orphelins()
+
+    def anciens_noms(self):
+        noms = set()
+        for queryset in (ImageProduit.objects.all(), Categorie.objects.exclude(image__isnull=True)):
+            noms.update(
+                queryset.exclude(image='').exclude(image__startswith=f'{DOSSIER}/')
+                .order_by().values_list('image', flat=True).distinct()
+            )
+        return sorted(noms)
+
+    def ranger_anciens_fichiers(self):
+        ranges = manquants = 0
+        octets_liberes = 0
+        contenus = set()
+        for ancien in self.anciens_noms():
+            if not stockage_images.exists(ancien):
+                manquants += 1
+                continue
+            with stockage_images.open(ancien, 'rb') as fichier:
+                empreinte = empreinte_fichier(fichier)
+                nouveau = nom_fichier(empreinte, extension(ancien))
+                if nouveau in contenus or stockage_images.exists(nouveau):
+                    # Doublon d'un contenu déjà rangé
+                    octets_liberes += stockage_images.size(ancien)
+                contenus.add(nouveau)
+                if not self.simulation:
+                    nouveau = stockage_images.save(ancien, fichier)
+            ranges += 1
+            if self.simulation:
+                continue
+
+            with transaction.atomic():
+                ImageProduit.objects.filter(image=ancien).update(image=nouveau, empreinte=empreinte)
+                Categorie.objects.filter(image=ancien).update(image=nouveau, image_empreinte=empreinte)
+            stockage_images.delete(ancien)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🗂️  {ranges} fichier(s) rangé(s) sous leur empreinte, '
+            f'{octets_liberes / 1024 / 1024:.1f} Mo de doublons libérés'
+        ))
+        if manquants:
+            self.stdout.write(self.style.WARNING(f'⚠️  {manquants} fichier(s) référencé(s) introuvable(s)'))
+
+    def fichiers_stockes(self):
+        """Noms des fichiers du stockage par empreinte assez anciens pour être supprimés"""
+        limite = time.time() - delai_grace()
+        racine = stockage_images.path(DOSSIER)
+        for dossier, sous_dossiers, fichiers in os.walk(racine):
+            for fichier in fichiers:
+                chemin = os.path.join(dossier, fichier)
+                nom = os.path.relpath(chemin, stockage_images.location).replace(os.sep, '/')
+                if os.path.getmtime(chemin) >= limite:
+                    continue
+                if nom.startswith(f'{DOSSIER_TEMPORAIRE}/') or empreinte_du_nom(nom):
+                    yield nom
+
+    def supprimer_orphelins(self):
+        supprimes = 0
+        fichiers = self.fichiers_stockes()
+        while lot := list(islice(fichiers, 1000)):
+            references = set(
+                ImageProduit.objects.filter(image__in=lot).values_list('image', flat=True)
+            ) | set(
+                Categorie.objects.filter(image__in=lot).values_list('image', flat=True)
+            )
+            for nom in lot:
+                if nom in references:
+                    continue
+                if self.simulation:
+                    supprimes += 1
+                elif empreinte_du_nom(nom) is None:
+                    # Écriture interrompue (fichier temporaire)
+                    stockage_images.delete(nom)
+                    supprimes += 1
+                elif supprimer_si_orphelin(nom):
+                    supprimes += 1
+        self.stdout.write(self.style.SUCCESS(f'🧹 {supprimes} fichier(s) orphelin(s) supprimé(s)'))
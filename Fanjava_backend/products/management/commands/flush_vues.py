@@ -0,0 +1,15 @@
+# products/management/commands/flush_vues.py
+
+from django.core.management.base import BaseCommand
+from products.vues import compteur_vues
+
+
+class Command(BaseCommand):
+    help = (
+        'Écrit immédiatement en base les vues produits en attente '
+        '(cache partagé `vues`) ; à planifier pour les produits peu consultés'
+    )
+
+    def handle(self, *args, **kwargs):
+        total = compteur_vues.flush()
+        self.stdout.write(self.style.SUCCESS(f'✅ Vues écrites pour {total} produit(s)'))
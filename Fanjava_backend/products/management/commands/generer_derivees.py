@@ -0,0 +1,57 @@
+# products/management/commands/generer_derivees.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import images
+from products.models import Categorie, ImageProduit
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcule l'empreinte et génère les images dérivées (tailles IMAGES_DERIVEES) "
+        "des images produits et catégories qui n'en ont pas encore"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--toutes',
+            action='store_true',
+            help='Retraiter aussi les images déjà traitées (ex. après ajout d\'une taille)'
+        )
+        parser.add_argument(
+            '--paresseux',
+            action='store_true',
+            help='Calculer seulement les empreintes : dérivées générées à la première demande'
+        )
+
+    def handle(self, *args, **options):
+        generer = not options['paresseux']
+        debut = time.perf_counter()
+
+        produits = ImageProduit.objects.exclude(image='').only('id', 'image', 'empreinte')
+        categories = Categorie.objects.exclude(image='').exclude(image__isnull=True).only(
+            'id', 'image', 'image_empreinte'
+        )
+        if not options['toutes']:
+            produits = produits.filter(empreinte='')
+            categories = categories.filter(image_empreinte='')
+
+        for nom, queryset, traitement in (
+            ('image(s) produit', produits, images.traiter_image_produit),
+            ('image(s) de catégorie', categories, images.traiter_categorie),
+        ):
+            traitees = ignorees = 0
+            for instance in queryset.order_by('pk').iterator(chunk_size=500):
+                if traitement(instance, generer=generer):
+                    traitees += 1
+                else:
+                    ignorees += 1
+            self.stdout.write(self.style.SUCCESS(f'🖼️  {traitees} {nom} traitée(s)'))
+            if ignorees:
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️  {ignorees} {nom} ignorée(s) (fichier absent ou illisible)'
+                ))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Terminé en {time.perf_counter() - debut:.1f} s'))
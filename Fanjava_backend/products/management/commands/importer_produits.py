@@ -0,0 +1,70 @@
+# products/management/commands/importer_produits.py
+
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importation import (
+    TAILLE_LOT, ImportProduits, format_fichier, lire, ouvrir, verifier_encodage
+)
+from users.models import Entreprise
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe en masse les produits d'une entreprise depuis un fichier CSV ou "
+        "JSON lines (upsert par SKU), sans charger le fichier en mémoire"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help='Fichier .csv, .jsonl ou .ndjson')
+        parser.add_argument('--entreprise', type=int, required=True, help="Id de l'entreprise")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Par défaut, d'après l'extension")
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=TAILLE_LOT,
+            help=f'Lignes traitées par lot (défaut: {TAILLE_LOT})'
+        )
+        parser.add_argument('--rapport', help='Fichier JSON lines des lignes rejetées')
+
+    def handle(self, *args, **options):
+        try:
+            entreprise = Entreprise.objects.get(pk=options['entreprise'])
+        except Entreprise.DoesNotExist:
+            raise CommandError(f"Entreprise {options['entreprise']} introuvable")
+        try:
+            format_ = format_fichier(options['fichier'], options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'📦 Import de {options["fichier"]} pour {entreprise.nom_entreprise}...'
+        ))
+        debut = time.perf_counter()
+        importation = ImportProduits(entreprise, taille_lot=options['taille_lot'], erreurs_max=None)
+        try:
+            with open(options['fichier'], 'rb') as fichier:
+                verifier_encodage(fichier)
+                rapport = importation.importer(lire(ouvrir(fichier), format_))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {rapport["lignes"]} ligne(s) en {time.perf_counter() - debut:.1f} s : '
+            f'{rapport["crees"]} créé(s), {rapport["mis_a_jour"]} mis à jour, '
+            f'{rapport["inchanges"]} inchangé(s)'
+        ))
+        if not rapport['nombre_erreurs']:
+            return
+        self.stdout.write(self.style.WARNING(f'⚠️  {rapport["nombre_erreurs"]} ligne(s) rejetée(s)'))
+        if options['rapport']:
+            with Path(options['rapport']).open('w', encoding='utf-8') as sortie:
+                for erreur in rapport['erreurs']:
+                    sortie.write(json.dumps(erreur, ensure_ascii=False) + '\n')
+            self.stdout.write(self.style.WARNING(f'💾 Détail écrit dans {options["rapport"]}'))
+        else:
+            for erreur in rapport['erreurs'][:20]:
+                self.stdout.write(f'   ligne {erreur["ligne"]} ({erreur["sku"]}) : {erreur["erreurs"]}')
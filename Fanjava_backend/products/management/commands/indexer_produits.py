@@ -0,0 +1,27 @@
+# products/management/commands/indexer_produits.py
+
+from django.core.management.base import BaseCommand
+from products import recherche
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des produits (et les index FULLTEXT sous MySQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de lignes insérées par requête (défaut: 500)'
+        )
+
+    def handle(self, *args, **options):
+        moteur = recherche.moteur()
+        self.stdout.write(self.style.SUCCESS(f'🔎 Moteur de recherche : {moteur}'))
+
+        if moteur == 'fulltext':
+            for nom in recherche.creer_index_fulltext():
+                self.stdout.write(self.style.SUCCESS(f'✅ Index FULLTEXT créé : {nom}'))
+
+        total = recherche.reindexer_tout(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} produit(s) indexé(s)'))
@@ -0,0 +1,23 @@
+# products/management/commands/recalculer_notes.py
+
+from django.core.management.base import BaseCommand
+from products import cache
+from products.ratings import recalculer_toutes_les_notes
+
+
+class Command(BaseCommand):
+    help = 'Recalcule en masse les notes dénormalisées des produits (réparation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre de produits mis à jour par requête (défaut: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🔄 Recalcul des notes produits...'))
+        total = recalculer_toutes_les_notes(batch_size=options['batch_size'])
+        cache.invalider(cache.PRODUITS)
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} produit(s) mis à jour'))
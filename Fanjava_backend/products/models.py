@@ -5,6 +5,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from users.models import Entreprise, Client
+from .stockage import stockage_images
 
 
 class Categorie(models.Model):
@@ -26,12 +27,23 @@ class Categorie(models.Model):
         blank=True,
         verbose_name=_("Description")
     )
+    # Rangée sous l'empreinte de son contenu (voir products.stockage)
     image = models.ImageField(
         upload_to='categories/', 
+        storage=stockage_images,
         blank=True, 
         null=True,
+        db_index=True,
         verbose_name=_("Image")
     )
+    # SHA-256 du contenu de l'image, qui nomme ses dérivées (voir products.images)
+    image_empreinte = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name=_("Empreinte de l'image")
+    )
     parent = models.ForeignKey(
         'self', 
         null=True, 
@@ -66,6 +78,9 @@ class Categorie(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.nom)
+        # Image retirée ou remplacée : dérivées à (re)générer
+        if not self.image or not self.image._committed:
+            self.image_empreinte = ''
         super().save(*args, **kwargs)
 
 
@@ -192,6 +207,16 @@ class Produit(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(5)],
         verbose_name=_("Note moyenne")
     )
+    nombre_avis = models.IntegerField(
+        default=0,
+        verbose_name=_("Nombre d'avis")
+    )
+    repartition_notes = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_("Répartition des notes"),
+        help_text=_("Nombre d'avis approuvés par note (1 à 5)")
+    )
     
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -211,6 +236,10 @@ class Produit(models.Model):
             models.Index(fields=['entreprise', 'status']),
             models.Index(fields=['categorie']),
             models.Index(fields=['en_vedette']),
+            # Pagination par curseur (tri + id)
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['status', 'prix', 'id']),
+            models.Index(fields=['status', 'nombre_ventes', 'id']),
         ]
     
     def __str__(self):
@@ -242,14 +271,28 @@ class Produit(models.Model):
         """Vérifie si le produit est en rupture de stock"""
         return self.stock == 0
     def get_note_moyenne(self):
-        """Calcule la note moyenne du produit"""
-        from django.db.models import Avg
-        result = self.avis.filter(approuve=True).aggregate(Avg('note'))
-        return round(result['note__avg'], 1) if result['note__avg'] else 0
+        """Note moyenne des avis approuvés (dénormalisée, voir products.ratings)"""
+        return round(float(self.note_moyenne), 1) if self.note_moyenne else 0
     
     def get_nombre_avis(self):
-        """Retourne le nombre d'avis approuvés"""
-        return self.avis.filter(approuve=True).count()
+        """Retourne le nombre d'avis approuvés (dénormalisé)"""
+        return self.nombre_avis
+    
+    def get_repartition_notes(self):
+        """Nombre d'avis approuvés pour chaque note de 1 à 5"""
+        repartition = self.repartition_notes or {}
+        return {str(note): repartition.get(str(note), 0) for note in range(1, 6)}
+    
+    def get_image_principale(self):
+        """
+        Retourne l'image principale (ou la première image à défaut).
+        Passe par images.all() pour profiter du prefetch_related('images').
+        """
+        images = list(self.images.all())
+        for image in images:
+            if image.est_principale:
+                return image
+        return images[0] if images else None
 
 
 class ImageProduit(models.Model):
@@ -263,10 +306,21 @@ class ImageProduit(models.Model):
         related_name='images',
         verbose_name=_("Produit")
     )
+    # Rangée sous l'empreinte de son contenu (voir products.stockage)
     image = models.ImageField(
         upload_to='produits/',
+        storage=stockage_images,
+        db_index=True,
         verbose_name=_("Image")
     )
+    # SHA-256 du contenu de l'image, qui nomme ses dérivées (voir products.images)
+    empreinte = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name=_("Empreinte")
+    )
     alt_text = models.CharField(
         max_length=200, 
         blank=True,
@@ -301,6 +355,9 @@ class ImageProduit(models.Model):
                 produit=self.produit, 
                 est_principale=True
             ).update(est_principale=False)
+        # Nouveau fichier : dérivées à (re)générer
+        if not self.image._committed:
+            self.empreinte = ''
         super().save(*args, **kwargs)
 
 
@@ -361,7 +418,172 @@ class Avis(models.Model):
         indexes = [
             models.Index(fields=['produit', 'approuve']),
             models.Index(fields=['client']),
+            models.Index(fields=['produit', 'approuve', 'created_at', 'id']),
         ]
     
     def __str__(self):
-        return f"Avis de {self.client.user.username} sur {self.produit.nom} - {self.note}/5"
\ No newline at end of file
+        return f"Avis de {self.client.user.username} sur {self.produit.nom} - {self.note}/5"
+
+
+class DocumentRecherche(models.Model):
+    """
+    Texte normalisé (minuscules, sans accents) d'un produit, par langue
+    Indexé en FULLTEXT sous MySQL (voir products/recherche.py)
+    """
+    
+    produit = models.ForeignKey(
+        Produit,
+        on_delete=models.CASCADE,
+        related_name='documents_recherche',
+        verbose_name=_("Produit")
+    )
+    langue = models.CharField(
+        max_length=10,
+        verbose_name=_("Langue")
+    )
+    titre = models.CharField(
+        max_length=255,
+        verbose_name=_("Titre normalisé")
+    )
+    contenu = models.TextField(
+        verbose_name=_("Contenu normalisé")
+    )
+    
+    class Meta:
+        verbose_name = _("Document de recherche")
+        verbose_name_plural = _("Documents de recherche")
+        unique_together = ['produit', 'langue']
+    
+    def __str__(self):
+        return f"{self.produit_id} [{self.langue}]"
+
+
+class TermeRecherche(models.Model):
+    """
+    Index inversé de la recherche produits : un terme normalisé
+    d'un produit dans une langue, avec son poids (nom > résumé > description)
+    Utilisé quand la base ne propose pas de FULLTEXT (SQLite, tests)
+    """
+    
+    produit = models.ForeignKey(
+        Produit,
+        on_delete=models.CASCADE,
+        related_name='termes_recherche',
+        verbose_name=_("Produit")
+    )
+    langue = models.CharField(
+        max_length=10,
+        verbose_name=_("Langue")
+    )
+    terme = models.CharField(
+        max_length=64,
+        verbose_name=_("Terme")
+    )
+    poids = models.PositiveIntegerField(
+        default=1,
+        verbose_name=_("Poids")
+    )
+    
+    class Meta:
+        verbose_name = _("Terme de recherche")
+        verbose_name_plural = _("Termes de recherche")
+        unique_together = ['produit', 'langue', 'terme']
+        indexes = [
+            models.Index(fields=['langue', 'terme']),
+        ]
+    
+    def __str__(self):
+        return f"{self.terme} [{self.langue}] → {self.produit_id}"
+
+
+class ImportCatalogue(models.Model):
+    """
+    Import en masse envoyé par une entreprise, exécuté par une tâche de fond
+    (voir products.importation et products.jobs.importer_catalogue)
+    Le fichier est supprimé une fois traité ; le rapport reste consultable
+    """
+    
+    EN_ATTENTE = 'en_attente'
+    EN_COURS = 'en_cours'
+    TERMINE = 'termine'
+    ECHOUE = 'echoue'
+    
+    STATUS_CHOICES = (
+        (EN_ATTENTE, _('En attente')),
+        (EN_COURS, _('En cours')),
+        (TERMINE, _('Terminé')),
+        (ECHOUE, _('Échoué')),
+    )
+    
+    entreprise = models.ForeignKey(
+        Entreprise,
+        on_delete=models.CASCADE,
+        related_name='imports_catalogue',
+        verbose_name=_("Entreprise")
+    )
+    fichier = models.FileField(
+        upload_to='imports/%Y/%m/',
+        blank=True,
+        verbose_name=_("Fichier")
+    )
+    format_fichier = models.CharField(
+        max_length=10,
+        verbose_name=_("Format")
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=EN_ATTENTE,
+        verbose_name=_("Statut")
+    )
+    # Rapport de ImportProduits (créés, mis à jour, erreurs par ligne)
+    rapport = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name=_("Rapport")
+    )
+    erreur = models.TextField(
+        blank=True,
+        verbose_name=_("Erreur")
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_("Date de création")
+    )
+    termine_le = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Terminé le")
+    )
+    
+    class Meta:
+        verbose_name = _("Import de catalogue")
+        verbose_name_plural = _("Imports de catalogue")
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Import {self.pk} ({self.entreprise_id}) - {self.status}"
+
+
+class VuesProduitEnAttente(models.Model):
+    """
+    Produit dont des vues attendent d'être écrites en base
+    Les compteurs sont dans le cache `vues` ; cette table indexe les produits
+    à parcourir au flush (voir products/vues.py)
+    """
+    
+    produit = models.OneToOneField(
+        Produit,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name=_("Produit")
+    )
+    
+    class Meta:
+        verbose_name = _("Vues produit en attente")
+        verbose_name_plural = _("Vues produits en attente")
+    
+    def __str__(self):
+        return f"Vues en attente → {self.produit_id}"
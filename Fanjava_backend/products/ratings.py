@@ -0,0 +1,113 @@
+# products/ratings.py
+"""
+Agrégats de notes dénormalisés sur Produit
+
+note_moyenne, nombre_avis et repartition_notes sont recalculés à chaque
+écriture d'un Avis (voir products/signals.py) afin que les pages produit,
+les listes et le panier lisent les notes sans aucune requête d'agrégat.
+Le recalcul reste dans la transaction de l'avis : en tâche de fond, le
+cache du catalogue (propre à chaque processus web avec locmem) serait
+invalidé avant que les notes ne changent.
+"""
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Avis, Produit
+
+
+NOTES = range(1, 6)
+
+
+def calculer_agregats(compteurs):
+    """
+    Calcule (note_moyenne, nombre_avis, repartition_notes)
+    à partir d'un dictionnaire {note: nombre d'avis}
+    """
+    repartition = {str(note): int(compteurs.get(note, 0)) for note in NOTES}
+    nombre_avis = sum(repartition.values())
+
+    if nombre_avis:
+        total = sum(note * repartition[str(note)] for note in NOTES)
+        note_moyenne = (Decimal(total) / Decimal(nombre_avis)).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
+    else:
+        note_moyenne = Decimal('0.00')
+
+    return note_moyenne, nombre_avis, repartition
+
+
+def compteurs_par_produit(produit_ids=None):
+    """
+    Une seule requête GROUP BY (produit, note) sur les avis approuvés
+    Retourne {produit_id: {note: nombre}}
+    """
+    avis = Avis.objects.filter(approuve=True)
+    if produit_ids is not None:
+        avis = avis.filter(produit_id__in=produit_ids)
+
+    compteurs = defaultdict(dict)
+    lignes = avis.order_by().values('produit_id', 'note').annotate(nombre=Count('id'))
+    for ligne in lignes:
+        compteurs[ligne['produit_id']][ligne['note']] = ligne['nombre']
+    return compteurs
+
+
+def recalculer_notes_produit(produit_id):
+    """Recalcule les agrégats d'un produit (une lecture groupée + un UPDATE)"""
+    compteurs = compteurs_par_produit([produit_id]).get(produit_id, {})
+    note_moyenne, nombre_avis, repartition = calculer_agregats(compteurs)
+
+    Produit.objects.filter(pk=produit_id).update(
+        note_moyenne=note_moyenne,
+        nombre_avis=nombre_avis,
+        repartition_notes=repartition,
+        updated_at=timezone.now()
+    )
+
+
+def recalculer_toutes_les_notes(batch_size=1000):
+    """
+    Recalcule les agrégats de tous les produits en masse
+    Retourne le nombre de produits mis à jour
+    """
+    compteurs = compteurs_par_produit()
+
+    a_mettre_a_jour = []
+    total = 0
+    produits = Produit.objects.only(
+        'id', 'note_moyenne', 'nombre_avis', 'repartition_notes'
+    ).order_by('pk')
+
+    for produit in produits.iterator(chunk_size=batch_size):
+        note_moyenne, nombre_avis, repartition = calculer_agregats(
+            compteurs.get(produit.pk, {})
+        )
+        if (produit.note_moyenne == note_moyenne and
+                produit.nombre_avis == nombre_avis and
+                produit.repartition_notes == repartition):
+            continue
+
+        produit.note_moyenne = note_moyenne
+        produit.nombre_avis = nombre_avis
+        produit.repartition_notes = repartition
+        a_mettre_a_jour.append(produit)
+
+        if len(a_mettre_a_jour) >= batch_size:
+            Produit.objects.bulk_update(
+                a_mettre_a_jour, ['note_moyenne', 'nombre_avis', 'repartition_notes']
+            )
+            total += len(a_mettre_a_jour)
+            a_mettre_a_jour = []
+
+    if a_mettre_a_jour:
+        Produit.objects.bulk_update(
+            a_mettre_a_jour, ['note_moyenne', 'nombre_avis', 'repartition_notes']
+        )
+        total += len(a_mettre_a_jour)
+
+    return total
@@ -0,0 +1,296 @@
+# products/recherche.py
+"""
+Recherche plein texte des produits
+
+Chaque produit est indexé à l'enregistrement (voir products/signals.py),
+dans chaque langue du site (traduction modeltranslation, à défaut le
+français). Le texte est normalisé : minuscules, accents retirés (é -> e,
+ô -> o, œ -> oe), mots vides français/malgaches ignorés.
+
+Deux moteurs :
+- 'fulltext' (MySQL) : DocumentRecherche + index FULLTEXT, requête
+  MATCH ... AGAINST en mode booléen (+terme*)
+- 'termes' (SQLite, autres bases) : index inversé TermeRecherche
+  (terme, poids), recherche par préfixe sur un index B-tree
+
+Les deux moteurs exigent tous les mots de la requête (préfixes acceptés)
+et trient par pertinence (les mots du nom pèsent plus que la description).
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from functools import reduce
+from operator import add, or_
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Func, IntegerField, Max, Q, Sum, Value, When
+
+from .models import Produit, DocumentRecherche, TermeRecherche
+
+
+LANGUES = [code for code, nom in settings.LANGUAGES]
+LANGUE_PAR_DEFAUT = settings.LANGUAGE_CODE
+
+# Champs indexés et leur poids
+CHAMPS = (
+    ('nom', 5),
+    ('description_courte', 2),
+    ('description', 1),
+)
+
+# Colonnes dont la modification impose une réindexation
+COLONNES_INDEXEES = {champ for champ, poids in CHAMPS} | {
+    f'{champ}_{langue}' for champ, poids in CHAMPS for langue in LANGUES
+}
+
+MOTS_VIDES = {
+    # Français
+    'au', 'aux', 'avec', 'ce', 'ces', 'dans', 'de', 'des', 'du', 'en', 'et',
+    'la', 'le', 'les', 'leur', 'ou', 'par', 'pour', 'sa', 'se', 'ses', 'son',
+    'sur', 'un', 'une',
+    # Malagasy
+    'amin', 'ary', 'dia', 'fa', 'ho', 'izay', 'na', 'ny', 'sy', 'tao',
+    # Anglais
+    'and', 'for', 'of', 'the', 'with',
+}
+
+# Comme innodb_ft_min_token_size (3 par défaut) : les mots plus courts sont
+# ignorés par FULLTEXT, donc aussi par l'index inversé pour que les deux
+# moteurs donnent les mêmes résultats
+LONGUEUR_MIN_TERME = getattr(settings, 'RECHERCHE_LONGUEUR_MIN_TERME', 3)
+LONGUEUR_MAX_TERME = 64
+TERMES_MAX_REQUETE = 8
+
+LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss', 'ø': 'o', 'ł': 'l'})
+
+
+def normaliser(texte):
+    """Minuscules et accents retirés : 'Crème brûlée' -> 'creme brulee'"""
+    texte = (texte or '').lower().translate(LIGATURES)
+    decompose = unicodedata.normalize('NFKD', texte)
+    return ''.join(c for c in decompose if not unicodedata.combining(c))
+
+
+def tokeniser(texte):
+    """Mots normalisés (hors mots vides et mots trop courts pour FULLTEXT)"""
+    return [
+        mot[:LONGUEUR_MAX_TERME]
+        for mot in re.findall(r'[a-z0-9]+', normaliser(texte))
+        if len(mot) >= LONGUEUR_MIN_TERME and mot not in MOTS_VIDES
+    ]
+
+
+def termes_requete(requete):
+    """Mots distincts de la requête, dans l'ordre (limités)"""
+    return list(dict.fromkeys(tokeniser(requete)))[:TERMES_MAX_REQUETE]
+
+
+def moteur():
+    """Moteur configuré (RECHERCHE_MOTEUR) ou déduit de la base"""
+    choix = getattr(settings, 'RECHERCHE_MOTEUR', 'auto')
+    if choix == 'auto':
+        return 'fulltext' if connection.vendor == 'mysql' else 'termes'
+    return choix
+
+
+def texte_champ(produit, champ, langue):
+    """Valeur traduite, à défaut celle de la langue par défaut (comme modeltranslation)"""
+    return (
+        getattr(produit, f'{champ}_{langue}', None)
+        or getattr(produit, f'{champ}_{LANGUE_PAR_DEFAUT}', None)
+        or getattr(produit, champ, '')
+        or ''
+    )
+
+
+# =========================
+# INDEXATION
+# =========================
+
+def documents_produit(produit):
+    """DocumentRecherche (non enregistrés) d'un produit, un par langue"""
+    documents = []
+    for langue in LANGUES:
+        documents.append(DocumentRecherche(
+            produit=produit,
+            langue=langue,
+            titre=' '.join(tokeniser(texte_champ(produit, 'nom', langue)))[:255],
+            contenu=' '.join(
+                ' '.join(tokeniser(texte_champ(produit, champ, langue)))
+                for champ, poids in CHAMPS[1:]
+            ),
+        ))
+    return documents
+
+
+def termes_produit(produit):
+    """TermeRecherche (non enregistrés) d'un produit, poids cumulés par langue"""
+    termes = []
+    for langue in LANGUES:
+        poids_par_terme = Counter()
+        for champ, poids in CHAMPS:
+            for terme in tokeniser(texte_champ(produit, champ, langue)):
+                poids_par_terme[terme] += poids
+        termes.extend(
+            TermeRecherche(produit=produit, langue=langue, terme=terme, poids=poids)
+            for terme, poids in poids_par_terme.items()
+        )
+    return termes
+
+
+def indexer_produit(produit):
+    """(Ré)indexer un produit : une suppression + une insertion groupée"""
+    with transaction.atomic():
+        if moteur() == 'fulltext':
+            DocumentRecherche.objects.filter(produit=produit).delete()
+            DocumentRecherche.objects.bulk_create(documents_produit(produit))
+        else:
+            TermeRecherche.objects.filter(produit=produit).delete()
+            TermeRecherche.objects.bulk_create(termes_produit(produit))
+
+
+def indexer_produits(produits, batch_size=500):
+    """(Ré)indexer un lot de produits : une suppression + des insertions groupées"""
+    fulltext = moteur() == 'fulltext'
+    modele = DocumentRecherche if fulltext else TermeRecherche
+    construire = documents_produit if fulltext else termes_produit
+
+    lignes = []
+    for produit in produits:
+        lignes.extend(construire(produit))
+    with transaction.atomic():
+        modele.objects.filter(produit__in=[produit.pk for produit in produits]).delete()
+        modele.objects.bulk_create(lignes, batch_size=batch_size)
+
+
+def reindexer_tout(batch_size=500):
+    """
+    Reconstruit tout l'index du moteur actif
+    Retourne le nombre de produits indexés
+    """
+    fulltext = moteur() == 'fulltext'
+    modele = DocumentRecherche if fulltext else TermeRecherche
+    construire = documents_produit if fulltext else termes_produit
+
+    champs = ['id', *COLONNES_INDEXEES]
+    total = 0
+    with transaction.atomic():
+        modele.objects.all().delete()
+        lignes = []
+        for produit in Produit.objects.only(*champs).order_by('pk').iterator(chunk_size=batch_size):
+            lignes.extend(construire(produit))
+            total += 1
+            if len(lignes) >= batch_size:
+                modele.objects.bulk_create(lignes, batch_size=batch_size)
+                lignes = []
+        if lignes:
+            modele.objects.bulk_create(lignes, batch_size=batch_size)
+    return total
+
+
+def creer_index_fulltext():
+    """
+    Crée les index FULLTEXT MySQL s'ils n'existent pas (pas de migrations dans ce projet)
+    Retourne la liste des index créés
+    """
+    table = DocumentRecherche._meta.db_table
+    index = {
+        'recherche_ft_titre': ['titre'],
+        'recherche_ft_titre_contenu': ['titre', 'contenu'],
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [table]
+        )
+        existants = {ligne[0] for ligne in cursor.fetchall()}
+        crees = []
+        for nom, colonnes in index.items():
+            if nom not in existants:
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD FULLTEXT INDEX {nom} ({', '.join(colonnes)})"
+                )
+                crees.append(nom)
+    return crees
+
+
+# =========================
+# RECHERCHE
+# =========================
+
+class Correspondance(Func):
+    """MATCH (colonnes) AGAINST (requête IN BOOLEAN MODE) — MySQL"""
+    output_field = FloatField()
+
+    def __init__(self, *colonnes, requete):
+        super().__init__(*colonnes)
+        self.requete = requete
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(
+            compiler, connection, template='MATCH (%(expressions)s)', **extra_context
+        )
+        return f'{sql} AGAINST (%s IN BOOLEAN MODE)', [*params, self.requete]
+
+
+def _rechercher_fulltext(produits, termes, langue):
+    requete = ' '.join(f'+{terme}*' for terme in termes)
+    return produits.filter(documents_recherche__langue=langue).annotate(
+        pertinence=(
+            Correspondance(
+                'documents_recherche__titre', 'documents_recherche__contenu',
+                requete=requete
+            )
+            + Correspondance('documents_recherche__titre', requete=requete) * 2
+        )
+    ).filter(pertinence__gt=0)
+
+
+def _rechercher_termes(produits, termes, langue):
+    # Une ligne d'index par terme de la requête trouvé (par préfixe)
+    correspond = reduce(or_, [
+        Q(termes_recherche__terme__startswith=terme) for terme in termes
+    ])
+    # Nombre de mots de la requête couverts par le produit
+    couverture = reduce(add, [
+        Max(Case(
+            When(termes_recherche__terme__startswith=terme, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        ))
+        for terme in termes
+    ])
+    # Les mots exacts comptent double par rapport aux simples préfixes
+    pertinence = Sum(Case(
+        When(termes_recherche__terme__in=termes, then=F('termes_recherche__poids') * 2),
+        default=F('termes_recherche__poids'),
+        output_field=IntegerField()
+    ))
+    return produits.filter(
+        correspond, termes_recherche__langue=langue
+    ).annotate(
+        couverture=couverture,
+        pertinence=pertinence
+    ).filter(couverture=len(termes))
+
+
+def rechercher(produits, requete, langue=None):
+    """
+    Filtre `produits` sur la requête et l'annote de `pertinence`
+    (tri par pertinence décroissante) ; aucun résultat si la requête
+    ne contient aucun mot significatif
+    """
+    termes = termes_requete(requete)
+    if not termes:
+        return produits.none()
+    if langue not in LANGUES:
+        langue = LANGUE_PAR_DEFAUT
+
+    if moteur() == 'fulltext':
+        resultats = _rechercher_fulltext(produits, termes, langue)
+    else:
+        resultats = _rechercher_termes(produits, termes, langue)
+    return resultats.order_by('-pertinence', '-created_at', '-pk')
@@ -1,9 +1,16 @@
 from rest_framework import serializers
-from .models import Categorie, Produit, ImageProduit, Avis
+from .models import Categorie, Produit, ImageProduit, Avis, ImportCatalogue
+from .images import urls_derivees
+from .recherche import CHAMPS, LANGUES
+
+
+# Colonnes de traduction acceptées à l'import (nom_en, description_mg...)
+COLONNES_TRADUITES = [f'{champ}_{langue}' for champ, poids in CHAMPS for langue in LANGUES]
 
 
 class CategorieSerializer(serializers.ModelSerializer):
     sous_categories = serializers.SerializerMethodField()
+    image_derivees = serializers.SerializerMethodField()
     
     class Meta:
         model = Categorie
@@ -13,6 +20,7 @@ class CategorieSerializer(serializers.ModelSerializer):
             'slug',
             'description',
             'image',
+            'image_derivees',
             'parent',
             'ordre',
             'active',
@@ -27,8 +35,20 @@ class CategorieSerializer(serializers.ModelSerializer):
             'ordre': {'required': False, 'default': 0},
         }
     
+    def get_image_derivees(self, obj):
+        """URL des tailles générées (None tant que l'image n'est pas traitée)"""
+        return urls_derivees(obj.image_empreinte, self.context.get('request'))
+    
     def get_sous_categories(self, obj):
         """Récupérer les sous-catégories actives"""
+        arbre = self.context.get('arbre')
+        if arbre is not None:
+            # Hiérarchie déjà chargée en mémoire (voir products.arbre)
+            return self.__class__(
+                arbre.sous_categories(obj),
+                many=True,
+                context=self.context
+            ).data
         if hasattr(obj, 'sous_categories') and obj.sous_categories.exists():
             return CategorieSerializer(
                 obj.sous_categories.filter(active=True),
@@ -38,11 +58,33 @@ class CategorieSerializer(serializers.ModelSerializer):
         return []
 
 
+class CategorieArbreSerializer(CategorieSerializer):
+    """
+    Nœud de l'arbre des catégories
+    Nécessite un ArbreCategories dans le contexte (clé 'arbre')
+    """
+    nombre_produits = serializers.IntegerField(read_only=True)
+    nombre_produits_total = serializers.SerializerMethodField()
+    
+    class Meta(CategorieSerializer.Meta):
+        fields = CategorieSerializer.Meta.fields + ['nombre_produits', 'nombre_produits_total']
+    
+    def get_nombre_produits_total(self, obj):
+        """Produits de la catégorie et de ses sous-catégories"""
+        return self.context['arbre'].nombre_produits_total(obj)
+
+
 class ImageProduitSerializer(serializers.ModelSerializer):
+    derivees = serializers.SerializerMethodField()
+    
     class Meta:
         model = ImageProduit
-        fields = ['id', 'image', 'alt_text', 'est_principale', 'ordre', 'created_at']
+        fields = ['id', 'image', 'derivees', 'alt_text', 'est_principale', 'ordre', 'created_at']
         read_only_fields = ['created_at']
+    
+    def get_derivees(self, obj):
+        """{taille: {webp, jpeg}} (None tant que l'image n'est pas traitée)"""
+        return urls_derivees(obj.empreinte, self.context.get('request'))
 
 
 class AvisSerializer(serializers.ModelSerializer):
@@ -158,6 +200,7 @@ class ProduitListSerializer(serializers.ModelSerializer):
         source='get_prix_final'
     )
     image_principale = serializers.SerializerMethodField()
+    image_principale_derivees = serializers.SerializerMethodField()
     
     class Meta:
         model = Produit
@@ -173,6 +216,7 @@ class ProduitListSerializer(serializers.ModelSerializer):
             'categorie_nom',
             'entreprise_nom',
             'image_principale',
+            'image_principale_derivees',
             'note_moyenne',
             'en_vedette',
             'en_promotion',
@@ -181,16 +225,26 @@ class ProduitListSerializer(serializers.ModelSerializer):
         ]
     
     def get_image_principale(self, obj):
-        """Récupérer l'image principale du produit"""
-        image = obj.images.filter(est_principale=True).first()
-        if not image:
-            image = obj.images.first()
+        """
+        Image principale du produit (depuis les images préchargées) :
+        format carte en WebP une fois générée, sinon l'original
+        """
+        image = obj.get_image_principale()
         
         if image:
             request = self.context.get('request')
             if request:
+                derivees = urls_derivees(image.empreinte, request)
+                if derivees and 'carte' in derivees:
+                    return derivees['carte']['webp']
                 return request.build_absolute_uri(image.image.url)
         return None
+    
+    def get_image_principale_derivees(self, obj):
+        image = obj.get_image_principale()
+        if image:
+            return urls_derivees(image.empreinte, self.context.get('request'))
+        return None
 
 
 class ProduitDetailSerializer(serializers.ModelSerializer):
@@ -207,6 +261,7 @@ class ProduitDetailSerializer(serializers.ModelSerializer):
     )
     note_moyenne = serializers.FloatField(source='get_note_moyenne', read_only=True)
     nombre_avis = serializers.IntegerField(source='get_nombre_avis', read_only=True)
+    repartition_notes = serializers.JSONField(source='get_repartition_notes', read_only=True)
     avis = AvisSerializer(many=True, read_only=True)
     
     class Meta:
@@ -233,6 +288,7 @@ class ProduitDetailSerializer(serializers.ModelSerializer):
             'images',
             'note_moyenne',
             'nombre_avis',
+            'repartition_notes',
             'nombre_vues',
             'nombre_ventes',
             'avis',
@@ -243,6 +299,7 @@ class ProduitDetailSerializer(serializers.ModelSerializer):
             'slug',
             'note_moyenne',
             'nombre_avis',
+            'repartition_notes',
             'nombre_vues',
             'nombre_ventes',
             'created_at',
@@ -384,4 +441,34 @@ class ProduitCreateUpdateSerializer(serializers.ModelSerializer):
             for image_data in images_data:
                 ImageProduit.objects.create(produit=instance, **image_data)
         
-        return instance
\ No newline at end of file
+        return instance
+
+class ProduitImportSerializer(ProduitCreateUpdateSerializer):
+    """
+    Une ligne d'import en masse (voir products.importation)
+    Mêmes règles que ProduitCreateUpdateSerializer ; le SKU identifie le produit,
+    les catégories sont vérifiées en mémoire (context['categories'] : ensemble d'id)
+    """
+    sku = serializers.CharField(max_length=100)
+    categorie = serializers.IntegerField(required=False, allow_null=True)
+    
+    class Meta(ProduitCreateUpdateSerializer.Meta):
+        fields = [
+            'sku',
+            *[champ for champ in ProduitCreateUpdateSerializer.Meta.fields if champ != 'images'],
+            *COLONNES_TRADUITES,
+        ]
+    
+    def validate_categorie(self, value):
+        if value is not None and value not in self.context['categories']:
+            raise serializers.ValidationError("Catégorie introuvable")
+        return value
+
+
+class ImportCatalogueSerializer(serializers.ModelSerializer):
+    """Suivi d'un import en masse et son rapport une fois terminé"""
+    
+    class Meta:
+        model = ImportCatalogue
+        fields = ['id', 'format_fichier', 'status', 'rapport', 'erreur', 'created_at', 'termine_le']
+        read_only_fields = fields
@@ -0,0 +1,113 @@
+# products/signals.py
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache
+from .jobs import generer_derivees_categorie, generer_derivees_image_produit, liberer_image
+from .models import Avis, Categorie, ImageProduit, Produit
+from .ratings import recalculer_notes_produit
+from .recherche import indexer_produit, COLONNES_INDEXEES
+
+
+@receiver(pre_save, sender=Avis)
+def memoriser_produit_avis(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Retenir le produit d'origine d'un avis rattaché à un autre produit"""
+    instance._produit_precedent = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and not {'produit', 'produit_id'}.intersection(update_fields):
+        return
+    instance._produit_precedent = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('produit_id', flat=True).first()
+
+
+@receiver(post_save, sender=Avis)
+def avis_enregistre(sender, instance, **kwargs):
+    """Création, modification ou (dés)approbation d'un avis"""
+    recalculer_notes_produit(instance.produit_id)
+    precedent = getattr(instance, '_produit_precedent', None)
+    if precedent and precedent != instance.produit_id:
+        recalculer_notes_produit(precedent)
+    cache.invalider_apres_commit(cache.PRODUITS)
+
+
+@receiver(post_delete, sender=Avis)
+def avis_supprime(sender, instance, origin=None, **kwargs):
+    """Suppression d'un avis (inutile si c'est le produit lui-même qui est supprimé)"""
+    if isinstance(origin, Produit):
+        return
+    recalculer_notes_produit(instance.produit_id)
+    cache.invalider_apres_commit(cache.PRODUITS)
+
+
+@receiver(post_save, sender=Produit)
+@receiver(post_delete, sender=Produit)
+@receiver(post_save, sender=ImageProduit)
+@receiver(post_delete, sender=ImageProduit)
+def produit_modifie(sender, **kwargs):
+    """Invalider les listes de produits en cache"""
+    cache.invalider_apres_commit(cache.PRODUITS)
+
+
+@receiver(post_save, sender=Produit)
+def produit_indexe(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mettre à jour l'index de recherche si un champ texte a pu changer"""
+    if raw:
+        return
+    if update_fields is not None and not COLONNES_INDEXEES.intersection(update_fields):
+        return
+    indexer_produit(instance)
+
+
+@receiver(post_save, sender=Categorie)
+@receiver(post_delete, sender=Categorie)
+def categorie_modifiee(sender, **kwargs):
+    """Invalider les listes de catégories en cache"""
+    cache.invalider_apres_commit(cache.CATEGORIES)
+
+
+@receiver(post_save, sender=ImageProduit)
+def image_produit_enregistree(sender, instance, raw=False, **kwargs):
+    """Générer les dérivées d'une nouvelle image (tâche de fond)"""
+    if raw or instance.empreinte or not instance.image:
+        return
+    generer_derivees_image_produit.differer(pk=instance.pk)
+
+
+@receiver(post_save, sender=Categorie)
+def image_categorie_enregistree(sender, instance, raw=False, **kwargs):
+    """Générer les dérivées d'une nouvelle image de catégorie (tâche de fond)"""
+    if raw or instance.image_empreinte or not instance.image:
+        return
+    generer_derivees_categorie.differer(pk=instance.pk)
+
+
+@receiver(pre_save, sender=ImageProduit)
+@receiver(pre_save, sender=Categorie)
+def memoriser_fichier_image(sender, instance, raw=False, **kwargs):
+    """Retenir le fichier remplacé par un nouvel envoi (ou retiré)"""
+    instance._image_precedente = None
+    if raw or not instance.pk:
+        return
+    if not instance.image or not instance.image._committed:
+        instance._image_precedente = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=ImageProduit)
+@receiver(post_save, sender=Categorie)
+def image_remplacee(sender, instance, **kwargs):
+    precedente = getattr(instance, '_image_precedente', None)
+    if precedente and precedente != instance.image.name:
+        liberer_image(precedente)
+
+
+@receiver(post_delete, sender=ImageProduit)
+@receiver(post_delete, sender=Categorie)
+def image_supprimee(sender, instance, **kwargs):
+    """Fichier libéré : supprimé s'il n'est plus référencé (voir products.stockage)"""
+    if instance.image:
+        liberer_image(instance.image.name)
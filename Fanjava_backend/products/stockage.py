@@ -0,0 +1,149 @@
+# products/stockage.py
+"""
+Stockage des images produits et catégories adressé par contenu
+
+Chaque fichier envoyé est haché (SHA-256) pendant son écriture sur disque
+puis rangé sous son empreinte :
+
+    images/<2 premiers caractères>/<empreinte>.<extension>
+
+Une même photo envoyée plusieurs fois (ou pour un produit et une catégorie)
+n'est donc stockée qu'une fois : les lignes ImageProduit / Categorie
+partagent le même nom de fichier. L'empreinte est aussi celle qui nomme
+les dérivées (voir products.images) : elles sont calculées une seule fois
+par contenu.
+
+Comptage des références : un fichier est supprimé (avec ses dérivées)
+quand plus aucune image produit ni catégorie ne le désigne, par une tâche
+de fond planifiée après la suppression ou le remplacement (voir
+products/signals.py et products/jobs.py). La base fait foi : pas de
+compteur à maintenir ni à réparer.
+
+Les fichiers envoyés avant ce stockage gardent leur nom ;
+`python manage.py dedoublonner_images` les range sous leur empreinte.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+logger = logging.getLogger('fanjava.images')
+
+DOSSIER = 'images'
+DOSSIER_TEMPORAIRE = f'{DOSSIER}/tmp'
+
+RE_NOM = re.compile(rf'^{DOSSIER}/[0-9a-f]{{2}}/(?P<empreinte>[0-9a-f]{{64}})\.\w+$')
+
+# Variantes d'extension ramenées à une seule (même contenu = même nom)
+EXTENSIONS = {
+    '.jpeg': '.jpg',
+    '.jpe': '.jpg',
+    '.jfif': '.jpg',
+}
+
+
+def delai_grace():
+    """
+    Secondes pendant lesquelles un fichier écrit ou réutilisé n'est jamais supprimé :
+    son image est peut-être en cours d'enregistrement dans une transaction non validée
+    """
+    return getattr(settings, 'IMAGES_DELAI_SUPPRESSION', 600)
+
+
+def extension(nom):
+    ext = os.path.splitext(nom)[1].lower()
+    return EXTENSIONS.get(ext, ext) if re.fullmatch(r'\.\w{1,10}', ext) else ''
+
+
+def nom_fichier(empreinte, ext):
+    return f'{DOSSIER}/{empreinte[:2]}/{empreinte}{ext}'
+
+
+def empreinte_du_nom(nom):
+    """Empreinte d'un fichier rangé par ce stockage, None pour un autre nom"""
+    correspondance = RE_NOM.match(nom or '')
+    return correspondance['empreinte'] if correspondance else None
+
+
+@deconstructible
+class StockageParEmpreinte(FileSystemStorage):
+    """FileSystemStorage qui nomme chaque fichier d'après son contenu"""
+
+    def get_available_name(self, name, max_length=None):
+        # Le nom définitif dépend du contenu : choisi dans _save()
+        return name
+
+    def _save(self, name, content):
+        dossier = self.path(DOSSIER_TEMPORAIRE)
+        os.makedirs(dossier, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=dossier)
+        sha = hashlib.sha256()
+        try:
+            with os.fdopen(descripteur, 'wb') as sortie:
+                for bloc in content.chunks():
+                    sha.update(bloc)
+                    sortie.write(bloc)
+            nom = nom_fichier(sha.hexdigest(), extension(name))
+            chemin = self.path(nom)
+            if os.path.exists(chemin):
+                # Contenu déjà stocké : réutilisé (et protégé du nettoyage)
+                os.remove(temporaire)
+                os.utime(chemin)
+            else:
+                os.makedirs(os.path.dirname(chemin), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporaire, self.file_permissions_mode)
+                # Atomique : deux envois simultanés du même contenu écrivent le même fichier
+                os.replace(temporaire, chemin)
+        except BaseException:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            raise
+        return nom
+
+
+stockage_images = StockageParEmpreinte()
+
+
+def references(nom):
+    """Nombre d'images produits et de catégories qui désignent ce fichier"""
+    from .models import Categorie, ImageProduit
+
+    return (
+        ImageProduit.objects.filter(image=nom).count()
+        + Categorie.objects.filter(image=nom).count()
+    )
+
+
+def supprimer_si_orphelin(nom):
+    """
+    Supprime un fichier adressé par contenu qui n'est plus référencé, ainsi que
+    ses dérivées ; retourne True s'il a été supprimé
+    Les fichiers dans leur délai de grâce sont laissés à dedoublonner_images
+    """
+    from .images import supprimer_derivees
+    from .models import Categorie, ImageProduit
+
+    empreinte = empreinte_du_nom(nom)
+    if empreinte is None or references(nom) or not stockage_images.exists(nom):
+        return False
+    if time.time() - os.path.getmtime(stockage_images.path(nom)) < delai_grace():
+        return False
+    stockage_images.delete(nom)
+    # Dérivées partagées avec une autre source de même contenu (autre extension) ?
+    if not (
+        ImageProduit.objects.filter(empreinte=empreinte).exists()
+        or Categorie.objects.filter(image_empreinte=empreinte).exists()
+    ):
+        supprimer_derivees(empreinte)
+    logger.info("Image %s supprimée (plus aucune référence)", nom)
+    return True
+
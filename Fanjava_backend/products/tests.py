@@ -1,3 +1,1193 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import CustomUser, Entreprise, Client
+from . import cache
+from .models import Categorie, Produit, ImageProduit, Avis, ImportCatalogue
+from .recherche import tokeniser
+from .vues import CompteurVues, compteur_vues
+
+
+def creer_entreprise(username='vendeur'):
+    """Créer une entreprise de test avec son utilisateur"""
+    user = CustomUser.objects.create_user(
+        username=username,
+        password='password123',
+        user_type='entreprise'
+    )
+    return Entreprise.objects.create(
+        user=user,
+        nom_entreprise=f'Boutique {username}',
+        siret=f'SIRET-{username}',
+        adresse='1 Rue Test',
+        ville='Antananarivo',
+        code_postal='101',
+        telephone='+261340000000',
+        email_entreprise=f'{username}@test.mg'
+    )
+
+
+def creer_client(username='acheteur'):
+    """Créer un client de test avec son utilisateur"""
+    user = CustomUser.objects.create_user(
+        username=username,
+        password='password123',
+        user_type='client'
+    )
+    return Client.objects.create(user=user)
+
+
+def creer_produits(entreprise, categorie, nombre, images_par_produit=2, **extra):
+    """Créer des produits actifs avec des images (sans fichier réel)"""
+    produits = []
+    debut = Produit.objects.count()
+    for index in range(debut, debut + nombre):
+        produit = Produit.objects.create(
+            entreprise=entreprise,
+            categorie=categorie,
+            nom=f'Produit {entreprise.pk}-{index}',
+            description='Description de test',
+            prix=Decimal('100.00'),
+            stock=10,
+            **extra
+        )
+        for ordre in range(images_par_produit):
+            ImageProduit.objects.create(
+                produit=produit,
+                image=f'produits/test_{produit.pk}_{ordre}.jpg',
+                est_principale=(ordre == images_par_produit - 1),
+                ordre=ordre
+            )
+        produits.append(produit)
+    return produits
+
+
+class ProduitListQueryCountTests(TestCase):
+    """Le catalogue doit être servi en un nombre constant de requêtes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entreprise = creer_entreprise()
+        cls.categorie = Categorie.objects.create(nom='Électronique')
+
+    def setUp(self):
+        cache.get_cache().clear()
+        caches['vues'].clear()
+        compteur_vues.flush()
+        self.client = APIClient()
+
+    def _compter_requetes(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_image_principale_depuis_prefetch(self):
+        creer_produits(self.entreprise, self.categorie, 1, images_par_produit=3)
+        response = self.client.get('/api/products/produits/')
+        image_url = response.data['results'][0]['image_principale']
+        self.assertTrue(image_url.endswith('_2.jpg'))
+
+    def test_liste_nombre_requetes_constant(self):
+        creer_produits(self.entreprise, self.categorie, 2)
+        requetes_petite_page, _ = self._compter_requetes('/api/products/produits/')
+
+        creer_produits(self.entreprise, self.categorie, 18)
+        requetes_grande_page, response = self._compter_requetes('/api/products/produits/')
+
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(requetes_petite_page, requetes_grande_page)
+        # COUNT + produits (JOIN catégorie/entreprise) + images préchargées
+        self.assertEqual(requetes_grande_page, 3)
+
+    def test_actions_catalogue_nombre_requetes_constant(self):
+        creer_produits(
+            self.entreprise, self.categorie, 15,
+            en_promotion=True, en_vedette=True, prix_promo=Decimal('80.00')
+        )
+        for action in ['nouveautes', 'promotions', 'vedette']:
+            with self.subTest(action=action):
+                requetes, response = self._compter_requetes(
+                    f'/api/products/produits/{action}/'
+                )
+                self.assertEqual(len(response.data), 15)
+                self.assertEqual(requetes, 2)
+
+    def test_fiche_avis_et_auteurs_precharges(self):
+        produit = creer_produits(self.entreprise, self.categorie, 1)[0]
+        url = f'/api/products/produits/{produit.slug}/'
+        Avis.objects.create(produit=produit, client=creer_client('client0'), note=4, approuve=True)
+        requetes_un_avis, _ = self._compter_requetes(url)
+
+        for index in range(1, 6):
+            Avis.objects.create(produit=produit, client=creer_client(f'client{index}'), note=5, approuve=True)
+        # Même état du compteur de vues : produit de nouveau inscrit (products.vues)
+        compteur_vues.flush()
+        requetes, response = self._compter_requetes(url)
+
+        self.assertEqual(len(response.data['avis']), 6)
+        self.assertEqual(requetes, requetes_un_avis)
+
+
+class NotesDenormaliseesTests(TestCase):
+    """Les agrégats de notes sont maintenus à chaque écriture d'avis"""
+
+    @classmethod
+    def setUpTestData(cls):
+        entreprise = creer_entreprise()
+        categorie = Categorie.objects.create(nom='Mode')
+        cls.produit = creer_produits(entreprise, categorie, 1, images_par_produit=0)[0]
+        cls.clients = [creer_client(f'acheteur{index}') for index in range(3)]
+
+    def _laisser_avis(self, client, note, **extra):
+        return Avis.objects.create(
+            produit=self.produit,
+            client=client,
+            note=note,
+            commentaire='Très bon produit, je recommande',
+            **extra
+        )
+
+    def test_creation_modification_suppression(self):
+        premier = self._laisser_avis(self.clients[0], 5)
+        self._laisser_avis(self.clients[1], 2)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.nombre_avis, 2)
+        self.assertEqual(self.produit.get_note_moyenne(), 3.5)
+        self.assertEqual(
+            self.produit.get_repartition_notes(),
+            {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1}
+        )
+
+        premier.note = 3
+        premier.save()
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.get_note_moyenne(), 2.5)
+
+        premier.delete()
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.nombre_avis, 1)
+        self.assertEqual(self.produit.get_note_moyenne(), 2.0)
+
+    def test_approbation(self):
+        avis = self._laisser_avis(self.clients[0], 4, approuve=False)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.nombre_avis, 0)
+
+        avis.approuve = True
+        avis.save()
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.nombre_avis, 1)
+        self.assertEqual(self.produit.get_note_moyenne(), 4.0)
+
+    def test_avis_deplace(self):
+        autre = Produit.objects.create(
+            entreprise=self.produit.entreprise, nom='Lamba', sku='LAM-1',
+            description='Lamba en soie', prix=Decimal('50.00')
+        )
+        avis = self._laisser_avis(self.clients[0], 4)
+        avis.produit = autre
+        avis.save()
+
+        # Les deux produits sont recalculés : l'ancien ne garde pas l'avis
+        self.produit.refresh_from_db()
+        autre.refresh_from_db()
+        self.assertEqual((self.produit.nombre_avis, autre.nombre_avis), (0, 1))
+        self.assertEqual(autre.get_note_moyenne(), 4.0)
+
+    @override_settings(JOBS_SYNCHRONES=False)
+    def test_notes_a_jour_sans_worker(self):
+        # Recalcul dans la transaction de l'avis : le cache invalidé au commit
+        # ne peut pas être rempli avec les anciennes notes
+        self._laisser_avis(self.clients[0], 4)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.nombre_avis, 1)
+
+    def test_lecture_sans_agregat(self):
+        self._laisser_avis(self.clients[0], 4)
+        produit = Produit.objects.get(pk=self.produit.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(produit.get_note_moyenne(), 4.0)
+            self.assertEqual(produit.get_nombre_avis(), 1)
+
+    def test_commande_recalcul(self):
+        for index, note in enumerate([1, 4, 4]):
+            self._laisser_avis(self.clients[index], note)
+        Produit.objects.filter(pk=self.produit.pk).update(
+            note_moyenne=0, nombre_avis=0, repartition_notes={}
+        )
+
+        call_command('recalculer_notes', stdout=StringIO())
+
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.nombre_avis, 3)
+        self.assertEqual(str(self.produit.note_moyenne), '3.00')
+        self.assertEqual(self.produit.repartition_notes['4'], 2)
+
+
+class CompteurVuesTests(TestCase):
+    """Les vues sont comptées dans le cache partagé puis écrites en une seule requête"""
+
+    @classmethod
+    def setUpTestData(cls):
+        entreprise = creer_entreprise()
+        categorie = Categorie.objects.create(nom='Maison')
+        cls.produits = creer_produits(entreprise, categorie, 3, images_par_produit=0)
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['vues'].clear()
+        compteur_vues.flush()
+
+    @override_settings(PRODUIT_VUES_FLUSH_INTERVAL=3600)
+    def test_retrieve_sans_ecriture(self):
+        produit = self.produits[0]
+        for _ in range(3):
+            response = self.client.get(f'/api/products/produits/{produit.slug}/')
+            self.assertEqual(response.status_code, 200)
+
+        produit.refresh_from_db()
+        self.assertEqual(produit.nombre_vues, 0)
+        self.assertEqual(compteur_vues.en_attente(produit.pk), 3)
+
+        # Vues visibles hors du processus web : la commande les écrit
+        sortie = StringIO()
+        call_command('flush_vues', stdout=sortie)
+        self.assertIn('1 produit(s)', sortie.getvalue())
+        produit.refresh_from_db()
+        self.assertEqual(produit.nombre_vues, 3)
+        self.assertEqual(compteur_vues.en_attente(), 0)
+
+    @override_settings(PRODUIT_VUES_FLUSH_INTERVAL=3600)
+    def test_flush_une_requete_relative(self):
+        Produit.objects.filter(pk=self.produits[1].pk).update(nombre_vues=10)
+        for produit, nombre in zip(self.produits, [1, 2, 5]):
+            compteur_vues.enregistrer(produit.pk, nombre)
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(CompteurVues().flush(), 3)
+        self.assertEqual(
+            len([requete for requete in requetes if requete['sql'].startswith('UPDATE')]), 1
+        )
+
+        vues = dict(Produit.objects.values_list('pk', 'nombre_vues'))
+        self.assertEqual(
+            [vues[produit.pk] for produit in self.produits],
+            [1, 12, 5]
+        )
+
+    @override_settings(PRODUIT_VUES_FLUSH_INTERVAL=3600)
+    def test_vues_pendant_le_flush(self):
+        from unittest import mock
+
+        produit = self.produits[0]
+        compteur_vues.enregistrer(produit.pk, 2)
+        ecrire = compteur_vues._ecrire
+
+        def ecrire_puis_vue(items):
+            ecrire(items)
+            compteur_vues.enregistrer(produit.pk)
+
+        with mock.patch.object(compteur_vues, '_ecrire', ecrire_puis_vue):
+            self.assertEqual(compteur_vues.flush(), 1)
+
+        # Vue arrivée après la lecture du compteur : pas perdue, pas écrite deux fois
+        produit.refresh_from_db()
+        self.assertEqual((produit.nombre_vues, compteur_vues.en_attente(produit.pk)), (2, 1))
+        compteur_vues.flush()
+        produit.refresh_from_db()
+        self.assertEqual((produit.nombre_vues, compteur_vues.en_attente()), (3, 0))
+
+    @override_settings(PRODUIT_VUES_FLUSH_INTERVAL=0)
+    def test_flush_periodique(self):
+        compteur_vues.enregistrer(self.produits[2].pk)
+        self.produits[2].refresh_from_db()
+        self.assertEqual(self.produits[2].nombre_vues, 1)
+
+    @override_settings(PRODUIT_VUES_FLUSH_INTERVAL=0, JOBS_SYNCHRONES=False)
+    def test_flush_en_tache_de_fond(self):
+        from jobs.models import Job
+        from jobs.worker import Worker
+
+        produit = self.produits[2]
+        for _ in range(2):
+            compteur_vues.enregistrer(produit.pk)
+
+        # Flush demandé sans être exécuté dans la requête, demandes fusionnées
+        produit.refresh_from_db()
+        self.assertEqual(produit.nombre_vues, 0)
+        self.assertEqual(Job.objects.filter(cle='vues:flush').count(), 1)
+
+        Worker().executer_disponibles()
+        produit.refresh_from_db()
+        self.assertEqual((produit.nombre_vues, compteur_vues.en_attente()), (2, 0))
+
+
+class CacheCatalogueTests(TestCase):
+    """Les listes du catalogue sont servies depuis le cache jusqu'à la prochaine écriture"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entreprise = creer_entreprise()
+        cls.categorie = Categorie.objects.create(nom='Maison')
+        cls.produit = creer_produits(cls.entreprise, cls.categorie, 3)[0]
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+
+    def test_hit_sans_requete(self):
+        premiere = self.client.get('/api/products/produits/')
+        with self.assertNumQueries(0):
+            seconde = self.client.get('/api/products/produits/')
+
+        self.assertEqual(premiere.data, seconde.data)
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_cle_par_langue_et_parametres(self):
+        self.client.get('/api/products/produits/')
+        self.client.get('/api/products/produits/', HTTP_ACCEPT_LANGUAGE='en')
+        self.client.get('/api/products/produits/?ordering=prix')
+        self.client.get('/api/products/produits/?ordering=prix')
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+    def test_invalidation_par_les_signaux(self):
+        self.client.get('/api/products/produits/vedette/')
+        Produit.objects.filter(pk=self.produit.pk).update(en_vedette=True)
+        # update() ne déclenche pas de signal : la réponse en cache est servie
+        self.assertEqual(self.client.get('/api/products/produits/vedette/').data, [])
+
+        self.produit.refresh_from_db()
+        self.produit.save()
+        response = self.client.get('/api/products/produits/vedette/')
+        self.assertEqual([p['id'] for p in response.data], [self.produit.pk])
+
+        self.categorie.nom = 'Jardin'
+        self.categorie.save()
+        response = self.client.get('/api/products/produits/vedette/')
+        self.assertEqual(response.data[0]['categorie_nom'], 'Jardin')
+
+        ImageProduit.objects.filter(produit=self.produit).first().delete()
+        self.client.get('/api/products/produits/vedette/')
+        self.assertEqual(cache.get_stats()['hits'], 1)
+
+    def test_categories_admin_et_public(self):
+        Categorie.objects.create(nom='Archives', active=False)
+        admin = CustomUser.objects.create_user(
+            username='admin', password='password123', user_type='admin'
+        )
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get('/api/products/categories/').data['count'], 2)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/products/categories/').data['count'], 1)
+
+    def test_stats_reservees_aux_admins(self):
+        self.assertEqual(self.client.get('/api/products/cache/stats/').status_code, 401)
+        admin = CustomUser.objects.create_user(
+            username='admin', password='password123', user_type='admin'
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/products/cache/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_ratio', response.data)
+
+
+class RequetesConditionnellesTests(TestCase):
+    """ETag du contenu en cache : 304 sans requête SQL ni sérialisation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categorie = Categorie.objects.create(nom='Maison')
+        cls.produit = creer_produits(creer_entreprise(), cls.categorie, 2)[0]
+
+    def setUp(self):
+        cache.get_cache().clear()
+        caches['vues'].clear()
+        compteur_vues.flush()
+        self.client = APIClient()
+
+    def test_liste_et_categories(self):
+        for url in ('/api/products/produits/', f'/api/products/categories/{self.categorie.slug}/'):
+            premiere = self.client.get(url)
+            self.assertEqual(premiere['Cache-Control'], 'no-cache')
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=premiere['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual((response.content, response['ETag']), (b'', premiere['ETag']))
+            # Autre langue : autre représentation
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=premiere['ETag'], HTTP_ACCEPT_LANGUAGE='en')
+            self.assertEqual(response.status_code, 200)
+
+        etag = self.client.get('/api/products/produits/')['ETag']
+        self.produit.prix = Decimal('2.00')
+        self.produit.save()
+        response = self.client.get('/api/products/produits/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(cache.get_stats()['non_modifiees'], 2)
+
+    def test_etag_du_contenu(self):
+        url = '/api/products/produits/'
+        premiere = self.client.get(url)
+        self.assertFalse(premiere.has_header('Last-Modified'))
+
+        # Nouvelle version sans changement de contenu (écriture vue par un autre processus)
+        cache.invalider(cache.PRODUITS)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=premiere['ETag']).status_code, 304)
+
+        # Écriture non invalidée ici (cache locmem d'un autre processus, réplica en retard) :
+        # le 304 suit la réponse en cache, puis le contenu à son expiration
+        Produit.objects.filter(pk=self.produit.pk).update(prix=Decimal('1.00'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=premiere['ETag']).status_code, 304)
+        cache.get_cache().clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=premiere['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], premiere['ETag'])
+
+    @override_settings(PRODUIT_VUES_FLUSH_INTERVAL=3600)
+    def test_fiche_produit(self):
+        url = f'/api/products/produits/{self.produit.slug}/'
+        etag = self.client.get(url)['ETag']
+        # Identifiant du produit pour le compteur de vues lu dans le cache
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(compteur_vues.en_attente(self.produit.pk), 2)
+
+        # Même contenu pour un client sans avis (entrée de cache distincte : peut_modifier)
+        self.client.force_authenticate(creer_client().user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        ImageProduit.objects.filter(produit=self.produit).first().delete()
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(compteur_vues.en_attente(self.produit.pk), 4)
+
+
+class ArbreCategoriesTests(TestCase):
+    """L'arbre des catégories est construit en une requête, totaux cumulés compris"""
+
+    @classmethod
+    def setUpTestData(cls):
+        entreprise = creer_entreprise()
+        cls.racine = Categorie.objects.create(nom='Alimentation')
+        cls.epicerie = Categorie.objects.create(nom='Épicerie', parent=cls.racine)
+        cls.epices = Categorie.objects.create(nom='Épices', parent=cls.epicerie)
+        cls.archives = Categorie.objects.create(nom='Archives', parent=cls.racine, active=False)
+        cls.ancienne = Categorie.objects.create(nom='Ancienne gamme', parent=cls.archives)
+
+        for categorie, nombre in [
+            (cls.racine, 1), (cls.epicerie, 2), (cls.epices, 3), (cls.ancienne, 4)
+        ]:
+            creer_produits(entreprise, categorie, nombre, images_par_produit=0)
+        creer_produits(entreprise, cls.epices, 1, images_par_produit=0, status='draft')
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+
+    def noeuds(self, arbre):
+        """Aplatit l'arbre sérialisé en {nom: (direct, cumulé)}"""
+        resultat = {}
+        pile = list(arbre)
+        while pile:
+            noeud = pile.pop()
+            resultat[noeud['nom']] = (noeud['nombre_produits'], noeud['nombre_produits_total'])
+            pile.extend(noeud['sous_categories'])
+        return resultat
+
+    def test_arbre_public(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/categories/arbre/')
+
+        self.assertEqual(self.noeuds(response.data), {
+            'Alimentation': (1, 6),
+            'Épicerie': (2, 5),
+            'Épices': (3, 3),
+        })
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/categories/arbre/')
+
+    def test_arbre_admin_et_invalidation(self):
+        admin = CustomUser.objects.create_user(
+            username='admin', password='password123', user_type='admin'
+        )
+        self.client.force_authenticate(admin)
+        noeuds = self.noeuds(self.client.get('/api/products/categories/arbre/').data)
+        self.assertEqual(noeuds['Alimentation'], (1, 11))
+        self.assertEqual(noeuds['Archives'], (0, 4))
+
+        Produit.objects.filter(categorie=self.ancienne).first().delete()
+        noeuds = self.noeuds(self.client.get('/api/products/categories/arbre/').data)
+        self.assertEqual(noeuds['Alimentation'], (1, 10))
+
+    def test_liste_sous_categories_sans_requete_par_noeud(self):
+        for index in range(5):
+            Categorie.objects.create(nom=f'Sous-catégorie {index}', parent=self.epices)
+
+        # COUNT + page + arbre
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/categories/')
+
+        alimentation = next(c for c in response.data['results'] if c['nom'] == 'Alimentation')
+        epicerie = alimentation['sous_categories'][0]
+        self.assertEqual(len(epicerie['sous_categories'][0]['sous_categories']), 5)
+
+
+class FacettesProduitsTests(TestCase):
+    """Facettes en trois requêtes : chaque facette ignore son propre filtre"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur = creer_entreprise()
+        cls.autre = creer_entreprise('artisan')
+        cls.alimentation = Categorie.objects.create(nom='Alimentation')
+        cls.epices = Categorie.objects.create(nom='Épices', parent=cls.alimentation)
+        cls.textile = Categorie.objects.create(nom='Textile')
+
+        creer_produits(cls.vendeur, cls.alimentation, 1, images_par_produit=0)
+        creer_produits(cls.vendeur, cls.epices, 2, images_par_produit=0, en_promotion=True)
+        rupture, = creer_produits(cls.autre, cls.epices, 1, images_par_produit=0)
+        tissu, = creer_produits(cls.autre, cls.textile, 1, images_par_produit=0)
+        Produit.objects.filter(pk=rupture.pk).update(stock=0)
+        Produit.objects.filter(pk=tissu.pk).update(prix=Decimal('75000'))
+        creer_produits(cls.autre, cls.textile, 1, images_par_produit=0, status='draft')
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+
+    def facettes(self, **params):
+        response = self.client.get('/api/products/produits/facettes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_comptes_sans_filtre(self):
+        with self.assertNumQueries(3):
+            data = self.facettes()
+
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(
+            [(c['nom'], c['nombre']) for c in data['categories']],
+            [('Alimentation', 4), ('Épices', 3), ('Textile', 1)]
+        )
+        self.assertEqual(
+            [(e['id'], e['nombre']) for e in data['entreprises']],
+            [(self.vendeur.pk, 3), (self.autre.pk, 2)]
+        )
+        self.assertEqual([t['nombre'] for t in data['prix']], [4, 0, 1, 0, 0])
+        self.assertEqual(data['prix'][2], {'min': 50000, 'max': 100000, 'nombre': 1})
+        self.assertEqual(data['en_promotion'], {'true': 2, 'false': 3})
+        self.assertEqual(data['en_stock'], {'true': 4, 'false': 1})
+
+        with self.assertNumQueries(0):
+            self.facettes()
+
+    def test_filtres_selectionnes(self):
+        data = self.facettes(categorie=self.epices.pk, en_stock='true')
+        self.assertEqual(data['total'], 2)
+        # La facette catégorie ignore le filtre catégorie, pas le filtre stock
+        self.assertEqual(
+            [(c['nom'], c['nombre']) for c in data['categories']],
+            [('Alimentation', 3), ('Épices', 2), ('Textile', 1)]
+        )
+        # La facette stock ignore le filtre stock
+        self.assertEqual(data['en_stock'], {'true': 2, 'false': 1})
+        self.assertEqual([(e['id'], e['nombre']) for e in data['entreprises']], [(self.vendeur.pk, 2)])
+
+        # Filtres hors facettes appliqués à tout
+        data = self.facettes(prix_min='1000')
+        self.assertEqual(data['total'], 1)
+        self.assertEqual([c['nom'] for c in data['categories']], ['Textile'])
+
+    def test_filtre_invalide(self):
+        response = self.client.get('/api/products/produits/facettes/', {'categorie': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RechercheProduitsTests(TestCase):
+    """Recherche plein texte : index maintenu à l'écriture, préfixes, accents, pertinence"""
+
+    @classmethod
+    def setUpTestData(cls):
+        entreprise = creer_entreprise()
+        categorie = Categorie.objects.create(nom='Épicerie fine')
+
+        def produit(nom, description, **extra):
+            return Produit.objects.create(
+                entreprise=entreprise,
+                categorie=categorie,
+                nom=nom,
+                description=description,
+                prix=Decimal('10.00'),
+                stock=5,
+                **extra
+            )
+
+        cls.vanille = produit('Vanille de Madagascar', 'Gousses bourbon séchées au soleil')
+        cls.creme = produit('Crème brûlée', 'Dessert à la vanille')
+        cls.cafe = produit('Café arabica', 'Torréfaction artisanale', nom_mg='Kafe avo')
+        cls.brouillon = produit('Vanille en poudre', 'Brouillon', status='draft')
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+
+    def chercher(self, q, **params):
+        response = self.client.get('/api/products/produits/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [resultat['id'] for resultat in response.data['results']]
+
+    def test_prefixe_accents_et_pertinence(self):
+        # Le nom pèse plus que la description ; brouillon exclu
+        self.assertEqual(self.chercher('vanil'), [self.vanille.pk, self.creme.pk])
+        self.assertEqual(self.chercher('CREME brulee'), [self.creme.pk])
+        self.assertEqual(self.chercher('crème'), [self.creme.pk])
+        self.assertEqual(self.chercher('sechees'), [self.vanille.pk])
+
+    def test_tous_les_mots_requis(self):
+        self.assertEqual(self.chercher('vanille dessert'), [self.creme.pk])
+        self.assertEqual(self.chercher('vanille arabica'), [])
+
+    def test_par_langue(self):
+        self.assertEqual(self.chercher('kafe', langue='mg'), [self.cafe.pk])
+        self.assertEqual(self.chercher('kafe', langue='fr'), [])
+        # Sans traduction anglaise : repli sur le français
+        self.assertEqual(self.chercher('arabica', langue='en'), [self.cafe.pk])
+
+    def test_index_maintenu_a_l_ecriture(self):
+        self.cafe.nom = 'Thé noir'
+        self.cafe.save()
+        self.assertEqual(self.chercher('arabica'), [])
+        self.assertEqual(self.chercher('the noir'), [self.cafe.pk])
+
+        self.cafe.delete()
+        self.assertEqual(self.chercher('noir'), [])
+
+    def test_requete_vide(self):
+        response = self.client.get('/api/products/produits/search/', {'q': 'de la'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_mots_courts_ignores_comme_fulltext(self):
+        # innodb_ft_min_token_size : mots de moins de 3 lettres ni indexés ni cherchés
+        self.assertEqual(tokeniser('Café vert BIO 5L x2'), ['cafe', 'vert', 'bio'])
+        self.assertEqual(self.chercher('vanille 5l'), [self.vanille.pk, self.creme.pk])
+        response = self.client.get('/api/products/produits/search/', {'q': 'va'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reindexation_complete(self):
+        from .models import TermeRecherche
+        TermeRecherche.objects.all().delete()
+        call_command('indexer_produits', stdout=StringIO())
+        self.assertEqual(self.chercher('madagascar'), [self.vanille.pk])
+
+        sortie = StringIO()
+        call_command('benchmark_recherche', 'vanille', repetitions=2, stdout=sortie)
+        self.assertIn('SearchFilter', sortie.getvalue())
+
+
+class PaginationCurseurTests(TestCase):
+    """Mode curseur (keyset) : pas de COUNT, pages stables malgré les ex aequo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        entreprise = creer_entreprise()
+        categorie = Categorie.objects.create(nom='Librairie')
+        produits = creer_produits(entreprise, categorie, 45, images_par_produit=1)
+        # Ex aequo sur les champs de tri : départagés par id
+        for index, produit in enumerate(produits):
+            Produit.objects.filter(pk=produit.pk).update(
+                prix=Decimal(10 + index % 4),
+                created_at=produits[index // 10 * 10].created_at
+            )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+
+    def parcourir(self, url):
+        """Suit les liens next ; retourne (ids, réponses)"""
+        ids, reponses = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            reponses.append(response)
+            ids.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        return ids, reponses
+
+    def test_parcours_complet_sans_count(self):
+        with self.assertNumQueries(2):  # page + images préchargées
+            response = self.client.get('/api/products/produits/?pagination=curseur')
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        ids, reponses = self.parcourir('/api/products/produits/?pagination=curseur')
+        attendu = list(Produit.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, attendu)
+        self.assertEqual([len(r.data['results']) for r in reponses], [20, 20, 5])
+
+    def test_tri_et_retour_arriere(self):
+        ids, reponses = self.parcourir('/api/products/produits/?pagination=curseur&ordering=prix')
+        attendu = list(Produit.objects.order_by('prix', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, attendu)
+
+        precedente = self.client.get(reponses[-1].data['previous'])
+        self.assertEqual([p['id'] for p in precedente.data['results']], attendu[20:40])
+        premiere = self.client.get(precedente.data['previous'])
+        self.assertEqual([p['id'] for p in premiere.data['results']], attendu[:20])
+        self.assertIsNone(premiere.data['previous'])
+
+    def test_mode_par_defaut_et_curseur_invalide(self):
+        self.assertEqual(self.client.get('/api/products/produits/').data['count'], 45)
+        response = self.client.get('/api/products/produits/?cursor=invalide')
+        self.assertEqual(response.status_code, 404)
+
+    def test_benchmark(self):
+        sortie = StringIO()
+        call_command('benchmark_pagination', page=2, repetitions=2, stdout=sortie)
+        self.assertIn('Curseur', sortie.getvalue())
+
+
+class ImportProduitsTests(TestCase):
+    """Import en masse : upsert par SKU, slugs, rapport d'erreurs, index de recherche"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entreprise = creer_entreprise()
+        cls.autre = creer_entreprise('concurrent')
+        cls.categorie = Categorie.objects.create(nom='Artisanat')
+        cls.existant = Produit.objects.create(
+            entreprise=cls.entreprise, nom='Panier', sku='PAN-1',
+            description='Panier tressé', prix=Decimal('20.00'), stock=3
+        )
+        Produit.objects.create(
+            entreprise=cls.autre, nom='Nappe', sku='NAP-1',
+            description='Nappe brodée', prix=Decimal('30.00')
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        media = override_settings(MEDIA_ROOT=dossier.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+
+    def importer(self, contenu, nom='produits.csv'):
+        self.client.force_authenticate(self.entreprise.user)
+        if isinstance(contenu, str):
+            contenu = contenu.encode('utf-8')
+        fichier = SimpleUploadedFile(nom, contenu)
+        return self.client.post('/api/products/produits/import/', {'fichier': fichier}, format='multipart')
+
+    def test_import_csv(self):
+        contenu = (
+            'sku,nom,description,prix,prix_promo,stock,categorie\n'
+            f'RAF-1,Panier,Panier en raphia,15.00,,10,{self.categorie.pk}\n'
+            'RAF-2,Panier,Second panier,12.00,,4,\n'
+            'PAN-1,,,25.00,,,\n'
+            'RAF-3,Chapeau,Chapeau,10.00,12.00,1,\n'
+            'NAP-1,Nappe,Nappe,5.00,,1,\n'
+            'RAF-1,Doublon,Doublon,1.00,,1,\n'
+            'RAF-4,Sac,Sac,8.00,,1,999999\n'
+        )
+        modifie_le = self.existant.updated_at
+        response = self.importer(contenu)
+
+        # Tâche exécutée tout de suite (JOBS_SYNCHRONES) : rapport déjà disponible
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], ImportCatalogue.TERMINE)
+        rapport = response.data['rapport']
+        self.assertEqual(
+            {cle: rapport[cle] for cle in ('lignes', 'crees', 'mis_a_jour', 'nombre_erreurs')},
+            {'lignes': 7, 'crees': 2, 'mis_a_jour': 1, 'nombre_erreurs': 4}
+        )
+        self.assertEqual(
+            {(erreur['ligne'], next(iter(erreur['erreurs']))) for erreur in rapport['erreurs']},
+            {(5, 'prix_promo'), (6, 'sku'), (7, 'sku'), (8, 'categorie')}
+        )
+
+        # Slugs : "panier" pris par le produit existant, puis collision dans le lot
+        slugs = dict(Produit.objects.filter(sku__startswith='RAF').values_list('sku', 'slug'))
+        self.assertEqual(slugs, {'RAF-1': 'panier-raf-1', 'RAF-2': 'panier-raf-2'})
+        self.existant.refresh_from_db()
+        self.assertEqual((self.existant.prix, self.existant.nom, self.existant.stock), (Decimal('25.00'), 'Panier', 3))
+        # bulk_update n'applique pas auto_now : date de modification posée par l'import
+        self.assertGreater(self.existant.updated_at, modifie_le)
+
+        recherche = self.client.get('/api/products/produits/search/', {'q': 'raphia'})
+        self.assertEqual([produit['slug'] for produit in recherche.data['results']], ['panier-raf-1'])
+
+    def test_import_jsonl_commande(self):
+        lignes = [
+            '{"sku": "VAN-1", "nom": "Vanille", "nom_en": "Vanilla", "description": "Gousses", "prix": 40}',
+            '{"sku": "VAN-2", "nom": "Poivre"',
+            '',
+            '{"sku": "VAN-3", "nom": "Cannelle", "description": "Bâtons", "prix": 9, "stock": -1}',
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as fichier:
+            fichier.write('\n'.join(lignes))
+        self.addCleanup(os.remove, fichier.name)
+
+        sortie = StringIO()
+        for _ in range(2):
+            call_command('importer_produits', fichier.name, entreprise=self.entreprise.pk, stdout=sortie)
+        self.assertIn('1 créé(s), 0 mis à jour, 0 inchangé(s)', sortie.getvalue())
+        self.assertIn('0 créé(s), 0 mis à jour, 1 inchangé(s)', sortie.getvalue())
+        self.assertIn('ligne 2 (None)', sortie.getvalue())
+        self.assertIn("'stock'", sortie.getvalue())
+        self.assertEqual(Produit.objects.get(sku='VAN-1').nom_en, 'Vanilla')
+
+    def test_reserve_aux_entreprises(self):
+        self.client.force_authenticate(creer_client().user)
+        fichier = SimpleUploadedFile('produits.csv', b'sku,nom\n')
+        response = self.client.post('/api/products/produits/import/', {'fichier': fichier}, format='multipart')
+        self.assertEqual(response.status_code, 403)
+
+        response = self.importer('sku,nom\n', nom='produits.xlsx')
+        self.assertEqual(response.status_code, 400)
+
+    def test_encodage_et_lignes_malformees(self):
+        # CSV Latin-1 (Excel) : refusé avant le premier lot, rien n'est écrit
+        contenu = 'sku,nom,description,prix\n' + 'CAF-1,Café,Grains,5.00\n' * 1500 + 'CAF-2,Thé,Feuilles,4.00\n'
+        response = self.importer(contenu.encode('latin-1'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ligne 2', response.data['error'])
+        self.assertFalse(Produit.objects.filter(sku__startswith='CAF').exists())
+
+        # Champ au-delà de csv.field_size_limit() : erreur de ligne, la suite est importée
+        contenu = (
+            'sku,nom,description,prix\n'
+            f'CAF-1,Café,{"x" * 200000},5.00\n'
+            'CAF-2,Thé,Feuilles,4.00\n'
+        )
+        rapport = self.importer(contenu).data['rapport']
+        self.assertEqual((rapport['crees'], rapport['nombre_erreurs']), (1, 1))
+        self.assertIn('CSV invalide', rapport['erreurs'][0]['erreurs']['non_field_errors'][0])
+
+    def test_suivi_import(self):
+        response = self.importer('sku,nom,description,prix\nTSI-1,Tsiny,Panier,5.00\n')
+        self.assertEqual(response.status_code, 202)
+        importation = ImportCatalogue.objects.get(pk=response.data['id'])
+        self.assertEqual(response['Location'], f'/api/products/produits/import/{importation.pk}/')
+        # Fichier supprimé une fois traité
+        self.assertEqual(importation.fichier.name, '')
+        self.assertEqual([fichiers for _, _, fichiers in os.walk(settings.MEDIA_ROOT) if fichiers], [])
+        self.assertIsNotNone(importation.termine_le)
+
+        suivi = self.client.get(response['Location'])
+        self.assertEqual(suivi.status_code, 200)
+        self.assertEqual(suivi.data['rapport']['crees'], 1)
+
+        # Seule l'entreprise qui a importé voit le rapport
+        self.client.force_authenticate(self.autre.user)
+        self.assertEqual(self.client.get(response['Location']).status_code, 404)
+
+    def test_import_interrompu(self):
+        from unittest import mock
+        from .importation import ImportProduits
+
+        contenu = 'sku,nom,description,prix\n' + ''.join(f'ECH-{i},Soubique,Panier,5.00\n' for i in range(3))
+        traiter_lot = ImportProduits.traiter_lot
+
+        def panne(import_produits, lot):
+            traiter_lot(import_produits, lot)
+            raise RuntimeError('Disque plein')
+
+        with mock.patch.object(ImportProduits, 'traiter_lot', panne), \
+                self.assertLogs('fanjava.imports', 'ERROR'):
+            response = self.importer(contenu)
+
+        # Lot déjà validé conservé et rapporté, erreur enregistrée, fichier supprimé
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], ImportCatalogue.ECHOUE)
+        self.assertEqual(response.data['erreur'], 'Disque plein')
+        self.assertEqual(response.data['rapport']['crees'], 3)
+        self.assertEqual(Produit.objects.filter(sku__startswith='ECH').count(), 3)
+        self.assertEqual([fichiers for _, _, fichiers in os.walk(settings.MEDIA_ROOT) if fichiers], [])
+
+    def test_export_reimportable(self):
+        self.client.force_authenticate(self.entreprise.user)
+        response = self.client.get('/api/products/produits/export/')
+        contenu = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertEqual(contenu.count('\n'), 2)
+        self.assertNotIn('Nappe', contenu)
+
+        rapport = self.importer(contenu).data['rapport']
+        self.assertEqual((rapport['inchanges'], rapport['nombre_erreurs']), (1, 0))
+
+        self.client.force_authenticate(creer_client().user)
+        self.assertEqual(self.client.get('/api/products/produits/export/').status_code, 403)
+
+
+@override_settings(JOBS_SYNCHRONES=False)
+class ImportEnTacheDeFondTests(TransactionTestCase):
+    """Import exécuté par un worker : chaque lot est validé à part"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        media = override_settings(MEDIA_ROOT=dossier.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.entreprise = creer_entreprise()
+
+    def test_lots_valides_conserves_apres_une_panne(self):
+        import threading
+        from functools import partial
+        from unittest import mock
+        from django.db import connection
+        from jobs.worker import Worker
+        from .importation import ImportProduits
+
+        contenu = 'sku,nom,description,prix\n' + ''.join(
+            f'LOT-{index},Sobika,Panier,5.00\n' for index in range(4)
+        )
+        client = APIClient()
+        client.force_authenticate(self.entreprise.user)
+        response = client.post(
+            '/api/products/produits/import/',
+            {'fichier': SimpleUploadedFile('produits.csv', contenu.encode())},
+            format='multipart'
+        )
+        self.assertEqual((response.status_code, response.data['status']), (202, ImportCatalogue.EN_ATTENTE))
+
+        traiter_lot = ImportProduits.traiter_lot
+        vu_ailleurs = []
+
+        def lire_depuis_une_autre_connexion():
+            try:
+                vu_ailleurs.append((
+                    ImportCatalogue.objects.get().status,
+                    Produit.objects.count(),
+                ))
+            finally:
+                connection.close()
+
+        def panne(import_produits, lot):
+            if import_produits.lignes:
+                # Pendant le second lot : premier lot et statut déjà validés
+                lecteur = threading.Thread(target=lire_depuis_une_autre_connexion)
+                lecteur.start()
+                lecteur.join()
+                raise RuntimeError('Disque plein')
+            traiter_lot(import_produits, lot)
+
+        with mock.patch('products.jobs.ImportProduits', partial(ImportProduits, taille_lot=2)), \
+                mock.patch.object(ImportProduits, 'traiter_lot', panne), \
+                self.assertLogs('fanjava.imports', 'ERROR'):
+            self.assertEqual(Worker().executer_disponibles(), 1)
+
+        self.assertEqual(vu_ailleurs, [(ImportCatalogue.EN_COURS, 2)])
+        # Premier lot validé malgré la panne du second ; échec et rapport enregistrés
+        self.assertEqual(
+            sorted(Produit.objects.values_list('sku', flat=True)), ['LOT-0', 'LOT-1']
+        )
+        importation = ImportCatalogue.objects.get()
+        self.assertEqual((importation.status, importation.erreur), (ImportCatalogue.ECHOUE, 'Disque plein'))
+        self.assertEqual(importation.rapport['crees'], 2)
+
+
+def image_jpeg(largeur, hauteur, exif):
+    """JPEG en mémoire avec des métadonnées EXIF ({tag: valeur})"""
+    from io import BytesIO
+    from PIL import Image
+
+    image = Image.new('RGB', (largeur, hauteur), (200, 80, 40))
+    metadonnees = Image.Exif()
+    for tag, valeur in exif.items():
+        metadonnees[tag] = valeur
+    sortie = BytesIO()
+    image.save(sortie, 'JPEG', exif=metadonnees)
+    return sortie.getvalue()
+
+
+class ImagesDeriveesTests(TestCase):
+    """Dérivées d'images : tailles, EXIF retiré, noms par empreinte, génération paresseuse"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entreprise = creer_entreprise()
+        cls.produit = Produit.objects.create(
+            entreprise=cls.entreprise, nom='Lamba', description='Lamba en soie',
+            prix=Decimal('50.00'), stock=2
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        media = override_settings(MEDIA_ROOT=dossier.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+        # 0x0112 : orientation (6 = rotation de 90°), 0x010F : fabricant de l'appareil
+        self.contenu = image_jpeg(2000, 1000, {0x0112: 6, 0x010F: 'Appareil'})
+
+    def envoyer(self):
+        fichier = SimpleUploadedFile('lamba.jpg', self.contenu, content_type='image/jpeg')
+        return ImageProduit.objects.create(produit=self.produit, image=fichier, est_principale=True)
+
+    def test_derivees_generees_apres_envoi(self):
+        import hashlib
+        from django.core.files.storage import default_storage
+        from PIL import Image
+        from .images import nom_derivee
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.envoyer()
+        image.refresh_from_db()
+        empreinte = hashlib.sha256(self.contenu).hexdigest()
+        self.assertEqual(image.empreinte, empreinte)
+
+        for taille, dimensions in (('miniature', (80, 160)), ('carte', (240, 480)), ('detail', (600, 1200))):
+            for format_ in ('webp', 'jpeg'):
+                with default_storage.open(nom_derivee(empreinte, taille, format_)) as fichier:
+                    derivee = Image.open(fichier)
+                    self.assertEqual(derivee.size, dimensions)
+                    self.assertEqual(len(derivee.getexif()), 0)
+
+        response = self.client.get('/api/products/produits/')
+        resultat = response.data['results'][0]
+        self.assertTrue(resultat['image_principale'].endswith(f'/derivees/{empreinte[:2]}/{empreinte}-carte.webp'))
+        self.assertTrue(resultat['image_principale_derivees']['miniature']['jpeg'].endswith('-miniature.jpeg'))
+
+    def test_generation_paresseuse(self):
+        from django.core.files.storage import default_storage
+        from .images import nom_derivee
+
+        from jobs.models import Job
+
+        with override_settings(JOBS_SYNCHRONES=False):
+            image = self.envoyer()
+        self.assertEqual(Job.objects.get().arguments, {'pk': image.pk})
+        call_command('generer_derivees', '--paresseux', stdout=StringIO())
+        image.refresh_from_db()
+        self.assertTrue(image.empreinte)
+        nom = nom_derivee(image.empreinte, 'carte', 'webp')
+        self.assertFalse(default_storage.exists(nom))
+
+        response = self.client.get(f'/media/{nom}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(b''.join(response.streaming_content))
+        self.assertTrue(default_storage.exists(nom))
+        self.assertFalse(default_storage.exists(nom_derivee(image.empreinte, 'detail', 'webp')))
+
+        self.assertEqual(self.client.get(f'/media/{nom.replace("carte", "geante")}').status_code, 404)
+        self.assertEqual(self.client.get(f'/media/{nom.replace(image.empreinte, "0" * 64)}').status_code, 404)
+
+    def test_categorie_et_fichier_illisible(self):
+        with self.assertLogs('fanjava.images', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            categorie = Categorie.objects.create(
+                nom='Textile', image=SimpleUploadedFile('textile.jpg', self.contenu)
+            )
+            illisible = Categorie.objects.create(
+                nom='Vannerie', image=SimpleUploadedFile('vannerie.jpg', b'pas une image')
+            )
+        categorie.refresh_from_db()
+        illisible.refresh_from_db()
+        self.assertTrue(categorie.image_empreinte)
+        self.assertEqual(illisible.image_empreinte, '')
+
+        response = self.client.get(f'/api/products/categories/{categorie.slug}/')
+        self.assertTrue(response.data['image_derivees']['detail']['webp'].endswith('-detail.webp'))
+        response = self.client.get(f'/api/products/categories/{illisible.slug}/')
+        self.assertIsNone(response.data['image_derivees'])
+
+
+class StockageParEmpreinteTests(TestCase):
+    """Un fichier par contenu, supprimé quand plus aucune image ne le référence"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entreprise = creer_entreprise()
+        cls.produit = Produit.objects.create(
+            entreprise=cls.entreprise, nom='Soubique', description='Panier',
+            prix=Decimal('12.00'), stock=4
+        )
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        reglages = override_settings(MEDIA_ROOT=dossier.name, IMAGES_DELAI_SUPPRESSION=0)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.contenu = image_jpeg(300, 200, {0x010F: 'Appareil'})
+
+    def envoyer(self, nom):
+        return ImageProduit.objects.create(
+            produit=self.produit, image=SimpleUploadedFile(nom, self.contenu)
+        )
+
+    def fichiers(self):
+        from .stockage import stockage_images
+        racine = stockage_images.path('images')
+        return sorted(
+            os.path.relpath(os.path.join(dossier, nom), racine)
+            for dossier, sous_dossiers, noms in os.walk(racine) for nom in noms
+        )
+
+    def test_contenu_stocke_une_fois_puis_supprime(self):
+        import hashlib
+        from django.core.files.storage import default_storage
+        from .images import nom_derivee
+
+        premiere = self.envoyer('WhatsApp_Image.jpeg')
+        seconde = self.envoyer('WhatsApp_Image_3J1UQ3u.JPG')
+        empreinte = hashlib.sha256(self.contenu).hexdigest()
+        self.assertEqual(premiere.image.name, f'images/{empreinte[:2]}/{empreinte}.jpg')
+        self.assertEqual(seconde.image.name, premiere.image.name)
+        self.assertEqual(self.fichiers(), [f'{empreinte[:2]}/{empreinte}.jpg'])
+        derivee = nom_derivee(empreinte, 'carte', 'webp')
+        self.assertTrue(default_storage.exists(derivee))
+
+        premiere.delete()
+        self.assertEqual(len(self.fichiers()), 1)
+        self.produit.delete()
+        self.assertEqual(self.fichiers(), [])
+        self.assertFalse(default_storage.exists(derivee))
+
+    def test_dedoublonner_anciens_fichiers(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import FileSystemStorage
+        from .stockage import stockage_images
+
+        ancien = FileSystemStorage()
+        noms = [ancien.save(nom, ContentFile(self.contenu)) for nom in ('produits/a.jpeg', 'produits/a_x1.jpeg')]
+        for nom in noms:
+            ImageProduit.objects.create(produit=self.produit, image=nom)
+        # Écrit sans image enregistrée (transaction annulée) : plus référencé
+        stockage_images.save('autre.png', ContentFile(b'contenu'))
+
+        sortie = StringIO()
+        call_command('dedoublonner_images', stdout=sortie)
+
+        images = set(ImageProduit.objects.values_list('image', 'empreinte'))
+        self.assertEqual(len(images), 1)
+        nom, empreinte = images.pop()
+        self.assertEqual(nom, f'images/{empreinte[:2]}/{empreinte}.jpg')
+        self.assertFalse(any(ancien.exists(nom) for nom in noms))
+        self.assertEqual(len(self.fichiers()), 1)
+        self.assertIn('1 fichier(s) orphelin(s)', sortie.getvalue())
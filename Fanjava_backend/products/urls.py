@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategorieViewSet, ProduitViewSet, AvisViewSet, ImageProduitViewSet
+from .views import CategorieViewSet, ProduitViewSet, AvisViewSet, ImageProduitViewSet, CacheCatalogueStatsView
 
 router = DefaultRouter()
 router.register(r'categories', CategorieViewSet, basename='categorie')
@@ -9,5 +9,6 @@ router.register(r'avis', AvisViewSet, basename='avis')
 router.register(r'images', ImageProduitViewSet, basename='image')  # ← AJOUT
 
 urlpatterns = [
+    path('cache/stats/', CacheCatalogueStatsView.as_view(), name='cache-catalogue-stats'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
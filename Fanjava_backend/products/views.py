@@ -2,31 +2,55 @@
 
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.exceptions import PermissionDenied, ValidationError
-from django.db.models import Q, Count
+from django.core.files.storage import default_storage
+from django.db.models import Q, Count, Prefetch
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_GET
+from django.utils.translation import get_language
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .models import Categorie, Produit, ImageProduit, Avis
+from Fanjava_backend.db.routeur import LectureReplicaMixin
+from Fanjava_backend.instrumentation import SerialisationMesureeMixin, donnees_serialisees
+from Fanjava_backend.pagination import PaginationHybride
+from Fanjava_backend.streaming import reponse_export
+
+from .models import Categorie, Produit, ImageProduit, Avis, ImportCatalogue
 from .serializers import (
     CategorieSerializer,
+    CategorieArbreSerializer,
     ProduitSerializer,
     ProduitListSerializer,
     ProduitDetailSerializer,
     ProduitCreateUpdateSerializer,
     ImageProduitSerializer,
+    ImportCatalogueSerializer,
     AvisSerializer, 
     AvisCreateSerializer,
 )
 from .permissions import IsEntrepriseOwner, IsAdminUser
+from .vues import compteur_vues
+from .arbre import ArbreCategories
+from .facettes import calculer_facettes
+from .recherche import rechercher, termes_requete
+from .importation import format_fichier, verifier_encodage
+from .jobs import importer_catalogue
+from . import cache, images
+from users.permissions import IsAdminUser as IsAdminStrict
 
 
-class CategorieViewSet(viewsets.ModelViewSet):
+class CategorieViewSet(SerialisationMesureeMixin, LectureReplicaMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les catégories
     """
+    actions_replica = ('list', 'retrieve', 'arbre', 'produits')
+    # Requêtes SQL max par action, authentification JWT comprise
+    # (voir Fanjava_backend/instrumentation.py)
+    budget_requetes = {'list': 4, 'retrieve': 4, 'arbre': 2}
     queryset = Categorie.objects.all()
     serializer_class = CategorieSerializer
     lookup_field = 'slug'
@@ -36,12 +60,20 @@ class CategorieViewSet(viewsets.ModelViewSet):
         Les catégories sont publiques en lecture
         Seuls les admins peuvent créer/modifier/supprimer
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'arbre']:
             permission_classes = [IsAuthenticatedOrReadOnly]
         else:
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
     
+    def est_admin(self):
+        user = self.request.user
+        return user.is_authenticated and (
+            user.is_staff or
+            user.is_superuser or
+            getattr(user, 'user_type', None) == 'admin'
+        )
+    
     def get_queryset(self):
         """Filtrer les catégories actives pour les utilisateurs normaux"""
         queryset = super().get_queryset()
@@ -49,14 +81,51 @@ class CategorieViewSet(viewsets.ModelViewSet):
         # ✅ Ajouter l'annotation du nombre de produits
         queryset = queryset.annotate(nombre_produits=Count('produits'))
         
-        if self.request.user.is_authenticated:
-            if (self.request.user.is_staff or 
-                self.request.user.is_superuser or 
-                getattr(self.request.user, 'user_type', None) == 'admin'):
-                return queryset
+        if self.est_admin():
+            return queryset
         
         return queryset.filter(active=True)
     
+    def get_serializer_context(self):
+        """Sous-catégories servies depuis l'arbre chargé en une requête"""
+        context = super().get_serializer_context()
+        if self.action in ['list', 'retrieve']:
+            context['arbre'] = ArbreCategories.charger()
+        return context
+    
+    def en_cache(self, request, calcul):
+        """Réponse mise en cache (les admins voient aussi les catégories inactives)"""
+        return cache.reponse_en_cache(
+            request,
+            f'categories:{self.action}:{self.kwargs.get("slug", "")}',
+            (cache.CATEGORIES, cache.PRODUITS),
+            calcul,
+            variante='admin' if self.est_admin() else 'public'
+        )
+    
+    def list(self, request, *args, **kwargs):
+        return self.en_cache(request, lambda: super(CategorieViewSet, self).list(request, *args, **kwargs))
+    
+    def retrieve(self, request, *args, **kwargs):
+        return self.en_cache(request, lambda: super(CategorieViewSet, self).retrieve(request, *args, **kwargs))
+    
+    @action(detail=False, methods=['get'])
+    def arbre(self, request):
+        """
+        Arbre complet des catégories avec le nombre de produits par nœud
+        (direct et cumulé avec les descendants), en une requête puis en cache
+        Les admins voient aussi les catégories inactives
+        """
+        def calcul():
+            arbre = ArbreCategories.charger(inclure_inactives=self.est_admin())
+            serializer = CategorieArbreSerializer(
+                arbre.racines,
+                many=True,
+                context={**self.get_serializer_context(), 'arbre': arbre}
+            )
+            return Response(donnees_serialisees(serializer))
+        return self.en_cache(request, calcul)
+    
     def destroy(self, request, *args, **kwargs):
         """
         ✅ NOUVELLE MÉTHODE: Empêcher la suppression si la catégorie contient des produits
@@ -90,7 +159,9 @@ class CategorieViewSet(viewsets.ModelViewSet):
         Utile pour voir ce qui bloque la suppression
         """
         categorie = self.get_object()
-        produits = categorie.produits.all()
+        produits = categorie.produits.select_related(
+            'categorie', 'entreprise'
+        ).prefetch_related('images')
         
         # Serializer simple pour la liste
         from .serializers import ProduitListSerializer
@@ -99,11 +170,11 @@ class CategorieViewSet(viewsets.ModelViewSet):
         return Response({
             'categorie': categorie.nom,
             'nombre_produits': produits.count(),
-            'produits': serializer.data
+            'produits': donnees_serialisees(serializer)
         })
 
 
-class ImageProduitViewSet(viewsets.ModelViewSet):
+class ImageProduitViewSet(SerialisationMesureeMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les images de produits
     """
@@ -125,10 +196,22 @@ class ImageProduitViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class ProduitViewSet(viewsets.ModelViewSet):
+class ProduitViewSet(SerialisationMesureeMixin, LectureReplicaMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les produits avec upload d'images
     """
+    actions_replica = (
+        'list', 'retrieve', 'nouveautes', 'promotions', 'vedette', 'search', 'facettes', 'avis'
+    )
+    budget_requetes = {
+        'list': 4,
+        'retrieve': 5,
+        'nouveautes': 3,
+        'promotions': 3,
+        'vedette': 3,
+        'search': 4,
+        'facettes': 4,
+    }
     queryset = Produit.objects.select_related('categorie', 'entreprise').prefetch_related('images')
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
@@ -137,11 +220,13 @@ class ProduitViewSet(viewsets.ModelViewSet):
     search_fields = ['nom', 'description', 'description_courte']
     ordering_fields = ['prix', 'created_at', 'nom', 'note_moyenne', 'nombre_ventes']
     ordering = ['-created_at']
+    pagination_class = PaginationHybride
+    keyset_ordering_fields = ['created_at', 'prix', 'nombre_ventes']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     
     def get_serializer_class(self):
         """Utiliser des serializers différents selon l'action"""
-        if self.action == 'list':
+        if self.action in ['list', 'search']:
             return ProduitListSerializer
         elif self.action in ['create', 'update', 'partial_update']:
             return ProduitCreateUpdateSerializer
@@ -154,9 +239,15 @@ class ProduitViewSet(viewsets.ModelViewSet):
         queryset = super().get_queryset()
         
         # Filtrer par statut actif par défaut
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'facettes']:
             queryset = queryset.filter(status='active')
         
+        # Fiche produit : avis et auteurs en une requête
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                Prefetch('avis', queryset=Avis.objects.select_related('client__user'))
+            )
+        
         # Filtrer par prix min/max
         prix_min = self.request.query_params.get('prix_min', None)
         prix_max = self.request.query_params.get('prix_max', None)
@@ -166,9 +257,9 @@ class ProduitViewSet(viewsets.ModelViewSet):
         if prix_max:
             queryset = queryset.filter(prix__lte=prix_max)
         
-        # Filtrer par stock disponible
+        # Filtrer par stock disponible (facette : compté sans filtrer, voir products.facettes)
         en_stock = self.request.query_params.get('en_stock', None)
-        if en_stock == 'true':
+        if en_stock == 'true' and self.action != 'facettes':
             queryset = queryset.filter(stock__gt=0)
         
         # Filtrer par entreprise (pour le dashboard entreprise)
@@ -179,13 +270,46 @@ class ProduitViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def en_cache(self, request, calcul):
+        """
+        Réponse mise en cache (voir products.cache)
+        Le tableau de bord entreprise (mes_produits) n'est pas mis en cache
+        """
+        if request.query_params.get('mes_produits') == 'true':
+            return calcul()
+        return cache.reponse_en_cache(
+            request,
+            f'produits:{self.action}',
+            (cache.PRODUITS, cache.CATEGORIES),
+            calcul
+        )
+    
+    def list(self, request, *args, **kwargs):
+        return self.en_cache(request, lambda: super(ProduitViewSet, self).list(request, *args, **kwargs))
+    
     def retrieve(self, request, *args, **kwargs):
-        """Incrémenter le nombre de vues lors de la consultation"""
-        instance = self.get_object()
-        instance.nombre_vues += 1
-        instance.save(update_fields=['nombre_vues'])
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        """
+        Fiche produit en cache (voir products.cache) : 304 ou réponse sans
+        requête SQL ni sérialisation tant que le catalogue n'a pas changé
+        La vue est comptabilisée dans tous les cas (bufferisée, voir products.vues) ;
+        le nombre de vues affiché suit l'expiration du cache
+        """
+        def calcul():
+            instance = self.get_object()
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data)
+        
+        # Avis : peut_modifier dépend du client connecté
+        user = request.user
+        client = user.client.pk if user.is_authenticated and hasattr(user, 'client') else ''
+        return cache.reponse_en_cache(
+            request,
+            f'produits:retrieve:{kwargs[self.lookup_field]}',
+            (cache.PRODUITS, cache.CATEGORIES),
+            calcul,
+            variante=f'client:{client}',
+            lue=lambda data: compteur_vues.enregistrer(data['id'])
+        )
     
     def create(self, request, *args, **kwargs):
         """
@@ -268,24 +392,176 @@ class ProduitViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def nouveautes(self, request):
         """Récupérer les nouveaux produits (20 derniers)"""
+        return self.en_cache(request, lambda: self._nouveautes(request))
+    
+    def _nouveautes(self, request):
         produits = self.get_queryset().filter(actif=True, status='active')[:20]
         serializer = ProduitListSerializer(produits, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(donnees_serialisees(serializer))
     
     @action(detail=False, methods=['get'])
     def promotions(self, request):
         """Récupérer les produits en promotion"""
+        return self.en_cache(request, lambda: self._promotions(request))
+    
+    def _promotions(self, request):
         produits = self.get_queryset().filter(en_promotion=True, actif=True, status='active')
         serializer = ProduitListSerializer(produits, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(donnees_serialisees(serializer))
     
     @action(detail=False, methods=['get'])
     def vedette(self, request):
         """Récupérer les produits en vedette"""
+        return self.en_cache(request, lambda: self._vedette(request))
+    
+    def _vedette(self, request):
         produits = self.get_queryset().filter(en_vedette=True, actif=True, status='active')
         serializer = ProduitListSerializer(produits, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(donnees_serialisees(serializer))
     
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Recherche plein texte classée par pertinence (voir products.recherche)
+        ?q=... [&langue=fr] + filtres habituels (categorie, prix_min, en_stock...)
+        """
+        requete = request.query_params.get('q', '')
+        if not termes_requete(requete):
+            return Response(
+                {'error': 'Le paramètre q doit contenir au moins un mot significatif'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        def calcul():
+            produits = DjangoFilterBackend().filter_queryset(
+                request, self.get_queryset().filter(status='active', actif=True), self
+            )
+            langue = request.query_params.get('langue') or get_language()
+            page = self.paginate_queryset(rechercher(produits, requete, langue))
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return self.en_cache(request, calcul)
+    
+    @action(detail=False, methods=['get'])
+    def facettes(self, request):
+        """
+        Nombre de produits par catégorie (sous-catégories comprises), entreprise,
+        tranche de prix, promotion, vedette et disponibilité pour les filtres
+        de la liste (voir products.facettes)
+        """
+        def calcul():
+            produits = filters.SearchFilter().filter_queryset(request, self.get_queryset(), self)
+            return Response(calculer_facettes(request, produits, self))
+        return self.en_cache(request, calcul)
+    
+    # Colonnes de l'export, réimportables telles quelles (voir products.importation)
+    colonnes_export = [
+        'id',
+        'sku',
+        'slug',
+        'nom',
+        'description_courte',
+        'description',
+        'prix',
+        'prix_promo',
+        'stock',
+        'seuil_alerte_stock',
+        'categorie',
+        'poids',
+        'status',
+        'en_vedette',
+        'en_promotion',
+        'actif',
+        'nombre_ventes',
+        'nombre_vues',
+        'note_moyenne',
+        'nombre_avis',
+        'created_at',
+        'updated_at',
+    ]
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        """
+        Export du catalogue en streaming (?format_export=csv|json|jsonl),
+        filtres de la liste acceptés (categorie, status, en_stock...)
+        - Entreprise : ses produits, tous statuts confondus
+        - Admin : tout le catalogue, avec l'entreprise (?entreprise=<id> pour une seule)
+        """
+        colonnes = self.colonnes_export
+        produits = self.filter_queryset(Produit.objects.all())
+        if hasattr(request.user, 'entreprise'):
+            produits = produits.filter(entreprise=request.user.entreprise)
+            nom_fichier = f'produits-{request.user.entreprise.pk}'
+        elif IsAdminStrict().has_permission(request, self):
+            colonnes = [*colonnes, 'entreprise', 'entreprise__nom_entreprise']
+            nom_fichier = 'produits'
+        else:
+            raise PermissionDenied("Export réservé aux entreprises et aux administrateurs")
+        
+        if request.query_params.get('en_stock') == 'true':
+            produits = produits.filter(stock__gt=0)
+        return reponse_export(request, produits, colonnes, nom_fichier)
+    
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        permission_classes=[IsAuthenticated],
+        parser_classes=[MultiPartParser]
+    )
+    def importer(self, request):
+        """
+        Import en masse (voir products.importation) : fichier CSV ou JSON lines
+        dans le champ 'fichier' [&format=csv|jsonl] ; upsert par SKU
+        Le fichier est enregistré puis traité par une tâche de fond (50 000 lignes
+        dépassent les délais d'une requête HTTP) : 202 avec le suivi de l'import,
+        rapport (créés, mis à jour, erreurs par ligne) sur import/<id>/ une fois terminé
+        """
+        if not hasattr(request.user, 'entreprise'):
+            raise PermissionDenied("Seules les entreprises peuvent importer des produits")
+
+        fichier = request.FILES.get('fichier')
+        if fichier is None:
+            return Response(
+                {'error': 'Le champ fichier est requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            format_ = format_fichier(fichier.name, request.data.get('format'))
+            verifier_encodage(fichier)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        importation = ImportCatalogue.objects.create(
+            entreprise=request.user.entreprise,
+            fichier=fichier,
+            format_fichier=format_
+        )
+        importer_catalogue.differer(import_id=importation.pk)
+        # Déjà terminé si les tâches sont synchrones (JOBS_SYNCHRONES)
+        importation.refresh_from_db()
+        return Response(
+            ImportCatalogueSerializer(importation).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': f'{request.path}{importation.pk}/'}
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path=r'import/(?P<import_id>\d+)',
+        permission_classes=[IsAuthenticated]
+    )
+    def suivi_import(self, request, import_id=None):
+        """Statut d'un import de l'entreprise connectée et son rapport une fois terminé"""
+        importation = ImportCatalogue.objects.filter(
+            pk=import_id, entreprise__user=request.user
+        ).first()
+        if importation is None:
+            raise Http404
+        return Response(ImportCatalogueSerializer(importation).data)
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def ajouter_image(self, request, slug=None):
         """Ajouter une image à un produit"""
@@ -336,16 +612,31 @@ class ProduitViewSet(viewsets.ModelViewSet):
         return Response({
             'note_moyenne': produit.get_note_moyenne(),
             'nombre_avis': produit.get_nombre_avis(),
-            'avis': serializer.data
+            'repartition_notes': produit.get_repartition_notes(),
+            'avis': donnees_serialisees(serializer)
         })
 
 
-class AvisViewSet(viewsets.ModelViewSet):
+class CacheCatalogueStatsView(APIView):
+    """
+    Statistiques du cache catalogue (hits, miss, versions) pour le monitoring
+    """
+    permission_classes = [IsAdminStrict]
+    
+    def get(self, request):
+        return Response(cache.get_stats())
+
+
+class AvisViewSet(SerialisationMesureeMixin, LectureReplicaMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les avis produits
     """
+    actions_replica = ('list',)
+    budget_requetes = {'list': 3}
     serializer_class = AvisSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = PaginationHybride
+    keyset_ordering_fields = ['created_at', 'note']
     
     def get_queryset(self):
         """Filtrer les avis par produit et ne montrer que les avis approuvés"""
@@ -418,4 +709,29 @@ def perform_create(self, serializer):
         
         avis = Avis.objects.filter(client=request.user.client)
         serializer = self.get_serializer(avis, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+@require_GET
+def image_derivee(request, empreinte, taille, format_):
+    """
+    Dérivée d'une image, générée à la première demande si elle manque
+    Le serveur web sert directement les fichiers existants de MEDIA_ROOT et
+    ne renvoie ici que les absents ; le nom contient l'empreinte du contenu,
+    la réponse est donc cachable indéfiniment
+    """
+    if taille not in images.tailles() or format_ not in images.FORMATS:
+        raise Http404
+    nom = images.nom_derivee(empreinte, taille, format_)
+    if not default_storage.exists(nom):
+        source = images.source(empreinte)
+        if source is None:
+            raise Http404
+        try:
+            with source.open('rb'):
+                images.generer_derivees(source, empreinte, [(taille, format_)])
+        except (images.ImageInvalide, OSError):
+            raise Http404
+    response = FileResponse(default_storage.open(nom, 'rb'), content_type=f'image/{format_}')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,159 @@
+# products/vues.py
+"""
+Compteur de vues produits bufferisé
+
+Les consultations sont comptées dans le cache `vues` (voir CACHES dans
+settings.py), partagé entre les processus web et les commandes : une clé
+par produit, incrémentée sans requête SQL. La première vue d'un produit
+depuis le dernier flush l'inscrit dans la table VuesProduitEnAttente, qui
+indexe les compteurs à écrire.
+
+Le flush écrit chaque lot en une seule requête UPDATE relative :
+
+    nombre_vues = nombre_vues + CASE id WHEN ... THEN n ... END
+
+puis retranche du cache les vues écrites : celles arrivées entre-temps
+restent en attente. Les compteurs restent exacts avec plusieurs workers,
+sans verrou sur la ligne Produit ni modification de updated_at.
+
+La première vue qui suit l'intervalle (PRODUIT_VUES_FLUSH_INTERVAL) depuis
+le flush précédent, tous processus confondus, met en file la tâche de fond
+products.jobs.ecrire_vues : la requête ne paie que l'inscription du produit.
+`python manage.py flush_vues` (cron) écrit aussi les vues des produits
+qui ne sont plus consultés.
+
+incr est atomique avec Redis, Memcached et locmem ; avec les backends
+'file' et 'db' (lecture puis écriture), des vues simultanées d'un même
+produit peuvent ne compter qu'une fois.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Produit, VuesProduitEnAttente
+
+
+ALIAS_CACHE = 'vues'
+
+CLE_PRODUIT = 'vues:produit:{}'
+CLE_FLUSH = 'vues:flush'
+
+
+class CompteurVues:
+    """Vues produits en attente, partagées entre les processus"""
+
+    # Nombre max de produits par requête UPDATE (taille du CASE)
+    taille_lot = 500
+
+    @property
+    def cache(self):
+        return caches[ALIAS_CACHE]
+
+    @property
+    def intervalle(self):
+        """Intervalle de flush en secondes (settings.PRODUIT_VUES_FLUSH_INTERVAL)"""
+        return getattr(settings, 'PRODUIT_VUES_FLUSH_INTERVAL', 30)
+
+    def enregistrer(self, produit_id, nombre=1):
+        """Enregistrer une consultation et demander un flush si l'intervalle est écoulé"""
+        if self._incrementer(CLE_PRODUIT.format(produit_id), nombre) == nombre:
+            # Compteur parti de zéro : produit à inscrire pour le prochain flush
+            self._marquer([produit_id])
+
+        # Clé posée pour la durée de l'intervalle : un seul flush demandé
+        if self.intervalle <= 0 or self.cache.add(CLE_FLUSH, 1, timeout=self.intervalle):
+            # Import ici : products.jobs importe ce module
+            from .jobs import ecrire_vues
+            ecrire_vues.differer()
+
+    def en_attente(self, produit_id=None):
+        """Vues pas encore écrites en base (pour un produit ou au total)"""
+        if produit_id is not None:
+            return self.cache.get(CLE_PRODUIT.format(produit_id), 0)
+        ids = VuesProduitEnAttente.objects.values_list('produit_id', flat=True)
+        return sum(self.cache.get_many([CLE_PRODUIT.format(pk) for pk in ids]).values())
+
+    def flush(self):
+        """
+        Écrire les vues en attente en base
+        Retourne le nombre de produits mis à jour
+        """
+        # Prochain flush périodique dans un intervalle
+        self.cache.set(CLE_FLUSH, 1, timeout=max(self.intervalle, 0))
+        total = 0
+        dernier = 0
+        while True:
+            with transaction.atomic():
+                # Un lot n'est traité que par un seul flush à la fois
+                ids = list(
+                    VuesProduitEnAttente.objects.select_for_update(skip_locked=True)
+                    .filter(produit_id__gt=dernier)
+                    .order_by('produit_id')
+                    .values_list('produit_id', flat=True)[:self.taille_lot]
+                )
+                if not ids:
+                    break
+                dernier = ids[-1]
+
+                cles = {produit_id: CLE_PRODUIT.format(produit_id) for produit_id in ids}
+                valeurs = self.cache.get_many(cles.values())
+                items = [
+                    (produit_id, valeurs[cle]) for produit_id, cle in cles.items()
+                    if valeurs.get(cle)
+                ]
+                if items:
+                    self._ecrire(items)
+                VuesProduitEnAttente.objects.filter(produit_id__in=ids).delete()
+
+                # Vues arrivées depuis la lecture : le produit reste inscrit
+                restants = [
+                    produit_id for produit_id, nombre in items
+                    if self._decrementer(cles[produit_id], nombre)
+                ]
+                if restants:
+                    self._marquer(restants)
+
+            total += len(items)
+            if len(ids) < self.taille_lot:
+                break
+
+        return total
+
+    def _incrementer(self, cle, nombre):
+        try:
+            return self.cache.incr(cle, nombre)
+        except ValueError:
+            if self.cache.add(cle, nombre):
+                return nombre
+            return self.cache.incr(cle, nombre)
+
+    def _decrementer(self, cle, nombre):
+        try:
+            return self.cache.decr(cle, nombre)
+        except ValueError:
+            # Clé évincée entre-temps
+            return 0
+
+    @staticmethod
+    def _marquer(ids):
+        VuesProduitEnAttente.objects.bulk_create(
+            [VuesProduitEnAttente(produit_id=produit_id) for produit_id in ids],
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def _ecrire(items):
+        """Une seule requête UPDATE ... CASE pour un lot de produits"""
+        increment = Case(
+            *[When(pk=produit_id, then=Value(nombre)) for produit_id, nombre in items],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+        Produit.objects.filter(
+            pk__in=[produit_id for produit_id, _ in items]
+        ).update(nombre_vues=F('nombre_vues') + increment)
+
+
+compteur_vues = CompteurVues()
@@ -1,15 +1,23 @@
 # users/admin_views.py
 
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django_filters.rest_framework import DjangoFilterBackend
+
+from Fanjava_backend.db.routeur import LectureReplicaMixin
+from Fanjava_backend.instrumentation import SerialisationMesureeMixin
+from Fanjava_backend.pagination import PaginationHybride
+from Fanjava_backend.streaming import reponse_export
+from .filters import AdminUserFilter
 from .models import CustomUser, Client, Entreprise
 from .serializers import UserSerializer, ClientSerializer, EntrepriseSerializer
+from .stats import stats_utilisateurs
 from .permissions import IsAdminUser
 
 
-class AdminUserViewSet(viewsets.ModelViewSet):  # ✅ Changé de ReadOnlyModelViewSet à ModelViewSet
+class AdminUserViewSet(SerialisationMesureeMixin, LectureReplicaMixin, viewsets.ModelViewSet):  # ✅ Changé de ReadOnlyModelViewSet à ModelViewSet
     """
     ViewSet pour la gestion admin de tous les utilisateurs
     Accessible uniquement aux admins
@@ -17,13 +25,42 @@ class AdminUserViewSet(viewsets.ModelViewSet):  # ✅ Changé de ReadOnlyModelVi
     """
     permission_classes = [IsAdminUser]
     serializer_class = UserSerializer
-    queryset = CustomUser.objects.all()
+    queryset = CustomUser.objects.select_related('client', 'entreprise')
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_class = AdminUserFilter
+    search_fields = ['username', 'email', 'first_name', 'last_name']
+    ordering_fields = ['created_at', 'username']
+    ordering = ['-created_at']
+    pagination_class = PaginationHybride
+    keyset_ordering_fields = ['created_at']
+    actions_replica = ('stats',)
+    budget_requetes = {'list': 3, 'retrieve': 2, 'stats': 2}
     
-    def list(self, request):
-        """Récupérer tous les utilisateurs"""
-        users = self.get_queryset()
-        serializer = self.get_serializer(users, many=True)
-        return Response(serializer.data)
+    # Colonnes de l'export (valeurs lues sans instancier de modèle)
+    colonnes_export = [
+        'id',
+        'username',
+        'email',
+        'first_name',
+        'last_name',
+        'user_type',
+        'phone',
+        'is_active',
+        'created_at',
+        'preferred_language',
+        'client__ville',
+        'entreprise__nom_entreprise',
+        'entreprise__status',
+    ]
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Export complet (mêmes filtres que la liste) en streaming
+        ?format_export=csv (défaut), json ou jsonl
+        """
+        users = self.filter_queryset(self.get_queryset())
+        return reponse_export(request, users, self.colonnes_export, 'utilisateurs')
     
     def retrieve(self, request, pk=None):
         """Récupérer un utilisateur spécifique"""
@@ -63,21 +100,22 @@ class AdminUserViewSet(viewsets.ModelViewSet):  # ✅ Changé de ReadOnlyModelVi
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Statistiques des utilisateurs"""
-        total = CustomUser.objects.count()
-        clients = CustomUser.objects.filter(user_type='client').count()
-        entreprises = CustomUser.objects.filter(user_type='entreprise').count()
-        admins = CustomUser.objects.filter(user_type='admin').count()
-        
-        return Response({
-            'total': total,
-            'clients': clients,
-            'entreprises': entreprises,
-            'admins': admins
-        })
+        """
+        Statistiques des utilisateurs (une requête groupée, en cache)
+        ?jours=30&semaines=12 : profondeur des inscriptions par jour / semaine
+        """
+        try:
+            jours = min(max(int(request.query_params.get('jours', 30)), 1), 366)
+            semaines = min(max(int(request.query_params.get('semaines', 12)), 1), 104)
+        except ValueError:
+            return Response(
+                {'error': 'jours et semaines doivent être des entiers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(stats_utilisateurs(jours, semaines))
 
 
-class AdminClientViewSet(viewsets.ReadOnlyModelViewSet):
+class AdminClientViewSet(SerialisationMesureeMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet pour la gestion admin des clients
     """
@@ -86,7 +124,7 @@ class AdminClientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Client.objects.all().select_related('user')
 
 
-class AdminEntrepriseViewSet(viewsets.ModelViewSet):
+class AdminEntrepriseViewSet(SerialisationMesureeMixin, viewsets.ModelViewSet):
     """
     ViewSet pour la gestion admin des entreprises
     Permet d'approuver/rejeter/suspendre
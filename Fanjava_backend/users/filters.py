@@ -0,0 +1,31 @@
+# users/filters.py
+
+from datetime import datetime, time, timedelta
+
+import django_filters
+from django.utils import timezone
+
+from .models import CustomUser
+
+
+def debut_du_jour(jour):
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+class AdminUserFilter(django_filters.FilterSet):
+    """
+    Filtres de la liste admin des utilisateurs
+    Les dates sont converties en bornes datetime (index sur created_at utilisable)
+    """
+    inscrit_apres = django_filters.DateFilter(method='filtrer_inscrit_apres')
+    inscrit_avant = django_filters.DateFilter(method='filtrer_inscrit_avant')
+
+    class Meta:
+        model = CustomUser
+        fields = ['user_type', 'is_active']
+
+    def filtrer_inscrit_apres(self, queryset, name, value):
+        return queryset.filter(created_at__gte=debut_du_jour(value))
+
+    def filtrer_inscrit_avant(self, queryset, name, value):
+        return queryset.filter(created_at__lt=debut_du_jour(value + timedelta(days=1)))
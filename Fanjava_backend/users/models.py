@@ -67,6 +67,8 @@ class CustomUser(AbstractUser):
         indexes = [
             models.Index(fields=['email']),
             models.Index(fields=['user_type']),
+            models.Index(fields=['user_type', 'is_active', 'created_at']),
+            models.Index(fields=['created_at', 'id']),
         ]
     
     def __str__(self):
@@ -0,0 +1,112 @@
+# users/stats.py
+"""
+Statistiques des utilisateurs pour le tableau de bord admin
+
+Une seule requête groupée (jour d'inscription, type, actif) fournit les
+totaux par type, la répartition actifs/inactifs et les inscriptions par
+jour et par semaine. Le résultat est mis en cache quelques secondes.
+"""
+
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateTimeField, DurationField, ExpressionWrapper, F, Value
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CustomUser
+
+
+CLE_CACHE = 'users:stats:{jours}:{semaines}'
+
+
+def _jour_local():
+    """
+    created_at ramené au jour local
+    Le décalage horaire courant est ajouté avant de tronquer en UTC : pas de
+    CONVERT_TZ côté MySQL (tables de fuseaux non requises). Exact pour les
+    fuseaux sans heure d'été comme Indian/Antananarivo.
+    """
+    decalage = timezone.localtime().utcoffset() or timedelta(0)
+    return TruncDate(
+        ExpressionWrapper(
+            F('created_at') + Value(decalage, output_field=DurationField()),
+            output_field=DateTimeField()
+        ),
+        tzinfo=dt_timezone.utc
+    )
+
+
+def calculer_stats_utilisateurs(jours=30, semaines=12):
+    """Calcule les statistiques (une requête)"""
+    lignes = CustomUser.objects.annotate(jour=_jour_local()).order_by().values(
+        'jour', 'user_type', 'is_active'
+    ).annotate(nombre=Count('id'))
+
+    types = [code for code, libelle in CustomUser.USER_TYPE_CHOICES]
+    par_type = {code: {'total': 0, 'actifs': 0, 'inactifs': 0} for code in types}
+    par_jour = defaultdict(lambda: defaultdict(int))
+
+    for ligne in lignes:
+        compteurs = par_type.setdefault(
+            ligne['user_type'], {'total': 0, 'actifs': 0, 'inactifs': 0}
+        )
+        compteurs['total'] += ligne['nombre']
+        compteurs['actifs' if ligne['is_active'] else 'inactifs'] += ligne['nombre']
+        par_jour[ligne['jour']][ligne['user_type']] += ligne['nombre']
+
+    aujourd_hui = timezone.localdate()
+
+    inscriptions_par_jour = []
+    for decalage in range(jours - 1, -1, -1):
+        jour = aujourd_hui - timedelta(days=decalage)
+        compteurs = par_jour.get(jour, {})
+        inscriptions_par_jour.append({
+            'date': jour,
+            'total': sum(compteurs.values()),
+            **{code: compteurs.get(code, 0) for code in types},
+        })
+
+    # Semaines commençant le lundi
+    lundi = aujourd_hui - timedelta(days=aujourd_hui.weekday())
+    inscriptions_par_semaine = []
+    for decalage in range(semaines - 1, -1, -1):
+        debut = lundi - timedelta(weeks=decalage)
+        compteurs = defaultdict(int)
+        for jour in (debut + timedelta(days=index) for index in range(7)):
+            for code, nombre in par_jour.get(jour, {}).items():
+                compteurs[code] += nombre
+        inscriptions_par_semaine.append({
+            'semaine': debut,
+            'total': sum(compteurs.values()),
+            **{code: compteurs.get(code, 0) for code in types},
+        })
+
+    total = sum(compteurs['total'] for compteurs in par_type.values())
+    actifs = sum(compteurs['actifs'] for compteurs in par_type.values())
+    return {
+        'total': total,
+        'clients': par_type['client']['total'],
+        'entreprises': par_type['entreprise']['total'],
+        'admins': par_type['admin']['total'],
+        'actifs': actifs,
+        'inactifs': total - actifs,
+        'par_type': par_type,
+        'inscriptions': {
+            'par_jour': inscriptions_par_jour,
+            'par_semaine': inscriptions_par_semaine,
+        },
+        'calcule_le': timezone.now(),
+    }
+
+
+def stats_utilisateurs(jours=30, semaines=12):
+    """Statistiques en cache (ADMIN_STATS_CACHE_TIMEOUT secondes)"""
+    cle = CLE_CACHE.format(jours=jours, semaines=semaines)
+    stats = cache.get(cle)
+    if stats is None:
+        stats = calculer_stats_utilisateurs(jours, semaines)
+        cache.set(cle, stats, getattr(settings, 'ADMIN_STATS_CACHE_TIMEOUT', 60))
+    return stats
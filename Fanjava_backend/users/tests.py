@@ -1,3 +1,117 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import CustomUser, Client, Entreprise
+from .stats import CLE_CACHE
+
+
+class AdminUserListTests(TestCase):
+    """Liste admin des utilisateurs : paginée, filtrable, en nombre fixe de requêtes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username='admin', password='password123', user_type='admin', is_staff=True
+        )
+        for index in range(30):
+            user = CustomUser.objects.create_user(
+                username=f'client{index}',
+                email=f'client{index}@test.mg',
+                user_type='client',
+                is_active=index % 3 != 0
+            )
+            Client.objects.create(user=user, ville='Toamasina')
+        for index in range(15):
+            user = CustomUser.objects.create_user(
+                username=f'vendeur{index}', user_type='entreprise'
+            )
+            Entreprise.objects.create(
+                user=user,
+                nom_entreprise=f'Boutique {index}',
+                siret=f'SIRET-{index}',
+                adresse='1 Rue Test',
+                ville='Antananarivo',
+                code_postal='101',
+                telephone='+261340000000',
+                email_entreprise=f'vendeur{index}@test.mg'
+            )
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def test_page_nombre_requetes_fixe(self):
+        # COUNT + page (client et entreprise joints)
+        with self.assertNumQueries(2):
+            response = self.api.get('/api/users/admin/users/')
+
+        self.assertEqual(response.data['count'], 46)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_filtres(self):
+        response = self.api.get('/api/users/admin/users/', {'user_type': 'client', 'is_active': 'false'})
+        self.assertEqual(response.data['count'], 10)
+
+        CustomUser.objects.filter(username__startswith='vendeur').update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+        hier = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.api.get('/api/users/admin/users/', {'inscrit_avant': hier})
+        self.assertEqual(response.data['count'], 15)
+        response = self.api.get('/api/users/admin/users/', {'inscrit_apres': hier})
+        self.assertEqual(response.data['count'], 31)
+
+    def test_export_csv_et_json(self):
+        response = self.api.get('/api/users/admin/users/export/', {'user_type': 'client'})
+        self.assertTrue(response.streaming)
+        contenu = b''.join(response.streaming_content).decode('utf-8-sig')
+        lignes = list(csv.reader(io.StringIO(contenu)))
+        self.assertEqual(lignes[0][:2], ['id', 'username'])
+        self.assertEqual(len(lignes), 31)
+        self.assertEqual(lignes[1][lignes[0].index('client__ville')], 'Toamasina')
+
+        response = self.api.get('/api/users/admin/users/export/', {'format_export': 'json'})
+        utilisateurs = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(utilisateurs), 46)
+        self.assertEqual(
+            sum(1 for u in utilisateurs if u['entreprise__nom_entreprise']), 15
+        )
+
+    def test_reserve_aux_admins(self):
+        self.api.force_authenticate(CustomUser.objects.get(username='client1'))
+        self.assertEqual(self.api.get('/api/users/admin/users/').status_code, 403)
+        self.assertEqual(self.api.get('/api/users/admin/users/export/').status_code, 403)
+
+    def test_stats_une_requete_puis_cache(self):
+        cache.delete(CLE_CACHE.format(jours=7, semaines=4))
+        CustomUser.objects.filter(username__startswith='vendeur').update(
+            created_at=timezone.now() - timedelta(days=8)
+        )
+
+        with self.assertNumQueries(1):
+            stats = self.api.get('/api/users/admin/users/stats/', {'jours': 7, 'semaines': 4}).data
+        with self.assertNumQueries(0):
+            self.api.get('/api/users/admin/users/stats/', {'jours': 7, 'semaines': 4})
+
+        self.assertEqual(
+            (stats['total'], stats['clients'], stats['entreprises'], stats['admins']),
+            (46, 30, 15, 1)
+        )
+        self.assertEqual(stats['par_type']['client'], {'total': 30, 'actifs': 20, 'inactifs': 10})
+        self.assertEqual(stats['inactifs'], 10)
 
-# Create your tests here.
+        par_jour = stats['inscriptions']['par_jour']
+        self.assertEqual(len(par_jour), 7)
+        self.assertEqual(par_jour[-1]['date'], timezone.localdate())
+        self.assertEqual(par_jour[-1]['total'], 31)
+        self.assertEqual(sum(jour['entreprise'] for jour in par_jour), 0)
+        self.assertEqual(
+            sum(semaine['total'] for semaine in stats['inscriptions']['par_semaine']), 46
+        )
@@ -2,13 +2,15 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
+
+from Fanjava_backend.instrumentation import SerialisationMesureeMixin
 from .serializers import RegisterSerializer, UserSerializer
 
-class RegisterView(generics.CreateAPIView):
+class RegisterView(SerialisationMesureeMixin, generics.CreateAPIView):
     permission_classes = [AllowAny]
     serializer_class = RegisterSerializer
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(SerialisationMesureeMixin, generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
     